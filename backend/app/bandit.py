@@ -8,14 +8,18 @@ class LinUCB:
         self.d = d
         self.alpha = alpha
 
-    def _load_arm(self, session, movie_id: str):
+    def _load_arm(self, session, movie_id: str, commit: bool = True):
         snap = session.query(LinUCBSnapshot).filter_by(movie_id=movie_id).one_or_none()
         if not snap:
             A = np.eye(self.d).tolist()
             b = np.zeros((self.d,)).tolist()
             snap = LinUCBSnapshot(movie_id=movie_id, A=A, b=b)
             session.add(snap)
-            session.commit()
+            if commit:
+                session.commit()
+            else:
+                # sessions do not autoflush; flush so a later update in the same batch finds the arm
+                session.flush()
         else:
             A = np.array(snap.A, dtype=float)
             b = np.array(snap.b, dtype=float)
@@ -29,14 +33,19 @@ class LinUCB:
         ucb = self.alpha * float(np.sqrt(x @ A_inv @ x))
         return mean + ucb
 
-    def update(self, session, movie_id: str, x: np.ndarray, reward: float):
-        snap, A, b = self._load_arm(session, movie_id)
+    def update(self, session, movie_id: str, x: np.ndarray, reward: float, commit: bool = True):
+        """Apply one observation; with commit=False it joins the caller's transaction."""
+        snap, A, b = self._load_arm(session, movie_id, commit=commit)
         A = np.array(snap.A, dtype=float)
         b = np.array(snap.b, dtype=float)
         A += np.outer(x, x)
         b += reward * x
         snap.A = A.tolist(); snap.b = b.tolist()
-        session.add(snap); session.commit()
+        session.add(snap)
+        if commit:
+            session.commit()
+        else:
+            session.flush()
 
 def features(user: Dict[str,float], movie: Dict[str,float]) -> np.ndarray:
     keys = ["energy","mood","depth","optimism","novelty","comfort","intensity","humor","darkness"]
@@ -0,0 +1,83 @@
+"""Change log for the catalog `movies` table.
+
+Triggers append the tmdb_id of every inserted, updated or deleted movie to `movie_changes`, so a
+snapshot built at change sequence N can later re-read just the rows touched after N instead of the
+whole table. The log only records which ids changed; readers always fetch the current row state.
+
+This module has no package-relative imports so ingest scripts can import it from the app dir.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import List
+
+CHANGE_LOG_TABLE = "movie_changes"
+
+_CHANGE_LOG_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS movie_changes (
+      seq INTEGER PRIMARY KEY AUTOINCREMENT,
+      tmdb_id INTEGER NOT NULL,
+      changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_log_insert AFTER INSERT ON movies
+    BEGIN
+      INSERT INTO movie_changes (tmdb_id) VALUES (NEW.tmdb_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_log_update AFTER UPDATE ON movies
+    BEGIN
+      INSERT INTO movie_changes (tmdb_id) VALUES (OLD.tmdb_id);
+      INSERT INTO movie_changes (tmdb_id) SELECT NEW.tmdb_id WHERE NEW.tmdb_id != OLD.tmdb_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_log_delete AFTER DELETE ON movies
+    BEGIN
+      INSERT INTO movie_changes (tmdb_id) VALUES (OLD.tmdb_id);
+    END
+    """,
+]
+
+
+def ensure_change_log(conn: sqlite3.Connection) -> None:
+    """Create the change-log table and its triggers on `movies` (idempotent)."""
+    cur = conn.cursor()
+    for ddl in _CHANGE_LOG_DDL:
+        cur.execute(ddl)
+    conn.commit()
+
+
+def current_change_seq(conn: sqlite3.Connection) -> int | None:
+    """Latest change sequence number, 0 for an empty log, or None when the DB has no change log."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (CHANGE_LOG_TABLE,))
+    if cur.fetchone() is None:
+        return None
+    # sqlite_sequence keeps the AUTOINCREMENT high-water mark even after old log rows are pruned.
+    cur.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (CHANGE_LOG_TABLE,))
+    row = cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+def changed_ids_since(conn: sqlite3.Connection, seq: int, upto: int) -> List[int] | None:
+    """Distinct tmdb_ids changed in (seq, upto], or None when part of that range was pruned."""
+    if upto <= seq:
+        return []
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT MIN(seq) FROM {CHANGE_LOG_TABLE} WHERE seq > ?",
+        (seq,),
+    )
+    row = cur.fetchone()
+    if row is None or row[0] is None or int(row[0]) != seq + 1:
+        return None
+    cur.execute(
+        f"SELECT DISTINCT tmdb_id FROM {CHANGE_LOG_TABLE} WHERE seq > ? AND seq <= ?",
+        (seq, upto),
+    )
+    return [int(r[0]) for r in cur.fetchall()]
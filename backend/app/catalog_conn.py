@@ -0,0 +1,140 @@
+"""Read-only SQLite access to the catalog DB.
+
+The app never writes the catalog; ingest scripts do, from another process. Connections here open
+the file read-only (`mode=ro`, or `immutable=1` when CATALOG_DB_IMMUTABLE is set), memory-map it,
+keep a large page cache, and are reused per thread, so /health and snapshot rebuilds skip
+connection setup and cold page reads.
+
+Readers never take write locks: every statement is drained and multi-statement snapshot reads
+run in one `read_transaction` that ends as soon as the rows are read, so an ingest is only ever
+held up by a snapshot read in progress. Catalogs in WAL mode, or immutable catalogs swapped in by
+rename, do not hold up ingests even then.
+
+Catalog changes are detected with `catalog_version`: file identity (device, inode, size, mtime)
+plus `PRAGMA data_version` from one long-lived watcher connection per DB, which also catches
+commits that leave the main file's mtime alone (e.g. WAL-mode ingests).
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, NamedTuple, Tuple
+
+_DEFAULT_MMAP_MB = 256
+_DEFAULT_CACHE_MB = 64
+
+
+class CatalogVersion(NamedTuple):
+    """Change token for a catalog DB; any field changing means the catalog may have changed."""
+
+    dev: int
+    ino: int
+    size: int
+    mtime_ns: int
+    data_version: int
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    try:
+        return max(0, int(raw)) if raw else default
+    except Exception:
+        return default
+
+
+def catalog_immutable() -> bool:
+    """Open with immutable=1: no locking or change checks by SQLite at all.
+
+    Only safe when a new catalog is swapped in by renaming a complete file over the old one
+    (readers then see a new inode and reopen); never with in-place ingests.
+    """
+    raw = (os.environ.get("CATALOG_DB_IMMUTABLE") or "").strip().lower()
+    return raw in {"1", "true", "yes", "on"}
+
+
+def _file_identity(db_path: str) -> Tuple[int, int, int, int]:
+    st = os.stat(db_path)
+    return int(st.st_dev), int(st.st_ino), int(st.st_size), int(st.st_mtime_ns)
+
+
+def _open(db_path: str) -> sqlite3.Connection:
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Catalog DB not found at: {db_path}")
+    mode = "ro&immutable=1" if catalog_immutable() else "ro"
+    conn = sqlite3.connect(
+        f"{Path(db_path).resolve(strict=False).as_uri()}?mode={mode}",
+        uri=True,
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA mmap_size = {_env_int('CATALOG_DB_MMAP_MB', _DEFAULT_MMAP_MB) * 1024 * 1024}").fetchall()
+    # Negative cache_size is in KiB.
+    conn.execute(f"PRAGMA cache_size = -{_env_int('CATALOG_DB_CACHE_MB', _DEFAULT_CACHE_MB) * 1024}")
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+class _ThreadConnections(threading.local):
+    def __init__(self) -> None:
+        # db path -> (connection, (dev, ino) of the file it was opened on)
+        self.conns: Dict[str, Tuple[sqlite3.Connection, Tuple[int, int]]] = {}
+
+
+_THREAD = _ThreadConnections()
+_WATCHERS: Dict[str, Tuple[sqlite3.Connection, Tuple[int, int]]] = {}
+_WATCH_LOCK = threading.Lock()
+
+
+def catalog_connection(db_path: str) -> sqlite3.Connection:
+    """This thread's read-only connection to `db_path`, reopened when the file is replaced.
+
+    Do not close it; drain every statement so no read transaction outlives the call.
+    """
+    ident = _file_identity(db_path)[:2]
+    cached = _THREAD.conns.get(db_path)
+    if cached is not None and cached[1] == ident:
+        return cached[0]
+    if cached is not None:
+        cached[0].close()
+    conn = _open(db_path)
+    _THREAD.conns[db_path] = (conn, ident)
+    return conn
+
+
+@contextmanager
+def read_transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Run several reads against one consistent catalog state, releasing it right after."""
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.commit()
+
+
+def catalog_version(db_path: str) -> CatalogVersion:
+    """Current change token for `db_path` (cheap: one stat plus one pragma)."""
+    dev, ino, size, mtime_ns = _file_identity(db_path)
+    with _WATCH_LOCK:
+        watcher = _WATCHERS.get(db_path)
+        if watcher is None or watcher[1] != (dev, ino):
+            if watcher is not None:
+                watcher[0].close()
+            watcher = _WATCHERS[db_path] = (_open(db_path), (dev, ino))
+        # data_version only moves for commits by other connections, which is every ingest.
+        data_version = int(watcher[0].execute("PRAGMA data_version").fetchone()[0])
+    return CatalogVersion(dev, ino, size, mtime_ns, data_version)
+
+
+def close_catalog_connections() -> None:
+    """Close this thread's connections and all watchers (e.g. before deleting a temporary DB)."""
+    for conn, _ in _THREAD.conns.values():
+        conn.close()
+    _THREAD.conns.clear()
+    with _WATCH_LOCK:
+        for conn, _ in _WATCHERS.values():
+            conn.close()
+        _WATCHERS.clear()
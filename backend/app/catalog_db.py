@@ -2,20 +2,47 @@
 
 from __future__ import annotations
 
+import itertools
 import json
-import math
+import logging
+import multiprocessing
 import os
 import sqlite3
-from contextlib import closing
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Deque, Dict, Iterator, List, Mapping, Sequence, Tuple
 
 import numpy as np
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import linear_kernel
 
-TRAITS = ["darkness", "energy", "mood", "depth", "optimism", "novelty", "comfort", "intensity", "humor"]
+try:
+    import resource
+except ImportError:  # Windows dev machines: build reports carry wall time only.
+    resource = None
+
+from .catalog_changes import changed_ids_since, current_change_seq
+from .catalog_conn import CatalogVersion, catalog_connection, catalog_version, read_transaction
+from .catalog_filters import CatalogFilterIndex, CatalogFilters
+from .catalog_schema import CATALOG_SCHEMA_VERSION, LABEL_TABLES, TRAITS_BLOB_BYTES, schema_version
+from .catalog_snapshot import (
+    load_snapshot,
+    save_snapshot,
+    shared_snapshots_enabled,
+    snapshot_build_lock,
+    snapshot_key,
+)
+from .catalog_store import TRAITS, CatalogStore
+from .trait_index import IVFTraitIndex, resolve_ivf_nlist, resolve_trait_index_kind, top_k_indices
+
 DEFAULT_CATALOG_MAX_MOVIES = 0
+_TFIDF_PARAMS: Dict[str, Any] = {"max_features": 20000, "ngram_range": (1, 2), "stop_words": "english"}
 
 _TRAIT_QUERY_HINTS: Dict[str, List[str]] = {
     "darkness": ["dark", "noir", "bleak", "mystery", "gritty"],
@@ -41,16 +68,118 @@ _DEFAULT_DB_CANDIDATES = [
     _HERE / "data" / "movies.db",
 ]
 
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable retrieval view of one catalog build.
+
+    Readers grab the current snapshot once per call and use only that object, so a rebuild that
+    swaps in a new snapshot can never expose a half-updated mix of catalog columns and matrices.
+    """
+
+    version: int
+    db_path: str
+    source: CatalogVersion
+    max_movies: int
+    store: CatalogStore
+    trait_matrix: np.ndarray
+    trait_index: IVFTraitIndex | None
+    tfidf_vectorizer: TfidfVectorizer | None
+    # Document x term TF-IDF weights in CSC layout: column t is the postings list of term t.
+    tfidf_postings: Any
+    # Catalog change-log position this snapshot reflects (None when the DB has no change log).
+    change_seq: int | None = None
+    # Share of rows vectorized against this TF-IDF fit after it was made (incremental updates).
+    text_drift: float = 0.0
+
+    @cached_property
+    def filter_index(self) -> CatalogFilterIndex:
+        # Built on the first filtered request, so unfiltered deployments never pay for it.
+        return CatalogFilterIndex(self.store)
+
+    def matches(self, db_path: str, source: CatalogVersion, max_movies: int) -> bool:
+        return self.db_path == db_path and self.source == source and self.max_movies == max_movies
+
+
 # Process-local snapshot of the active catalog. Request-time retrieval reads from here so the app
-# only pays the SQLite decode and TF-IDF build cost when the catalog source or cap changes.
-_CACHE: Dict[str, Any] = {
-    "db_path": None,
-    "mtime": None,
-    "max_movies": None,
-    "records": [],
-    "tfidf_vectorizer": None,
-    "tfidf_matrix": None,
-}
+# only pays the SQLite decode and TF-IDF build cost when the catalog source or cap changes. The
+# reference is only ever replaced as a whole, never mutated.
+_SNAPSHOT: CatalogSnapshot | None = None
+_SNAPSHOT_VERSIONS = itertools.count(1)
+# Serializes builds so concurrent requests never run the same rebuild twice.
+_BUILD_LOCK = threading.Lock()
+_REFRESH_LOCK = threading.Lock()
+_REFRESH_THREAD: threading.Thread | None = None
+
+log = logging.getLogger(__name__)
+
+_TOTAL_ROWS: Tuple[str, CatalogVersion, int] | None = None
+
+# Phase timings of the last snapshot this process built from the DB (see _BuildReport).
+_LAST_BUILD_REPORT: Dict[str, Any] | None = None
+
+
+class _QueryCache:
+    """Thread-safe bounded LRU of text-retrieval results, with hit/miss counters.
+
+    Derived queries come from a small set of trait hint combinations, so most requests repeat a
+    query string the process has already scored against the same snapshot.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(0, int(max_entries))
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[Any, np.ndarray, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[Any, ...]) -> Tuple[Any, np.ndarray, np.ndarray] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple[Any, ...], entry: Tuple[Any, np.ndarray, np.ndarray]) -> None:
+        if self.max_entries <= 0:
+            return
+        for arr in entry[1:]:
+            arr.flags.writeable = False
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+            }
+
+
+def _resolve_query_cache_size() -> int:
+    raw = (os.environ.get("CATALOG_QUERY_CACHE_SIZE") or "").strip()
+    try:
+        return max(0, int(raw)) if raw else 512
+    except Exception:
+        return 512
+
+
+# Upper bound on float32 cells in one batched trait score block (users x movies).
+_BATCH_SCORE_CELLS = 1 << 24
+
+# Keyed by (snapshot version, query text, pool size, filters); entries from replaced snapshots
+# simply age out.
+_QUERY_CACHE = _QueryCache(_resolve_query_cache_size())
 
 
 def resolve_catalog_variant() -> str:
@@ -100,13 +229,9 @@ def resolve_catalog_limit() -> int:
         return DEFAULT_CATALOG_MAX_MOVIES
     return limit if limit >= 0 else DEFAULT_CATALOG_MAX_MOVIES
 
-def _connect() -> sqlite3.Connection:
-    db_path = resolve_db_path()
-    if not os.path.exists(db_path):
-        raise FileNotFoundError(f"Catalog DB not found at: {db_path}")
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+def _connect(db_path: str | None = None) -> sqlite3.Connection:
+    """This thread's shared read-only catalog connection (see catalog_conn); never close it."""
+    return catalog_connection(db_path or resolve_db_path())
 
 
 def _as_float(v: Any, default: float = 0.0) -> float:
@@ -146,21 +271,14 @@ def _json_obj(v: Any) -> Dict[str, Any]:
     return raw if isinstance(raw, dict) else {}
 
 
-def _cosine(a: List[float], b: List[float]) -> float:
-    num = sum(x * y for x, y in zip(a, b))
-    da = math.sqrt(sum(x * x for x in a)) or 1e-9
-    db = math.sqrt(sum(y * y for y in b)) or 1e-9
-    return num / (da * db)
-
-
-def _centered_cosine01(a: List[float], b: List[float]) -> float:
-    """Cosine on centered [0,1] vectors, mapped to [0,1]."""
-    ac = [float(x) - 0.5 for x in a]
-    bc = [float(y) - 0.5 for y in b]
-    raw = _cosine(ac, bc)
-    if not math.isfinite(raw):
-        return 0.5
-    return max(0.0, min(1.0, 0.5 * (raw + 1.0)))
+def _centered_unit_rows(values: np.ndarray) -> np.ndarray:
+    """Center [0,1] trait rows on 0.5 and scale each to unit length (zero rows stay zero)."""
+    centered = np.asarray(values, dtype=np.float32) - np.float32(0.5)
+    if centered.ndim == 1:
+        centered = centered.reshape(1, -1)
+    norms = np.linalg.norm(centered, axis=1, keepdims=True)
+    np.divide(centered, norms, out=centered, where=norms > 0)
+    return centered
 
 
 def _safe_trait_map(raw: Any) -> Dict[str, float]:
@@ -182,84 +300,568 @@ def _build_doc(rec: Dict[str, Any]) -> str:
     return " ".join(p for p in parts if p).strip()
 
 
-def _rebuild_cache_if_needed() -> None:
-    db_path = resolve_db_path()
-    if not os.path.exists(db_path):
-        raise FileNotFoundError(f"Catalog DB not found at: {db_path}")
+def _snapshot_from_persisted(
+    db_path: str,
+    source: CatalogVersion,
+    max_movies: int,
+    persisted: Dict[str, Any],
+) -> CatalogSnapshot:
+    columns = dict(persisted["columns"])
+    trait_matrix = columns.pop("trait_matrix")
+    trait_index = None
+    if resolve_trait_index_kind() == "ivf" and trait_matrix.shape[0]:
+        stored = columns.get("ivf_centroids")
+        if stored is not None and stored.shape[0] == resolve_ivf_nlist(trait_matrix.shape[0]):
+            trait_index = IVFTraitIndex.from_arrays(columns)
+        else:
+            trait_index = IVFTraitIndex.build(trait_matrix)
+    meta = persisted.get("meta") or {}
+    return CatalogSnapshot(
+        version=next(_SNAPSHOT_VERSIONS),
+        db_path=db_path,
+        source=source,
+        max_movies=max_movies,
+        store=CatalogStore.from_arrays(columns),
+        trait_matrix=trait_matrix,
+        trait_index=trait_index,
+        tfidf_vectorizer=persisted["tfidf_vectorizer"],
+        tfidf_postings=persisted["tfidf_postings"],
+        change_seq=meta.get("change_seq"),
+        text_drift=float(meta.get("text_drift") or 0.0),
+    )
 
-    mtime = os.path.getmtime(db_path)
-    max_movies = resolve_catalog_limit()
-    if (
-        _CACHE["db_path"] == db_path
-        and _CACHE["mtime"] == mtime
-        and _CACHE["max_movies"] == max_movies
-    ):
+
+def _same_source_file(previous: CatalogSnapshot, db_path: str, source: CatalogVersion, max_movies: int) -> bool:
+    return (
+        previous.db_path == db_path
+        and previous.max_movies == max_movies
+        and (previous.source.dev, previous.source.ino) == (source.dev, source.ino)
+    )
+
+
+def _build_snapshot(
+    db_path: str,
+    source: CatalogVersion,
+    max_movies: int,
+    previous: CatalogSnapshot | None = None,
+) -> CatalogSnapshot:
+    if not shared_snapshots_enabled():
+        if previous is not None and _same_source_file(previous, db_path, source, max_movies):
+            # A refresh of the catalog this process already serves: patch or rebuild from the DB.
+            return _snapshot_from_db(db_path, source, max_movies, previous)
+        persisted = load_snapshot(db_path, max_movies)
+        if persisted is not None:
+            return _snapshot_from_persisted(db_path, source, max_movies, persisted)
+        return _snapshot_from_db(db_path, source, max_movies, previous)
+
+    # Shared mode: one worker per host builds and persists the snapshot, then every worker maps
+    # the same files read-only so the page cache holds a single copy of the catalog arrays.
+    with snapshot_build_lock(db_path):
+        persisted = load_snapshot(db_path, max_movies)
+        if persisted is None:
+            built = _snapshot_from_db(db_path, source, max_movies, previous)
+            persisted = load_snapshot(db_path, max_movies)
+            if persisted is None:
+                log.warning("Shared catalog snapshot was not persisted for %s; serving a private copy", db_path)
+                return built
+            del built
+    return _snapshot_from_persisted(db_path, source, max_movies, persisted)
+
+
+_MOVIE_COLUMNS = """tmdb_id, title, year, overview, poster_url, genres, keywords, director,
+                   vote_average, vote_count, popularity, providers, traits"""
+# Schema v2 reads only pull the JSON columns for rows that lack the packed layout.
+_PACKED_MOVIE_COLUMNS = """tmdb_id, title, year, overview, poster_url, director,
+                   vote_average, vote_count, popularity, providers, traits_f32,
+                   CASE WHEN traits_f32 IS NULL THEN genres END AS genres,
+                   CASE WHEN traits_f32 IS NULL THEN keywords END AS keywords,
+                   CASE WHEN traits_f32 IS NULL THEN traits END AS traits"""
+# tmdb_id breaks exact popularity/vote ties so full and incremental builds agree on row order.
+_ACTIVE_ORDER = "ORDER BY popularity DESC, vote_count DESC, tmdb_id"
+_FETCH_CHUNK = 500
+_DECODE_CHUNK = 2000
+
+
+def _decode_row(
+    r: Mapping[str, Any],
+    genres: List[str] | None = None,
+    keywords: List[str] | None = None,
+) -> Dict[str, Any]:
+    return {
+        "id": r["tmdb_id"],
+        "title": r["title"],
+        "year": r["year"],
+        "posterUrl": r["poster_url"],
+        "synopsis": r["overview"],
+        "genre": _json_list(r["genres"]) if genres is None else genres,
+        "keywords": _json_list(r["keywords"]) if keywords is None else keywords,
+        "director": r["director"],
+        "providers": _json_obj(r["providers"]),
+        "vote_average": _as_float(r["vote_average"], 0.0),
+        "vote_count": int(_as_float(r["vote_count"], 0.0)),
+        "popularity": _as_float(r["popularity"], 0.0),
+    }
+
+
+def _read_labels(cur: sqlite3.Cursor, field: str, where: str, params: Sequence[Any]) -> Dict[int, List[str]]:
+    """Side-table genres or keywords for the movies selected by `where`, in their stored order."""
+    label_table, link_table, link_column = LABEL_TABLES[field]
+    names = dict(cur.execute(f"SELECT id, name FROM {label_table}").fetchall())
+    # ORDER BY matches the link table's primary key, so SQLite streams it without a sort.
+    cur.execute(
+        f"""SELECT tmdb_id, {link_column} FROM {link_table}
+            WHERE tmdb_id IN (SELECT tmdb_id FROM movies {where})
+            ORDER BY tmdb_id, position""",
+        params,
+    )
+    out: Dict[int, List[str]] = {}
+    for mid, label_id in cur:
+        out.setdefault(mid, []).append(names[label_id])
+    return out
+
+
+def _empty_store() -> CatalogStore:
+    return CatalogStore.from_rows([], np.empty((0, len(TRAITS)), dtype=np.float64))
+
+
+def _decode_workers() -> int:
+    """Processes used to decode rows during full snapshot builds (0 or 1 decodes inline)."""
+    raw = (os.environ.get("CATALOG_DECODE_WORKERS") or "").strip()
+    try:
+        return max(0, int(raw)) if raw else 0
+    except Exception:
+        return 0
+
+
+def _decode_chunk(
+    names: Sequence[str],
+    rows: List[tuple],
+    labels: Dict[str, Dict[int, List[str]]] | None,
+) -> Tuple[CatalogStore, List[str]]:
+    """Decode one fetched chunk into a columnar store chunk and the rows' TF-IDF docs.
+
+    On a schema v2 catalog (`labels` given), rows carrying a packed traits_f32 BLOB skip JSON
+    decoding entirely: their traits come from one frombuffer over the chunk and their
+    genres/keywords from the side tables. Other rows are decoded from the JSON columns. Takes
+    plain tuples and returns compact picklable arrays so decode worker processes can run it.
+    """
+    n = len(rows)
+    maps = [dict(zip(names, row)) for row in rows]
+    traits = np.empty((n, len(TRAITS)), dtype=np.float64)
+    if labels is not None:
+        has_blob = np.fromiter(
+            (m["traits_f32"] is not None and len(m["traits_f32"]) == TRAITS_BLOB_BYTES for m in maps),
+            dtype=bool,
+            count=n,
+        )
+    else:
+        has_blob = np.zeros(n, dtype=bool)
+    if has_blob.any():
+        flat = np.frombuffer(b"".join(m["traits_f32"] for m in itertools.compress(maps, has_blob)), dtype="<f4")
+        # float32 keeps ~7 significant digits; rounding to 6 decimals restores the short decimal
+        # values ingest writes, so packed and JSON rows produce identical trait scores.
+        traits[has_blob] = np.clip(np.round(flat.reshape(-1, len(TRAITS)).astype(np.float64), 6), 0.0, 1.0)
+
+    records: List[Dict[str, Any]] = []
+    for i, m in enumerate(maps):
+        if has_blob[i]:
+            mid = m["tmdb_id"]
+            records.append(_decode_row(m, labels["genres"].get(mid, []), labels["keywords"].get(mid, [])))
+        else:
+            records.append(_decode_row(m))
+            trait_map = _safe_trait_map(m["traits"])
+            traits[i] = [trait_map[k] for k in TRAITS]
+    docs = [_build_doc(rec) or rec["title"] or "movie" for rec in records]
+    return CatalogStore.from_rows(records, traits), docs
+
+
+def _decode_chunks(chunks: Iterator[tuple], workers: int) -> Iterator[tuple]:
+    """Run `_decode_chunk` over `chunks` in order, inline or on a pool of `workers` processes."""
+    workers = min(workers, os.cpu_count() or 1)
+    if workers <= 1:
+        for args in chunks:
+            yield _decode_chunk(*args)
         return
+    # Spawn rather than fork: builds also run on the background refresh thread, and a forked child
+    # can deadlock on locks other threads held at fork time.
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        pending: Deque[Future] = deque()
+        for args in chunks:
+            pending.append(pool.submit(_decode_chunk, *args))
+            # Bound in-flight chunks so fetched but undecoded rows never pile up in memory.
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _read_movies(
+    conn: sqlite3.Connection,
+    where: str,
+    params: Sequence[Any] = (),
+    workers: int = 0,
+) -> Tuple[CatalogStore, List[str]]:
+    """Read the movie rows selected by `where` into a columnar store plus their TF-IDF docs.
+
+    Rows are streamed with fetchmany and each chunk is decoded straight into columns, so neither
+    raw rows nor per-movie dicts for the whole catalog are ever held at once.
+    """
+    cur = conn.cursor()
+    cur.row_factory = None
+    packed = schema_version(conn) >= CATALOG_SCHEMA_VERSION
+    labels = {field: _read_labels(cur, field, where, params) for field in LABEL_TABLES} if packed else None
+    columns = _PACKED_MOVIE_COLUMNS if packed else _MOVIE_COLUMNS
+    cur.execute(f"SELECT {columns} FROM movies {where}", params)
+    names = tuple(d[0] for d in cur.description)
+
+    def chunks() -> Iterator[tuple]:
+        while True:
+            rows = cur.fetchmany(_DECODE_CHUNK)
+            if not rows:
+                return
+            chunk_labels = None
+            if labels is not None:
+                # Hand each movie's labels (r[0] is tmdb_id) to exactly one chunk and drop them
+                # from the full map as the build goes.
+                chunk_labels = {
+                    field: {r[0]: by_id.pop(r[0]) for r in rows if r[0] in by_id}
+                    for field, by_id in labels.items()
+                }
+            yield names, rows, chunk_labels
+
+    parts: List[CatalogStore] = []
+    docs: List[str] = []
+    for chunk_store, chunk_docs in _decode_chunks(chunks(), workers):
+        parts.append(chunk_store)
+        docs.extend(chunk_docs)
+    if not parts:
+        return _empty_store(), docs
+    return (parts[0] if len(parts) == 1 else CatalogStore.concat(parts)), docs
+
+
+def _incremental_refresh_enabled() -> bool:
+    raw = (os.environ.get("CATALOG_INCREMENTAL_REFRESH") or "").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+def _text_drift_max() -> float:
+    """Share of the catalog that may be re-vectorized against a stale TF-IDF fit before a full refit."""
+    raw = (os.environ.get("CATALOG_TEXT_DRIFT_MAX") or "").strip()
+    try:
+        return max(0.0, float(raw)) if raw else 0.05
+    except Exception:
+        return 0.05
+
+
+def _peak_rss_mb(who: int | None = None) -> float | None:
+    """High-water RSS of this process (or of its reaped children) in MiB, when the OS reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class _BuildReport:
+    """Wall time and peak RSS after each phase of one snapshot build from the DB.
+
+    RSS is the process high-water mark, so the phase where it jumps is the one that set the peak.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.phases: List[Dict[str, Any]] = []
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases.append({"phase": phase, "seconds": round(now - self._last, 3), "peak_rss_mb": _peak_rss_mb()})
+        self._last = now
+
+    def finish(self, rows: int, decode_workers: int = 0) -> None:
+        global _LAST_BUILD_REPORT
+        report: Dict[str, Any] = {
+            "kind": self.kind,
+            "rows": rows,
+            "seconds": round(self._last - self._start, 3),
+            "phases": self.phases,
+        }
+        if decode_workers > 1 and resource is not None:
+            report["decode_workers"] = decode_workers
+            report["decode_worker_peak_rss_mb"] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+        _LAST_BUILD_REPORT = report
+        log.info(
+            "Built %s catalog snapshot of %d rows in %.2fs (%s)",
+            self.kind,
+            rows,
+            report["seconds"],
+            ", ".join(f"{p['phase']} {p['seconds']:.2f}s peak {p['peak_rss_mb']} MiB" for p in self.phases),
+        )
+
+
+def _snapshot_from_db(
+    db_path: str,
+    source: CatalogVersion,
+    max_movies: int,
+    previous: CatalogSnapshot | None = None,
+) -> CatalogSnapshot:
+    if previous is not None:
+        patched = _apply_catalog_changes(previous, db_path, source, max_movies)
+        if patched is not None:
+            return patched
 
-    # Rebuild the retrieval snapshot only when the active DB path, file mtime, or row cap changes.
     # Both the structured records and the TF-IDF matrix come from this same row set so trait and
     # text retrieval always score the exact same active catalog.
-    with closing(_connect()) as conn:
-        cur = conn.cursor()
-        query = """
-            SELECT tmdb_id, title, year, overview, poster_url, genres, keywords, director,
-                   vote_average, vote_count, popularity, providers, traits
-            FROM movies
-            ORDER BY popularity DESC, vote_count DESC
-        """
+    report = _BuildReport("full")
+    workers = _decode_workers()
+    key = snapshot_key(db_path, max_movies)
+    with read_transaction(_connect(db_path)) as conn:
+        # Read the change sequence first: anything logged after it is re-applied by the next
+        # incremental refresh, which is harmless because changed rows are re-read in full.
+        change_seq = current_change_seq(conn)
+        where = _ACTIVE_ORDER
         params: tuple[Any, ...] = ()
         if max_movies > 0:
-            query += "\nLIMIT ?"
+            where += "\nLIMIT ?"
             params = (max_movies,)
-        cur.execute(query, params)
-        rows = cur.fetchall()
-
-    records: List[Dict[str, Any]] = []
-    docs: List[str] = []
+        store, docs = _read_movies(conn, where, params, workers)
+    report.mark("read")
 
-    for idx, r in enumerate(rows):
-        traits = _safe_trait_map(r["traits"])
-        genres = _json_list(r["genres"])
-        keywords = _json_list(r["keywords"])
-        providers = _json_obj(r["providers"])
-
-        rec = {
-            "_idx": idx,
-            "id": r["tmdb_id"],
-            "title": r["title"],
-            "year": r["year"],
-            "posterUrl": r["poster_url"],
-            "synopsis": r["overview"],
-            "traits": traits,
-            "genre": genres,
-            "keywords": keywords,
-            "director": r["director"],
-            "rating": "NR",
-            "rating_source": "TMDB",
-            "where_to_watch": providers.get("US", []),
-            "providers": providers,
-            "vote_average": _as_float(r["vote_average"], 0.0),
-            "vote_count": int(_as_float(r["vote_count"], 0.0)),
-            "popularity": _as_float(r["popularity"], 0.0),
-        }
-        rec["doc"] = _build_doc(rec)
-        docs.append(rec["doc"] or rec["title"] or "movie")
-        records.append(rec)
+    # Centered, unit-length trait rows turn centered cosine into one matrix-vector product per request.
+    trait_matrix = _centered_unit_rows(store.traits)
+    trait_index = None
+    if resolve_trait_index_kind() == "ivf" and trait_matrix.shape[0]:
+        trait_index = IVFTraitIndex.build(trait_matrix)
+    report.mark("traits")
 
     # Fit the text index once per snapshot so request-time retrieval only transforms the query.
     if docs:
-        vectorizer = TfidfVectorizer(max_features=20000, ngram_range=(1, 2), stop_words="english")
-        matrix = vectorizer.fit_transform(docs)
+        vectorizer = TfidfVectorizer(**_TFIDF_PARAMS)
+        postings = vectorizer.fit_transform(docs).tocsc()
     else:
         vectorizer = None
-        matrix = None
+        postings = None
+
+    del docs
+    report.mark("text")
+
+    snapshot = _finish_snapshot(
+        db_path, source, max_movies, key, store, trait_matrix, trait_index, vectorizer, postings, change_seq, 0.0
+    )
+    report.mark("persist")
+    report.finish(len(store), workers)
+    return snapshot
+
+
+def _apply_catalog_changes(
+    previous: CatalogSnapshot,
+    db_path: str,
+    source: CatalogVersion,
+    max_movies: int,
+) -> CatalogSnapshot | None:
+    """Patch `previous` with the movies changed since it was built, or None if a full build is needed.
+
+    Only changed or newly active rows are read and decoded. Their text is transformed with the
+    previous TF-IDF fit; once the share of rows vectorized that way exceeds CATALOG_TEXT_DRIFT_MAX
+    the caller refits from scratch instead.
+    """
+    if (
+        not _incremental_refresh_enabled()
+        or previous.change_seq is None
+        or previous.tfidf_vectorizer is None
+        or previous.db_path != db_path
+        or previous.max_movies != max_movies
+    ):
+        return None
+
+    report = _BuildReport("incremental")
+    key = snapshot_key(db_path, max_movies)
+    with read_transaction(_connect(db_path)) as conn:
+        change_seq = current_change_seq(conn)
+        if change_seq is None or change_seq < previous.change_seq:
+            return None
+        changed = changed_ids_since(conn, previous.change_seq, change_seq)
+        if changed is None:
+            return None
+
+        cur = conn.cursor()
+        query = f"SELECT tmdb_id FROM movies {_ACTIVE_ORDER}"
+        params: tuple[Any, ...] = ()
+        if max_movies > 0:
+            query += "\nLIMIT ?"
+            params = (max_movies,)
+        cur.execute(query, params)
+        active_ids = [int(r[0]) for r in cur.fetchall()]
+
+        old_rows = {mid: i for i, mid in enumerate(previous.store.ids.tolist())}
+        changed_set = set(changed)
+        fetch = [mid for mid in active_ids if mid in changed_set or mid not in old_rows]
+        drift = previous.text_drift + len(fetch) / max(1, len(active_ids))
+        if drift > _text_drift_max():
+            return None
+
+        fetched: List[CatalogStore] = []
+        fetched_docs: List[str] = []
+        for lo in range(0, len(fetch), _FETCH_CHUNK):
+            chunk = fetch[lo : lo + _FETCH_CHUNK]
+            chunk_store, chunk_docs = _read_movies(conn, f"WHERE tmdb_id IN ({','.join('?' * len(chunk))})", chunk)
+            fetched.append(chunk_store)
+            fetched_docs.extend(chunk_docs)
+    report.mark("read")
+
+    fresh = CatalogStore.concat(fetched) if fetched else _empty_store()
+    fetched_rows = {mid: i for i, mid in enumerate(fresh.ids.tolist())}
+    fresh_ids = [mid for mid in fetch if mid in fetched_rows]
+    if len(fresh_ids) != len(fetch):
+        # A fetched row vanished between the two reads; the next refresh sees a consistent state.
+        return None
+    picked = np.fromiter((fetched_rows[mid] for mid in fresh_ids), dtype=np.int64, count=len(fresh_ids))
+    fresh = fresh.take(picked)
+    fresh_rows = {mid: len(previous.store) + j for j, mid in enumerate(fresh_ids)}
+    order = np.fromiter(
+        (fresh_rows[mid] if mid in fresh_rows else old_rows[mid] for mid in active_ids),
+        dtype=np.int64,
+        count=len(active_ids),
+    )
+
+    store = CatalogStore.concat([previous.store, fresh]).take(order)
+    report.mark("store")
+
+    trait_matrix = np.concatenate(
+        [np.asarray(previous.trait_matrix), _centered_unit_rows(fresh.traits).reshape(-1, len(TRAITS))]
+    )[order]
+    trait_index = None
+    if resolve_trait_index_kind() == "ivf" and trait_matrix.shape[0]:
+        if previous.trait_index is not None:
+            trait_index = previous.trait_index.reassign(trait_matrix)
+        else:
+            trait_index = IVFTraitIndex.build(trait_matrix)
+    report.mark("traits")
+
+    vectorizer = previous.tfidf_vectorizer
+    postings = previous.tfidf_postings.tocsr()
+    if fresh_ids:
+        fresh_docs = [fetched_docs[i] for i in picked]
+        postings = sparse.vstack([postings, vectorizer.transform(fresh_docs)], format="csr")
+    postings = postings[order].tocsc()
+    report.mark("text")
+
+    log.info(
+        "Applied %d catalog changes to snapshot incrementally (%d rows re-read, text drift %.3f)",
+        len(changed),
+        len(fresh_ids),
+        drift,
+    )
+    snapshot = _finish_snapshot(
+        db_path, source, max_movies, key, store, trait_matrix, trait_index, vectorizer, postings, change_seq, drift
+    )
+    report.mark("persist")
+    report.finish(len(store))
+    return snapshot
+
+
+def _finish_snapshot(
+    db_path: str,
+    source: CatalogVersion,
+    max_movies: int,
+    key: Dict[str, Any],
+    store: CatalogStore,
+    trait_matrix: np.ndarray,
+    trait_index: IVFTraitIndex | None,
+    vectorizer: TfidfVectorizer | None,
+    postings: Any,
+    change_seq: int | None,
+    text_drift: float,
+) -> CatalogSnapshot:
+    columns = dict(store.to_arrays(), trait_matrix=trait_matrix)
+    if trait_index is not None:
+        columns.update(trait_index.to_arrays())
+    meta = {"change_seq": change_seq, "text_drift": text_drift}
+    save_snapshot(db_path, max_movies, key, columns, vectorizer, postings, meta)
+
+    return CatalogSnapshot(
+        version=next(_SNAPSHOT_VERSIONS),
+        db_path=db_path,
+        source=source,
+        max_movies=max_movies,
+        store=store,
+        trait_matrix=trait_matrix,
+        trait_index=trait_index,
+        tfidf_vectorizer=vectorizer,
+        tfidf_postings=postings,
+        change_seq=change_seq,
+        text_drift=text_drift,
+    )
+
+
+def _background_refresh_enabled() -> bool:
+    raw = (os.environ.get("CATALOG_BACKGROUND_REFRESH") or "").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+def _refresh_in_background() -> None:
+    global _SNAPSHOT
+    try:
+        with _BUILD_LOCK:
+            db_path = resolve_db_path()
+            source = catalog_version(db_path)
+            max_movies = resolve_catalog_limit()
+            current = _SNAPSHOT
+            if current is not None and current.matches(db_path, source, max_movies):
+                return
+            _SNAPSHOT = _build_snapshot(db_path, source, max_movies, previous=current)
+    except Exception as e:
+        log.warning("Background catalog refresh failed; keeping the previous snapshot: %s", e)
+
+
+def _schedule_refresh() -> None:
+    """Start at most one background rebuild; extra callers keep serving the current snapshot."""
+    global _REFRESH_THREAD
+    with _REFRESH_LOCK:
+        if _REFRESH_THREAD is not None and _REFRESH_THREAD.is_alive():
+            return
+        _REFRESH_THREAD = threading.Thread(
+            target=_refresh_in_background,
+            name="catalog-snapshot-refresh",
+            daemon=True,
+        )
+        _REFRESH_THREAD.start()
+
+
+def _get_snapshot() -> CatalogSnapshot:
+    """Return the snapshot for the active catalog, building or refreshing it when needed."""
+    global _SNAPSHOT
+    db_path = resolve_db_path()
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Catalog DB not found at: {db_path}")
 
-    _CACHE["db_path"] = db_path
-    _CACHE["mtime"] = mtime
-    _CACHE["max_movies"] = max_movies
-    _CACHE["records"] = records
-    _CACHE["tfidf_vectorizer"] = vectorizer
-    _CACHE["tfidf_matrix"] = matrix
+    source = catalog_version(db_path)
+    max_movies = resolve_catalog_limit()
+    current = _SNAPSHOT
+    if current is not None and current.matches(db_path, source, max_movies):
+        return current
+
+    # Same catalog source, newer file: keep serving the old snapshot while a single background
+    # rebuild prepares its replacement.
+    if (
+        current is not None
+        and current.db_path == db_path
+        and current.max_movies == max_movies
+        and _background_refresh_enabled()
+    ):
+        _schedule_refresh()
+        return current
+
+    # Cold start or a different catalog/cap: there is nothing valid to serve, so build inline.
+    # Concurrent callers wait on the lock and then reuse the snapshot the first caller built.
+    with _BUILD_LOCK:
+        current = _SNAPSHOT
+        if current is not None and current.matches(db_path, source, max_movies):
+            return current
+        current = _build_snapshot(db_path, source, max_movies, previous=current)
+        _SNAPSHOT = current
+        return current
 
 
 def _top_traits(traits: Dict[str, float], n: int = 3) -> List[str]:
@@ -288,19 +890,263 @@ def _derive_query_text(
     return " ".join(terms).strip()
 
 
+def _top_of_row(docs: np.ndarray, scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Top-k (doc, score) pairs of one sparse score row, ties broken by doc index."""
+    if not docs.size:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    order = np.argsort(docs, kind="stable")
+    docs = docs[order]
+    scores = scores[order]
+    top = top_k_indices(scores, k)
+    return docs[top].astype(np.int64), scores[top]
+
+
+def _text_top(qv: Any, postings: Any, k: int, mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Top-k documents for one query row by walking only the postings of its terms.
+
+    Documents that share no term with the query score 0 and are never returned, so the cost scales
+    with the postings touched rather than with catalog size. Rows outside `mask` are dropped before
+    accumulation.
+    """
+    qv = qv.tocsr()
+    terms = qv.indices
+    if not terms.size:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    indptr = postings.indptr
+    docs = np.concatenate([postings.indices[indptr[t] : indptr[t + 1]] for t in terms])
+    vals = np.concatenate(
+        [postings.data[indptr[t] : indptr[t + 1]] * w for t, w in zip(terms, qv.data)]
+    ).astype(np.float64)
+    if mask is not None:
+        keep = mask[docs]
+        docs = docs[keep]
+        vals = vals[keep]
+    if not docs.size:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    matched, slot = np.unique(docs, return_inverse=True)
+    scores = np.bincount(slot, weights=vals, minlength=matched.shape[0])
+    top = top_k_indices(scores, k)
+    return matched[top].astype(np.int64), scores[top]
+
+
+def _resolve_query(
+    user_traits: Dict[str, float],
+    query_text: str | None,
+    personality_traits: Dict[str, float] | None,
+    mood_traits: Dict[str, float] | None,
+) -> str:
+    q = (query_text or "").strip()
+    if q:
+        return q
+    return _derive_query_text(user_traits, personality_traits=personality_traits, mood_traits=mood_traits)
+
+
+def _text_pools(
+    snapshot: CatalogSnapshot,
+    queries: Sequence[str],
+    k: int,
+    filters: Sequence[CatalogFilters | None],
+    masks: Sequence[np.ndarray | None],
+) -> List[tuple[np.ndarray, np.ndarray]]:
+    """Top-k text pool per query, served from the query cache where possible.
+
+    Unfiltered misses are vectorized together and scored with one sparse (queries x terms)·(terms
+    x docs) product. Accumulation follows term order exactly as in `_text_top`, so scores are
+    identical. Filtered misses walk the postings of their own query with the row mask applied.
+    """
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+    vectorizer = snapshot.tfidf_vectorizer
+    postings = snapshot.tfidf_postings
+    if vectorizer is None or postings is None:
+        return [empty for _ in queries]
+
+    pools: Dict[tuple[str, CatalogFilters | None], tuple[np.ndarray, np.ndarray]] = {}
+    missing: List[str] = []
+    for q, f, mask in zip(queries, filters, masks):
+        if not q or (q, f) in pools:
+            continue
+        cache_key = (snapshot.version, q, k, f)
+        cached = _QUERY_CACHE.get(cache_key)
+        if cached is not None:
+            pools[(q, f)] = (cached[1], cached[2])
+        elif f is None:
+            if q not in missing:
+                missing.append(q)
+        else:
+            qv = vectorizer.transform([q])
+            entry = (qv, *_text_top(qv, postings, k, mask))
+            _QUERY_CACHE.put(cache_key, entry)
+            pools[(q, f)] = (entry[1], entry[2])
+
+    if len(missing) == 1:
+        qv = vectorizer.transform(missing)
+        entry = (qv, *_text_top(qv, postings, k))
+        _QUERY_CACHE.put((snapshot.version, missing[0], k, None), entry)
+        pools[(missing[0], None)] = (entry[1], entry[2])
+    elif missing:
+        qm = vectorizer.transform(missing).tocsr()
+        scores = (qm @ postings.T).tocsr()
+        for r, q in enumerate(missing):
+            lo, hi = scores.indptr[r], scores.indptr[r + 1]
+            entry = (qm[r], *_top_of_row(scores.indices[lo:hi], scores.data[lo:hi].astype(np.float64), k))
+            _QUERY_CACHE.put((snapshot.version, q, k, None), entry)
+            pools[(q, None)] = (entry[1], entry[2])
+
+    return [pools.get((q, f), empty) for q, f in zip(queries, filters)]
+
+
+def _trait_pool(raw: np.ndarray, trait_idx: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Both pools are kept sorted by row index so fusion can align them with searchsorted.
+    order = np.argsort(trait_idx)
+    return trait_idx[order], np.clip(0.5 * (raw[order].astype(np.float64) + 1.0), 0.0, 1.0)
+
+
+def _trait_pools(
+    snapshot: CatalogSnapshot,
+    uvecs: np.ndarray,
+    k: int,
+    masks: Sequence[np.ndarray | None],
+) -> List[tuple[np.ndarray, np.ndarray]]:
+    """Top-k trait pool per user vector.
+
+    Unfiltered profiles share one (users x traits)·(traits x movies) product per chunk (or the IVF
+    index). Filtered profiles score only the rows their mask admits.
+    """
+    pools: List[tuple[np.ndarray, np.ndarray] | None] = [None] * uvecs.shape[0]
+    open_rows: List[int] = []
+    for i, mask in enumerate(masks):
+        if mask is None:
+            open_rows.append(i)
+            continue
+        rows = np.flatnonzero(mask)
+        raw = np.asarray(snapshot.trait_matrix[rows]) @ uvecs[i]
+        top = top_k_indices(raw, k)
+        pools[i] = _trait_pool(raw[top], rows[top])
+
+    if snapshot.trait_index is not None:
+        for i in open_rows:
+            idx, raw = snapshot.trait_index.search(snapshot.trait_matrix, uvecs[i], k)
+            pools[i] = _trait_pool(raw, idx)
+    elif len(open_rows) == 1:
+        raw = snapshot.trait_matrix @ uvecs[open_rows[0]]
+        idx = top_k_indices(raw, k)
+        pools[open_rows[0]] = _trait_pool(raw[idx], idx)
+    elif open_rows:
+        n_rows = int(snapshot.trait_matrix.shape[0])
+        step = max(1, _BATCH_SCORE_CELLS // max(1, n_rows))
+        for lo in range(0, len(open_rows), step):
+            chunk = open_rows[lo : lo + step]
+            block = uvecs[chunk] @ snapshot.trait_matrix.T
+            for i, raw in zip(chunk, block):
+                idx = top_k_indices(raw, k)
+                pools[i] = _trait_pool(raw[idx], idx)
+    return pools
+
+
+def _copy_row(movie: Dict[str, Any]) -> Dict[str, Any]:
+    # Rows shared by several profiles of a batch are decoded once; every caller still gets its own
+    # mutable containers.
+    out = dict(movie)
+    out["traits"] = dict(movie["traits"])
+    out["genre"] = list(movie["genre"])
+    out["where_to_watch"] = list(movie["where_to_watch"])
+    out["providers"] = {k: list(v) if isinstance(v, list) else v for k, v in movie["providers"].items()}
+    return out
+
+
+def _fuse_pools(
+    store: CatalogStore,
+    trait_pool: tuple[np.ndarray, np.ndarray],
+    text_pool: tuple[np.ndarray, np.ndarray],
+    limit: int,
+    trait_weight: float,
+    text_weight: float,
+    rows: Dict[int, Dict[str, Any]],
+    mask: np.ndarray | None = None,
+) -> List[Dict[str, Any]]:
+    trait_idx, trait_vals = trait_pool
+    text_idx, text_vals = text_pool
+    n_rows = len(store)
+
+    # Fuse over the union of both pools. Rows that only made one pool score 0 on the other side.
+    selected = np.union1d(trait_idx, text_idx)
+    if not selected.size:
+        selected = np.arange(min(limit, n_rows)) if mask is None else np.flatnonzero(mask)[:limit]
+    trait_s = np.zeros(selected.shape[0], dtype=np.float64)
+    trait_s[np.searchsorted(selected, trait_idx)] = trait_vals
+    text_s = np.zeros(selected.shape[0], dtype=np.float64)
+    text_s[np.searchsorted(selected, text_idx)] = text_vals
+
+    tw = max(0.0, float(trait_weight))
+    xw = max(0.0, float(text_weight))
+    denom = tw + xw or 1.0
+    tw /= denom
+    xw /= denom
+    fused = tw * trait_s + xw * text_s
+
+    # Only rows that can still reach the top `limit` under the rounded sort key are ordered in
+    # Python, and only the returned rows are materialized into dicts.
+    if selected.shape[0] > limit:
+        cutoff = np.partition(fused, -limit)[-limit] - 1e-4
+        keep = np.nonzero(fused >= cutoff)[0]
+    else:
+        keep = np.arange(selected.shape[0])
+
+    ranked = sorted(
+        (
+            (
+                -round(float(fused[j]), 4),
+                -round(float(trait_s[j]), 6),
+                -round(float(text_s[j]), 6),
+                str(store.title[int(selected[j])]).lower(),
+                int(selected[j]),
+                int(j),
+            )
+            for j in keep
+        )
+    )[:limit]
+
+    out: List[Dict[str, Any]] = []
+    for neg_match, neg_trait, neg_text, _, row_idx, _ in ranked:
+        base = rows.get(row_idx)
+        if base is None:
+            base = rows[row_idx] = store.row(row_idx)
+            base.update(store.ranking_features(row_idx))
+        movie = _copy_row(base)
+        movie["match"] = -neg_match
+        movie["trait_score"] = -neg_trait
+        movie["text_score"] = -neg_text
+        out.append(movie)
+    return out
+
+
+def query_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the text query cache of this process."""
+    return _QUERY_CACHE.stats()
+
+
+def snapshot_build_stats() -> Dict[str, Any] | None:
+    """Per-phase wall time and peak RSS of the last snapshot this process built from the DB."""
+    return _LAST_BUILD_REPORT
+
+
 def count_rows() -> int:
     """Return the number of movies in the active (possibly limited) catalog."""
-    _rebuild_cache_if_needed()
-    return len(_CACHE["records"])
+    return len(_get_snapshot().store)
 
 
 def count_total_rows() -> int:
-    """Return the total number of movies present in the DB table."""
-    with closing(_connect()) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM movies")
-        row = cur.fetchone()
-    return int(row[0]) if row else 0
+    """Return the total number of movies present in the DB table (counted once per catalog version)."""
+    global _TOTAL_ROWS
+    db_path = resolve_db_path()
+    source = catalog_version(db_path)
+    cached = _TOTAL_ROWS
+    if cached is not None and cached[0] == db_path and cached[1] == source:
+        return cached[2]
+    row = _connect(db_path).execute("SELECT COUNT(*) FROM movies").fetchone()
+    total = int(row[0]) if row else 0
+    _TOTAL_ROWS = (db_path, source, total)
+    return total
 
 
 def hybrid_candidates(
@@ -314,102 +1160,77 @@ def hybrid_candidates(
     text_pool: int = 800,
     trait_weight: float = 0.78,
     text_weight: float = 0.22,
+    filters: CatalogFilters | None = None,
 ) -> List[Dict[str, Any]]:
-    """Hybrid retrieval from trait-space + text-space, then weighted fusion."""
-    _rebuild_cache_if_needed()
+    """Hybrid retrieval from trait-space + text-space, then weighted fusion.
 
-    records: List[Dict[str, Any]] = _CACHE["records"]
-    if not records:
-        return []
-
-    # Score the full active catalog to avoid popularity-sliced recall loss.
-    pool = records
-
-    uvec = [float(user_traits.get(k, 0.5)) for k in TRAITS]
-
-    trait_scores: Dict[int, float] = {}
-    for rec in pool:
-        mvec = [float(rec["traits"].get(k, 0.5)) for k in TRAITS]
-        score = _centered_cosine01(uvec, mvec)
-        trait_scores[int(rec["_idx"])] = score
+    `filters` (see catalog_filters) restricts the rows both retrieval paths score.
+    """
+    return hybrid_candidates_batch(
+        [
+            {
+                "user_traits": user_traits,
+                "query_text": query_text,
+                "personality_traits": personality_traits,
+                "mood_traits": mood_traits,
+                "filters": filters,
+            }
+        ],
+        limit=limit,
+        prefilter=prefilter,
+        trait_pool=trait_pool,
+        text_pool=text_pool,
+        trait_weight=trait_weight,
+        text_weight=text_weight,
+    )[0]
 
-    trait_ranked = sorted(
-        trait_scores.items(),
-        key=lambda x: x[1],
-        reverse=True,
-    )
-    trait_top = dict(trait_ranked[: max(limit, trait_pool)])
-
-    text_scores: Dict[int, float] = {}
-    vectorizer = _CACHE["tfidf_vectorizer"]
-    matrix = _CACHE["tfidf_matrix"]
-
-    if vectorizer is not None and matrix is not None:
-        q = (query_text or "").strip()
-        if not q:
-            q = _derive_query_text(
-                user_traits,
-                personality_traits=personality_traits,
-                mood_traits=mood_traits,
-            )
-        if q:
-            pool_idx = np.array([int(rec["_idx"]) for rec in pool], dtype=np.int32)
-            qv = vectorizer.transform([q])
-            sims = linear_kernel(qv, matrix[pool_idx]).ravel()
-            order = np.argsort(sims)[::-1][: max(limit, text_pool)]
-            for j in order:
-                gidx = int(pool_idx[int(j)])
-                text_scores[gidx] = float(sims[int(j)])
 
-    selected_ids = set(trait_top.keys()) | set(text_scores.keys())
-    if not selected_ids:
-        selected_ids = {int(rec["_idx"]) for rec in pool[:limit]}
+def hybrid_candidates_batch(
+    profiles: Sequence[Dict[str, Any]],
+    limit: int = 80,
+    prefilter: int = 3000,
+    trait_pool: int = 800,
+    text_pool: int = 800,
+    trait_weight: float = 0.78,
+    text_weight: float = 0.22,
+) -> List[List[Dict[str, Any]]]:
+    """`hybrid_candidates` for many profiles against one snapshot.
 
-    tw = max(0.0, float(trait_weight))
-    xw = max(0.0, float(text_weight))
-    denom = tw + xw or 1.0
-    tw /= denom
-    xw /= denom
+    Each profile is a dict with `user_traits` and optional `query_text`, `personality_traits`,
+    `mood_traits` and `filters`. Trait scores come from one matrix-matrix product and cache misses share one
+    sparse text product; results are returned in profile order.
+    """
+    del prefilter
+    snapshot = _get_snapshot()
 
-    out: List[Dict[str, Any]] = []
-    for idx in selected_ids:
-        rec = records[idx]
-        trait_s = float(trait_top.get(idx, 0.0))
-        text_s = float(text_scores.get(idx, 0.0))
-        fused = tw * trait_s + xw * text_s
+    store = snapshot.store
+    if not len(store) or not profiles:
+        return [[] for _ in profiles]
 
-        out.append(
-            {
-                "id": rec["id"],
-                "title": rec["title"],
-                "year": rec["year"],
-                "posterUrl": rec["posterUrl"],
-                "synopsis": rec["synopsis"],
-                "traits": rec["traits"],
-                "match": round(fused, 4),
-                "trait_score": round(trait_s, 6),
-                "text_score": round(text_s, 6),
-                "genre": rec["genre"],
-                "director": rec["director"],
-                "rating": rec["rating"],
-                "rating_source": rec.get("rating_source", "TMDB"),
-                "where_to_watch": rec["where_to_watch"],
-                "providers": rec["providers"],
-                "popularity": rec["popularity"],
-                "vote_average": rec["vote_average"],
-                "vote_count": rec["vote_count"],
-            }
+    # Score the full active catalog to avoid popularity-sliced recall loss.
+    uvecs = _centered_unit_rows(
+        [[float((p.get("user_traits") or {}).get(k, 0.5)) for k in TRAITS] for p in profiles]
+    )
+    filters = [p.get("filters") for p in profiles]
+    masks = [None if f is None else snapshot.filter_index.mask(f) for f in filters]
+    trait_pools = _trait_pools(snapshot, uvecs, max(limit, trait_pool), masks)
+
+    queries = [
+        _resolve_query(
+            p.get("user_traits") or {},
+            p.get("query_text"),
+            p.get("personality_traits"),
+            p.get("mood_traits"),
         )
+        for p in profiles
+    ]
+    text_pools = _text_pools(snapshot, queries, max(limit, text_pool), filters, masks)
 
-    out.sort(
-        key=lambda m: (
-            -float(m.get("match", 0.0)),
-            -float(m.get("trait_score", 0.0)),
-            -float(m.get("text_score", 0.0)),
-            str(m.get("title", "")).lower(),
-        )
-    )
-    return out[:limit]
+    rows: Dict[int, Dict[str, Any]] = {}
+    return [
+        _fuse_pools(store, tp, xp, limit, trait_weight, text_weight, rows, mask)
+        for tp, xp, mask in zip(trait_pools, text_pools, masks)
+    ]
 
 
 def top_matches(
@@ -420,6 +1241,7 @@ def top_matches(
     query_text: str | None = None,
     personality_traits: Dict[str, float] | None = None,
     mood_traits: Dict[str, float] | None = None,
+    filters: CatalogFilters | None = None,
 ) -> List[Dict[str, Any]]:
     """
     Backward-compatible entrypoint used by the Flask app.
@@ -434,4 +1256,5 @@ def top_matches(
         query_text=query_text,
         personality_traits=personality_traits,
         mood_traits=mood_traits,
+        filters=filters,
     )
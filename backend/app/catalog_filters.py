@@ -0,0 +1,146 @@
+"""Hard catalog filters applied before candidate scoring.
+
+Filters narrow the rows that trait and text retrieval score at all, so a narrow filter shrinks the
+work per request instead of emptying a result list that was ranked over the whole catalog. List
+valued fields (genres, region providers) are served from per-label inverted row lists built once per
+snapshot; numeric ranges compare directly against the snapshot columns.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .catalog_store import CatalogStore, InternedListColumn, provider_label
+
+DEFAULT_FILTER_REGION = "US"
+
+
+@dataclass(frozen=True)
+class CatalogFilters:
+    """Normalized filter spec; hashable so it can be part of retrieval cache keys."""
+
+    genres: Tuple[str, ...] = ()
+    exclude_genres: Tuple[str, ...] = ()
+    year_min: int | None = None
+    year_max: int | None = None
+    region: str | None = None
+    providers: Tuple[str, ...] = ()
+    min_vote_count: int | None = None
+    max_vote_count: int | None = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: list(v) if isinstance(v, tuple) else v for k, v in asdict(self).items() if v not in (None, ())}
+
+
+def _str_tuple(raw: Any, field: str) -> Tuple[str, ...]:
+    if raw is None:
+        return ()
+    if isinstance(raw, str):
+        raw = [raw]
+    if not isinstance(raw, list):
+        raise ValueError(f"filters.{field} must be a string or a list of strings")
+    return tuple(sorted({str(v).strip().lower() for v in raw if str(v).strip()}))
+
+
+def _opt_int(raw: Any, field: str) -> int | None:
+    if raw is None or raw == "":
+        return None
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"filters.{field} must be an integer") from None
+
+
+def parse_catalog_filters(raw: Any) -> CatalogFilters | None:
+    """Validate a request `filters` object. Returns None when no filter is set; raises ValueError."""
+    if raw is None:
+        return None
+    if not isinstance(raw, dict):
+        raise ValueError("filters must be an object")
+
+    providers = _str_tuple(raw.get("providers"), "providers")
+    region = str(raw.get("region") or "").strip().upper() or None
+    if providers and region is None:
+        region = DEFAULT_FILTER_REGION
+    filters = CatalogFilters(
+        genres=_str_tuple(raw.get("genres"), "genres"),
+        exclude_genres=_str_tuple(raw.get("exclude_genres"), "exclude_genres"),
+        year_min=_opt_int(raw.get("year_min"), "year_min"),
+        year_max=_opt_int(raw.get("year_max"), "year_max"),
+        region=region,
+        providers=providers,
+        min_vote_count=_opt_int(raw.get("min_vote_count"), "min_vote_count"),
+        max_vote_count=_opt_int(raw.get("max_vote_count"), "max_vote_count"),
+    )
+    return None if filters == CatalogFilters() else filters
+
+
+class LabelPostings:
+    """Inverted lists from interned labels to the rows that carry them (case-insensitive lookup)."""
+
+    def __init__(self, column: InternedListColumn):
+        n_rows = len(column)
+        lengths = np.diff(column.offsets)
+        row_of_code = np.repeat(np.arange(n_rows, dtype=np.int64), lengths)
+        order = np.argsort(column.codes, kind="stable")
+        self.rows = row_of_code[order]
+        counts = np.bincount(column.codes, minlength=len(column.vocab))
+        self.offsets = np.zeros(len(column.vocab) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.labels = column.vocab.to_list()
+        self.codes: Dict[str, List[int]] = {}
+        for code, label in enumerate(self.labels):
+            self.codes.setdefault(str(label).lower(), []).append(code)
+
+    def rows_for_codes(self, codes: Iterable[int]) -> np.ndarray:
+        parts = [self.rows[self.offsets[c] : self.offsets[c + 1]] for c in codes]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def rows_for(self, labels: Iterable[str]) -> np.ndarray:
+        return self.rows_for_codes(c for label in labels for c in self.codes.get(label.lower(), ()))
+
+
+class CatalogFilterIndex:
+    """Per-snapshot filter structures over a catalog store."""
+
+    def __init__(self, store: CatalogStore):
+        self.store = store
+        self.genres = LabelPostings(store.genres)
+        self.providers = LabelPostings(store.region_providers)
+        self.region_codes: Dict[str, List[int]] = {}
+        for code, label in enumerate(self.providers.labels):
+            region = str(label).split(":", 1)[0].upper()
+            self.region_codes.setdefault(region, []).append(code)
+
+    def _rows_mask(self, rows: np.ndarray) -> np.ndarray:
+        mask = np.zeros(len(self.store), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def mask(self, filters: CatalogFilters) -> np.ndarray:
+        """Boolean row mask of catalog rows that pass every filter."""
+        store = self.store
+        mask = np.ones(len(store), dtype=bool)
+        if filters.genres:
+            mask &= self._rows_mask(self.genres.rows_for(filters.genres))
+        if filters.exclude_genres:
+            mask &= ~self._rows_mask(self.genres.rows_for(filters.exclude_genres))
+        if filters.region is not None:
+            if filters.providers:
+                rows = self.providers.rows_for(provider_label(filters.region, p) for p in filters.providers)
+            else:
+                rows = self.providers.rows_for_codes(self.region_codes.get(filters.region, ()))
+            mask &= self._rows_mask(rows)
+        # NaN years never satisfy a year bound, so undated titles drop out of year-filtered requests.
+        if filters.year_min is not None:
+            mask &= np.asarray(store.year) >= filters.year_min
+        if filters.year_max is not None:
+            mask &= np.asarray(store.year) <= filters.year_max
+        if filters.min_vote_count is not None:
+            mask &= np.asarray(store.vote_count) >= filters.min_vote_count
+        if filters.max_vote_count is not None:
+            mask &= np.asarray(store.vote_count) <= filters.max_vote_count
+        return mask
@@ -0,0 +1,183 @@
+"""Versioned layout of the catalog SQLite DB.
+
+Schema version 1 is the original layout: `traits`, `genres` and `keywords` live on `movies` as
+JSON text. Version 2 (recorded in PRAGMA user_version) adds a packed little-endian float32
+`traits_f32` BLOB and normalized `genres`/`keywords` side tables, so snapshot builds can load
+traits with one bulk `np.frombuffer` and labels with two joins instead of decoding JSON per row.
+
+Writers keep filling the JSON columns too, so tools that copy or read `movies` directly keep
+working. A row whose `traits_f32` is NULL is read from its JSON columns instead; a trigger clears
+`traits_f32` whenever a writer changes the JSON columns without rewriting the packed layout, so a
+legacy writer can never leave stale traits or labels behind.
+
+This module has no package-relative imports so ingest scripts can import it from the app dir.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import struct
+from typing import Any, Dict, Iterable, List
+
+CATALOG_SCHEMA_VERSION = 2
+
+# Same order as catalog_store.TRAITS; traits_f32 is packed in this order.
+TRAITS = ["darkness", "energy", "mood", "depth", "optimism", "novelty", "comfort", "intensity", "humor"]
+_TRAITS_STRUCT = struct.Struct("<9f")
+TRAITS_BLOB_BYTES = _TRAITS_STRUCT.size
+
+# (label table, link table, link column) for each normalized list field.
+LABEL_TABLES = {
+    "genres": ("genres", "movie_genres", "genre_id"),
+    "keywords": ("keywords", "movie_keywords", "keyword_id"),
+}
+
+_SCHEMA_V2_DDL = [
+    "CREATE TABLE IF NOT EXISTS genres (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+    """
+    CREATE TABLE IF NOT EXISTS movie_genres (
+      tmdb_id INTEGER NOT NULL,
+      position INTEGER NOT NULL,
+      genre_id INTEGER NOT NULL REFERENCES genres(id),
+      PRIMARY KEY (tmdb_id, position)
+    ) WITHOUT ROWID
+    """,
+    "CREATE TABLE IF NOT EXISTS keywords (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+    """
+    CREATE TABLE IF NOT EXISTS movie_keywords (
+      tmdb_id INTEGER NOT NULL,
+      position INTEGER NOT NULL,
+      keyword_id INTEGER NOT NULL REFERENCES keywords(id),
+      PRIMARY KEY (tmdb_id, position)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_layout_stale AFTER UPDATE OF traits, genres, keywords ON movies
+    WHEN NEW.traits_f32 IS NOT NULL AND NEW.traits_f32 IS OLD.traits_f32
+    BEGIN
+      UPDATE movies SET traits_f32 = NULL WHERE tmdb_id = NEW.tmdb_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_labels_delete AFTER DELETE ON movies
+    BEGIN
+      DELETE FROM movie_genres WHERE tmdb_id = OLD.tmdb_id;
+      DELETE FROM movie_keywords WHERE tmdb_id = OLD.tmdb_id;
+    END
+    """,
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("PRAGMA user_version").fetchone()
+    version = int(row[0]) if row else 0
+    return version if version > 0 else 1
+
+
+def _has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})").fetchall())
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Create the version 2 column, side tables and trigger, then record the version (idempotent)."""
+    cur = conn.cursor()
+    if not _has_column(conn, "movies", "traits_f32"):
+        cur.execute("ALTER TABLE movies ADD COLUMN traits_f32 BLOB")
+    for ddl in _SCHEMA_V2_DDL:
+        cur.execute(ddl)
+    if schema_version(conn) < CATALOG_SCHEMA_VERSION:
+        cur.execute(f"PRAGMA user_version = {CATALOG_SCHEMA_VERSION}")
+    conn.commit()
+
+
+def _as_unit_float(v: Any) -> float:
+    try:
+        return max(0.0, min(1.0, float(v)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def pack_traits(traits: Dict[str, Any]) -> bytes:
+    """Pack a trait map into the traits_f32 layout (missing or invalid traits become 0.0)."""
+    return _TRAITS_STRUCT.pack(*(_as_unit_float(traits.get(k, 0.0)) for k in TRAITS))
+
+
+def clean_labels(values: Iterable[Any]) -> List[str]:
+    out: List[str] = []
+    for v in values:
+        if v is None:
+            continue
+        s = str(v).strip()
+        if s:
+            out.append(s)
+    return out
+
+
+def write_movie_labels(conn: sqlite3.Connection, tmdb_id: int, field: str, values: Iterable[Any]) -> None:
+    """Replace one movie's genres or keywords in the side tables, keeping their order."""
+    label_table, link_table, link_column = LABEL_TABLES[field]
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM {link_table} WHERE tmdb_id = ?", (tmdb_id,))
+    for position, name in enumerate(clean_labels(values)):
+        cur.execute(f"INSERT OR IGNORE INTO {label_table} (name) VALUES (?)", (name,))
+        label_id = cur.execute(f"SELECT id FROM {label_table} WHERE name = ?", (name,)).fetchone()[0]
+        cur.execute(
+            f"INSERT INTO {link_table} (tmdb_id, position, {link_column}) VALUES (?, ?, ?)",
+            (tmdb_id, position, label_id),
+        )
+
+
+def write_packed_layout(
+    conn: sqlite3.Connection,
+    tmdb_id: int,
+    traits: Dict[str, Any],
+    genres: Iterable[Any],
+    keywords: Iterable[Any],
+) -> None:
+    """Write one movie's side-table labels and traits_f32 BLOB.
+
+    Call after the row's JSON columns are written: setting traits_f32 last marks the row as
+    readable from the packed layout.
+    """
+    write_movie_labels(conn, tmdb_id, "genres", genres)
+    write_movie_labels(conn, tmdb_id, "keywords", keywords)
+    conn.execute("UPDATE movies SET traits_f32 = ? WHERE tmdb_id = ?", (pack_traits(traits), tmdb_id))
+
+
+def _json_value(raw: Any, default: Any) -> Any:
+    if raw is None:
+        return default
+    try:
+        return json.loads(raw)
+    except (TypeError, ValueError):
+        return default
+
+
+def migrate_catalog(conn: sqlite3.Connection, batch_size: int = 1000) -> int:
+    """Upgrade a catalog DB to the current schema and backfill rows still in the JSON layout.
+
+    Returns the number of rows backfilled. Safe to re-run; each batch commits on its own.
+    """
+    ensure_schema(conn)
+    migrated = 0
+    while True:
+        rows = conn.execute(
+            "SELECT tmdb_id, traits, genres, keywords FROM movies WHERE traits_f32 IS NULL LIMIT ?",
+            (batch_size,),
+        ).fetchall()
+        if not rows:
+            return migrated
+        for tmdb_id, traits, genres, keywords in rows:
+            trait_map = _json_value(traits, {})
+            genre_list = _json_value(genres, [])
+            keyword_list = _json_value(keywords, [])
+            write_packed_layout(
+                conn,
+                tmdb_id,
+                trait_map if isinstance(trait_map, dict) else {},
+                genre_list if isinstance(genre_list, list) else [],
+                keyword_list if isinstance(keyword_list, list) else [],
+            )
+        conn.commit()
+        migrated += len(rows)
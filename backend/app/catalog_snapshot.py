@@ -0,0 +1,287 @@
+"""On-disk retrieval snapshots for the movie catalog.
+
+A snapshot holds everything `catalog_db` derives from the catalog rows: the columnar catalog store
+and trait matrix as named arrays, and the fitted TF-IDF vocabulary/idf plus its term postings. It is written next to the
+catalog DB so a fresh worker can memory-map it instead of decoding SQLite and refitting TF-IDF.
+In shared mode every worker on a host serves those mapped files, so they share one copy in the
+page cache; a replaced slot is unlinked and its pages are freed once the last worker drops it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from .catalog_changes import current_change_seq
+from .catalog_conn import catalog_connection, read_transaction
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: no host-wide build lock, each worker builds on its own.
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# Bump whenever the on-disk layout or the meaning of any stored array changes.
+SNAPSHOT_FORMAT_VERSION = 5
+
+_MANIFEST = "manifest.json"
+_COLUMNS_DIR = "columns"
+_BUILD_LOCK_FILE = ".build.lock"
+_HASH_CHUNK_BYTES = 1 << 20
+
+
+def snapshots_enabled() -> bool:
+    """Persisted snapshots are on by default; CATALOG_SNAPSHOT_CACHE=0 disables them."""
+    raw = (os.environ.get("CATALOG_SNAPSHOT_CACHE") or "").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+def shared_snapshots_enabled() -> bool:
+    """CATALOG_SHARED_SNAPSHOT=1 makes every worker on a host serve the one persisted, mmap'd copy."""
+    raw = (os.environ.get("CATALOG_SHARED_SNAPSHOT") or "").strip().lower()
+    return snapshots_enabled() and raw in {"1", "true", "yes", "on"}
+
+
+def snapshot_root(db_path: str) -> Path:
+    """Directory holding snapshots for one catalog DB (env override for read-only data volumes)."""
+    override = (os.environ.get("CATALOG_SNAPSHOT_DIR") or "").strip()
+    if override:
+        return Path(override)
+    return Path(f"{db_path}.snapshot")
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _wal_identity(db_path: str) -> tuple[int, int]:
+    try:
+        st = os.stat(f"{db_path}-wal")
+    except OSError:
+        return 0, 0
+    return int(st.st_size), int(st.st_mtime_ns)
+
+
+def _change_seq(db_path: str) -> int | None:
+    conn = catalog_connection(db_path)
+    with read_transaction(conn):
+        return current_change_seq(conn)
+
+
+def snapshot_key(db_path: str, max_movies: int) -> Dict[str, Any]:
+    """Identity of the catalog source a snapshot was built from.
+
+    Besides the main file's size and mtime this covers the WAL file and the change-log position,
+    since WAL-mode commits leave the main file alone until the next checkpoint.
+    """
+    st = os.stat(db_path)
+    wal_size, wal_mtime_ns = _wal_identity(db_path)
+    return {
+        "format": SNAPSHOT_FORMAT_VERSION,
+        "db_path": str(Path(db_path).resolve(strict=False)),
+        "db_size": int(st.st_size),
+        "db_mtime_ns": int(st.st_mtime_ns),
+        "wal_size": wal_size,
+        "wal_mtime_ns": wal_mtime_ns,
+        "change_seq": _change_seq(db_path),
+        "max_movies": int(max_movies),
+    }
+
+
+def _source_digest(key: Dict[str, Any]) -> str:
+    raw = json.dumps([key["db_path"], key["max_movies"]]).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def _slot_name(key: Dict[str, Any]) -> str:
+    # One slot per (format, source path, row cap); a changed DB file replaces the slot contents.
+    return "v{0}-{1}".format(key["format"], _source_digest(key))
+
+
+def _key_matches(stored: Dict[str, Any], key: Dict[str, Any], db_path: str) -> bool:
+    for field in ("format", "db_path", "max_movies", "db_size", "wal_size", "wal_mtime_ns", "change_seq"):
+        if stored.get(field) != key.get(field):
+            return False
+    if stored.get("db_mtime_ns") == key.get("db_mtime_ns"):
+        return True
+    # A touched or copied file with the same size may still hold identical content.
+    stored_hash = stored.get("db_sha256")
+    return bool(stored_hash) and stored_hash == file_sha256(db_path)
+
+
+@contextmanager
+def snapshot_build_lock(db_path: str) -> Iterator[None]:
+    """Host-wide exclusive lock around building or attaching to the snapshot of one catalog DB.
+
+    Workers that lose the race block here and then load what the winner persisted instead of
+    building their own copy. Falls back to no locking where flock is unavailable.
+    """
+    handle = None
+    if fcntl is not None:
+        try:
+            root = snapshot_root(db_path)
+            root.mkdir(parents=True, exist_ok=True)
+            handle = open(root / _BUILD_LOCK_FILE, "a+b")
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        except OSError as e:
+            log.warning("Could not lock catalog snapshot dir for %s: %s", db_path, e)
+            if handle is not None:
+                handle.close()
+                handle = None
+    try:
+        yield
+    finally:
+        if handle is not None:
+            handle.close()
+
+
+def load_snapshot(db_path: str, max_movies: int) -> Dict[str, Any] | None:
+    """Load a persisted snapshot for the current DB state, or None when missing or stale."""
+    if not snapshots_enabled():
+        return None
+    try:
+        key = snapshot_key(db_path, max_movies)
+        slot = snapshot_root(db_path) / _slot_name(key)
+        manifest_path = slot / _MANIFEST
+        if not manifest_path.exists():
+            return None
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if not _key_matches(manifest.get("key") or {}, key, db_path):
+            return None
+
+        columns: Dict[str, np.ndarray] = {
+            name: np.load(slot / _COLUMNS_DIR / f"{name}.npy", mmap_mode="r")
+            for name in manifest.get("columns") or []
+        }
+
+        vectorizer = None
+        postings = None
+        text = manifest.get("tfidf")
+        if text:
+            params = dict(text["params"])
+            params["ngram_range"] = tuple(params["ngram_range"])
+            vectorizer = TfidfVectorizer(**params)
+            terms = json.loads((slot / "tfidf_vocabulary.json").read_text(encoding="utf-8"))
+            vectorizer.vocabulary_ = {term: i for i, term in enumerate(terms)}
+            vectorizer.idf_ = np.load(slot / "tfidf_idf.npy")
+            postings = sparse.csc_matrix(
+                (
+                    np.load(slot / "tfidf_postings_data.npy", mmap_mode="r"),
+                    np.load(slot / "tfidf_postings_docs.npy", mmap_mode="r"),
+                    np.load(slot / "tfidf_postings_indptr.npy", mmap_mode="r"),
+                ),
+                shape=tuple(text["shape"]),
+                copy=False,
+            )
+    except Exception as e:
+        log.warning("Ignoring unreadable catalog snapshot for %s: %s", db_path, e)
+        return None
+
+    return {
+        "columns": columns,
+        "tfidf_vectorizer": vectorizer,
+        "tfidf_postings": postings,
+        "meta": manifest.get("meta") or {},
+    }
+
+
+def save_snapshot(
+    db_path: str,
+    max_movies: int,
+    key: Dict[str, Any],
+    columns: Dict[str, np.ndarray],
+    vectorizer: TfidfVectorizer | None,
+    postings: sparse.spmatrix | None,
+    meta: Dict[str, Any] | None = None,
+) -> bool:
+    """Persist a freshly built snapshot. Failures (e.g. read-only volumes) are logged, not raised.
+
+    `meta` holds small JSON-safe build facts (such as the catalog change sequence) that are
+    handed back unchanged by `load_snapshot`.
+    """
+    if not snapshots_enabled():
+        return False
+    try:
+        if snapshot_key(db_path, max_movies) != key:
+            # The DB changed while the snapshot was being built; let the next rebuild persist it.
+            return False
+    except OSError:
+        return False
+    root = snapshot_root(db_path)
+    slot = root / _slot_name(key)
+    tmp_dir = None
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".build-", dir=str(root)))
+
+        manifest: Dict[str, Any] = {
+            "key": dict(key, db_sha256=file_sha256(db_path)),
+            "columns": sorted(columns),
+            "tfidf": None,
+            "meta": dict(meta or {}),
+        }
+        (tmp_dir / _COLUMNS_DIR).mkdir()
+        for name, values in columns.items():
+            np.save(tmp_dir / _COLUMNS_DIR / f"{name}.npy", np.ascontiguousarray(values))
+
+        if vectorizer is not None and postings is not None:
+            csc = sparse.csc_matrix(postings)
+            terms = [""] * len(vectorizer.vocabulary_)
+            for term, i in vectorizer.vocabulary_.items():
+                terms[int(i)] = term
+            params = vectorizer.get_params()
+            manifest["tfidf"] = {
+                "shape": list(csc.shape),
+                "params": {
+                    "max_features": params["max_features"],
+                    "ngram_range": list(params["ngram_range"]),
+                    "stop_words": params["stop_words"],
+                },
+            }
+            (tmp_dir / "tfidf_vocabulary.json").write_text(json.dumps(terms, ensure_ascii=False), encoding="utf-8")
+            np.save(tmp_dir / "tfidf_idf.npy", np.asarray(vectorizer.idf_, dtype=np.float64))
+            np.save(tmp_dir / "tfidf_postings_data.npy", csc.data)
+            np.save(tmp_dir / "tfidf_postings_docs.npy", csc.indices)
+            np.save(tmp_dir / "tfidf_postings_indptr.npy", csc.indptr)
+
+        # The manifest is written last so a reader never sees a slot without all of its arrays.
+        (tmp_dir / _MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+        # Swap the finished build into place. Other workers that already mapped the old arrays keep
+        # their open file handles; the unlinked files are reclaimed once they let go.
+        if slot.exists():
+            stale = Path(tempfile.mkdtemp(prefix=".stale-", dir=str(root)))
+            os.replace(slot, stale / slot.name)
+            os.replace(tmp_dir, slot)
+            shutil.rmtree(stale, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, slot)
+        tmp_dir = None
+
+        # Slots written by older snapshot formats for the same source can never be loaded again.
+        for old in root.glob(f"v*-{_source_digest(key)}"):
+            if old.name != slot.name:
+                shutil.rmtree(old, ignore_errors=True)
+        return True
+    except Exception as e:
+        log.warning("Could not persist catalog snapshot for %s: %s", db_path, e)
+        return False
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
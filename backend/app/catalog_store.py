@@ -0,0 +1,386 @@
+"""Columnar (struct-of-arrays) storage for the active catalog snapshot.
+
+Numeric fields live in NumPy arrays, free text lives in one UTF-8 buffer per column addressed by
+offsets, and repeated labels such as genres are interned. Per-movie dicts are only built for the
+rows a request actually returns.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+TRAITS = ["darkness", "energy", "mood", "depth", "optimism", "novelty", "comfort", "intensity", "humor"]
+
+_TITLE_TOKEN = re.compile(r"[a-z0-9]+")
+_TITLE_STOPWORDS = {"the", "a", "an", "and", "of", "to", "part", "movie", "film"}
+
+
+class StringColumn:
+    """Immutable list of optional strings stored as one UTF-8 buffer plus offsets."""
+
+    __slots__ = ("data", "offsets", "nulls")
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, nulls: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+        self.nulls = nulls
+
+    @classmethod
+    def from_values(cls, values: Iterable[str | None]) -> "StringColumn":
+        chunks: List[bytes] = []
+        offsets = [0]
+        nulls: List[bool] = []
+        total = 0
+        for v in values:
+            raw = b"" if v is None else str(v).encode("utf-8")
+            chunks.append(raw)
+            total += len(raw)
+            offsets.append(total)
+            nulls.append(v is None)
+        return cls(
+            np.frombuffer(b"".join(chunks), dtype=np.uint8),
+            np.asarray(offsets, dtype=np.int64),
+            np.asarray(nulls, dtype=bool),
+        )
+
+    def __len__(self) -> int:
+        return int(self.nulls.shape[0])
+
+    def __getitem__(self, i: int) -> str | None:
+        if self.nulls[i]:
+            return None
+        return bytes(self.data[self.offsets[i] : self.offsets[i + 1]]).decode("utf-8")
+
+    def to_list(self) -> List[str | None]:
+        return [self[i] for i in range(len(self))]
+
+    def take(self, idx: np.ndarray) -> "StringColumn":
+        data, offsets = _take_segments(self.data, self.offsets, idx)
+        return StringColumn(data, offsets, self.nulls[idx])
+
+    @classmethod
+    def concat(cls, cols: Sequence["StringColumn"]) -> "StringColumn":
+        data, offsets = _concat_segments([(c.data, c.offsets) for c in cols])
+        return cls(data, offsets, np.concatenate([c.nulls for c in cols]))
+
+
+class InternedListColumn:
+    """Per-row lists of repeated labels: a shared vocabulary plus int32 codes addressed by offsets."""
+
+    __slots__ = ("vocab", "codes", "offsets")
+
+    def __init__(self, vocab: StringColumn, codes: np.ndarray, offsets: np.ndarray):
+        self.vocab = vocab
+        self.codes = codes
+        self.offsets = offsets
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[str]]) -> "InternedListColumn":
+        index: Dict[str, int] = {}
+        codes: List[int] = []
+        offsets = [0]
+        for row in rows:
+            for label in row:
+                codes.append(index.setdefault(label, len(index)))
+            offsets.append(len(codes))
+        vocab = StringColumn.from_values(sorted(index, key=index.__getitem__))
+        return cls(vocab, np.asarray(codes, dtype=np.int32), np.asarray(offsets, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return int(self.offsets.shape[0]) - 1
+
+    def row_codes(self, i: int) -> np.ndarray:
+        return self.codes[self.offsets[i] : self.offsets[i + 1]]
+
+    def __getitem__(self, i: int) -> List[str]:
+        return [self.vocab[int(c)] for c in self.row_codes(i)]
+
+    def take(self, idx: np.ndarray) -> "InternedListColumn":
+        codes, offsets = _take_segments(self.codes, self.offsets, idx)
+        return InternedListColumn(self.vocab, codes, offsets)
+
+    @classmethod
+    def concat(cls, cols: Sequence["InternedListColumn"]) -> "InternedListColumn":
+        """Rows of each column in turn, remapping later codes onto the first vocabulary (extended as needed)."""
+        first = cols[0]
+        index = {label: i for i, label in enumerate(first.vocab.to_list())}
+        added: List[str] = []
+        parts = [(first.codes, first.offsets)]
+        for col in cols[1:]:
+            remap = np.empty(len(col.vocab), dtype=np.int32)
+            for i, label in enumerate(col.vocab.to_list()):
+                code = index.get(label)
+                if code is None:
+                    code = index[label] = len(index)
+                    added.append(label)
+                remap[i] = code
+            parts.append((remap[col.codes], col.offsets))
+        vocab = StringColumn.concat([first.vocab, StringColumn.from_values(added)]) if added else first.vocab
+        codes, offsets = _concat_segments(parts)
+        return cls(vocab, codes.astype(np.int32, copy=False), offsets)
+
+
+class CatalogStore:
+    """Struct-of-arrays view over the active catalog rows, in snapshot (popularity) order."""
+
+    _STRING_FIELDS = ("title", "poster_url", "overview", "director", "providers_json")
+    _ARRAY_FIELDS = ("ids", "year", "vote_average", "vote_count", "popularity", "traits", "pop_norm", "vote_count_norm")
+    _LIST_FIELDS = ("genres", "region_providers", "title_root", "primary_genre")
+
+    def __init__(
+        self,
+        *,
+        ids: np.ndarray,
+        year: np.ndarray,
+        vote_average: np.ndarray,
+        vote_count: np.ndarray,
+        popularity: np.ndarray,
+        traits: np.ndarray,
+        title: StringColumn,
+        poster_url: StringColumn,
+        overview: StringColumn,
+        director: StringColumn,
+        providers_json: StringColumn,
+        genres: InternedListColumn,
+        region_providers: InternedListColumn,
+        pop_norm: np.ndarray,
+        vote_count_norm: np.ndarray,
+        title_root: InternedListColumn,
+        primary_genre: InternedListColumn,
+    ):
+        self.ids = ids
+        # Missing years are stored as NaN and surface as None again on materialization.
+        self.year = year
+        self.vote_average = vote_average
+        self.vote_count = vote_count
+        self.popularity = popularity
+        # Raw [0,1] trait values in TRAITS order; kept float64 so output dicts match the DB exactly.
+        self.traits = traits
+        self.title = title
+        self.poster_url = poster_url
+        self.overview = overview
+        self.director = director
+        # Provider maps are only needed for returned rows, so they stay as compact JSON text.
+        self.providers_json = providers_json
+        self.genres = genres
+        # "REGION:Provider" labels (see provider_label) so availability filters need no JSON decode.
+        self.region_providers = region_providers
+        # Ranking features derived from the columns above (see ranking_features): popularity and
+        # vote count on [0,1], and the franchise root / primary genre as 0- or 1-label lists.
+        self.pop_norm = pop_norm
+        self.vote_count_norm = vote_count_norm
+        self.title_root = title_root
+        self.primary_genre = primary_genre
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Dict[str, Any]], traits: np.ndarray | None = None) -> "CatalogStore":
+        """Build from decoded row dicts (see catalog_db row decoding for the expected keys).
+
+        `traits` is an (n, len(TRAITS)) matrix aligned with `rows`; without it each row's
+        "traits" map is read instead.
+        """
+        n = len(rows)
+        if traits is None:
+            traits = np.array([[r["traits"][k] for k in TRAITS] for r in rows], dtype=np.float64)
+        vote_count = np.fromiter((r["vote_count"] for r in rows), dtype=np.int64, count=n)
+        popularity = np.fromiter((r["popularity"] for r in rows), dtype=np.float64, count=n)
+        return cls(
+            ids=np.fromiter((int(r["id"]) for r in rows), dtype=np.int64, count=n),
+            year=np.fromiter(
+                (np.nan if r["year"] is None else float(r["year"]) for r in rows), dtype=np.float64, count=n
+            ),
+            vote_average=np.fromiter((r["vote_average"] for r in rows), dtype=np.float64, count=n),
+            vote_count=vote_count,
+            popularity=popularity,
+            traits=np.asarray(traits, dtype=np.float64).reshape(n, len(TRAITS)),
+            title=StringColumn.from_values(r["title"] for r in rows),
+            poster_url=StringColumn.from_values(r["posterUrl"] for r in rows),
+            overview=StringColumn.from_values(r["synopsis"] for r in rows),
+            director=StringColumn.from_values(r["director"] for r in rows),
+            providers_json=StringColumn.from_values(
+                json.dumps(r["providers"], ensure_ascii=False, separators=(",", ":")) for r in rows
+            ),
+            genres=InternedListColumn.from_rows(r["genre"] for r in rows),
+            region_providers=InternedListColumn.from_rows(_provider_labels(r["providers"]) for r in rows),
+            pop_norm=popularity_norm(popularity),
+            vote_count_norm=vote_count_norm(vote_count),
+            title_root=InternedListColumn.from_rows(_present(title_root(r["title"])) for r in rows),
+            primary_genre=InternedListColumn.from_rows(_present(primary_genre(r["genre"])) for r in rows),
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Flatten into named arrays for persistence."""
+        out: Dict[str, np.ndarray] = {name: getattr(self, name) for name in self._ARRAY_FIELDS}
+        for name in self._STRING_FIELDS:
+            _put_strings(out, name, getattr(self, name))
+        for name in self._LIST_FIELDS:
+            col = getattr(self, name)
+            _put_strings(out, f"{name}_vocab", col.vocab)
+            out[f"{name}_codes"] = col.codes
+            out[f"{name}_offsets"] = col.offsets
+        return out
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "CatalogStore":
+        kwargs: Dict[str, Any] = {name: arrays[name] for name in cls._ARRAY_FIELDS}
+        for name in cls._STRING_FIELDS:
+            kwargs[name] = _get_strings(arrays, name)
+        for name in cls._LIST_FIELDS:
+            kwargs[name] = InternedListColumn(
+                _get_strings(arrays, f"{name}_vocab"),
+                arrays[f"{name}_codes"],
+                arrays[f"{name}_offsets"],
+            )
+        return cls(**kwargs)
+
+    def take(self, idx: np.ndarray) -> "CatalogStore":
+        """New store holding rows `idx` in that order."""
+        idx = np.asarray(idx, dtype=np.int64)
+        kwargs: Dict[str, Any] = {name: np.asarray(getattr(self, name))[idx] for name in self._ARRAY_FIELDS}
+        for name in self._STRING_FIELDS:
+            kwargs[name] = getattr(self, name).take(idx)
+        for name in self._LIST_FIELDS:
+            kwargs[name] = getattr(self, name).take(idx)
+        return CatalogStore(**kwargs)
+
+    @classmethod
+    def concat(cls, stores: Sequence["CatalogStore"]) -> "CatalogStore":
+        """Rows of each store in turn."""
+        kwargs: Dict[str, Any] = {
+            name: np.concatenate([getattr(st, name) for st in stores]) for name in cls._ARRAY_FIELDS
+        }
+        for name in cls._STRING_FIELDS:
+            kwargs[name] = StringColumn.concat([getattr(st, name) for st in stores])
+        for name in cls._LIST_FIELDS:
+            kwargs[name] = InternedListColumn.concat([getattr(st, name) for st in stores])
+        return cls(**kwargs)
+
+    def ranking_features(self, i: int) -> Dict[str, Any]:
+        """Precomputed ranking inputs for row `i`, as underscore keys the API strips from responses.
+
+        Root and genre ids are codes in this store's vocabularies (-1 for none), so they are only
+        comparable between rows of the same snapshot.
+        """
+        root = self.title_root.row_codes(i)
+        genre = self.primary_genre.row_codes(i)
+        return {
+            "_title_root_id": int(root[0]) if root.shape[0] else -1,
+            "_primary_genre_id": int(genre[0]) if genre.shape[0] else -1,
+            "_pop_norm": float(self.pop_norm[i]),
+            "_vote_count_norm": float(self.vote_count_norm[i]),
+        }
+
+    def trait_map(self, i: int) -> Dict[str, float]:
+        return {k: float(v) for k, v in zip(TRAITS, self.traits[i])}
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """Materialize one catalog row in the public movie dict shape."""
+        year = float(self.year[i])
+        providers = json.loads(self.providers_json[i] or "{}")
+        return {
+            "id": int(self.ids[i]),
+            "title": self.title[i],
+            "year": None if np.isnan(year) else int(year),
+            "posterUrl": self.poster_url[i],
+            "synopsis": self.overview[i],
+            "traits": self.trait_map(i),
+            "genre": self.genres[i],
+            "director": self.director[i],
+            "rating": "NR",
+            "rating_source": "TMDB",
+            "where_to_watch": providers.get("US", []),
+            "providers": providers,
+            "popularity": float(self.popularity[i]),
+            "vote_average": float(self.vote_average[i]),
+            "vote_count": int(self.vote_count[i]),
+        }
+
+
+def title_root(title: str | None) -> str:
+    """First two non-stopword tokens of a title: the key franchise caps group sequels by."""
+    toks = [t for t in _TITLE_TOKEN.findall((title or "").lower()) if t not in _TITLE_STOPWORDS]
+    return " ".join(toks[:2]) if toks else ""
+
+
+def primary_genre(genres: Any) -> str:
+    """Lowercased first genre, the key genre caps group by ("" when there is none)."""
+    if isinstance(genres, list) and genres:
+        return str(genres[0]).strip().lower()
+    if isinstance(genres, str):
+        return genres.strip().lower()
+    return ""
+
+
+def popularity_norm(popularity: np.ndarray) -> np.ndarray:
+    """TMDb popularity mapped onto [0,1] (saturating at 300)."""
+    norm = np.asarray(popularity, dtype=np.float64) / 300.0
+    return np.where(norm < 1.0, norm, 1.0)
+
+
+def vote_count_norm(vote_count: np.ndarray) -> np.ndarray:
+    """log1p(vote count) mapped onto [0,1] (saturating at 5000 votes)."""
+    counts = np.asarray(vote_count, dtype=np.float64)
+    counts = np.where(counts > 0.0, counts, 0.0)
+    # math.log1p per distinct count: np.log1p can differ in the last ulp from the scalar formula.
+    uniq, inverse = np.unique(counts, return_inverse=True)
+    logs = np.array([math.log1p(v) for v in uniq.tolist()], dtype=np.float64)[inverse.reshape(-1)]
+    norm = logs / math.log(5000.0)
+    return np.where(norm < 1.0, norm, 1.0)
+
+
+def _present(label: str) -> List[str]:
+    return [label] if label else []
+
+
+def provider_label(region: str, provider: str) -> str:
+    return f"{region}:{provider}"
+
+
+def _provider_labels(providers: Dict[str, Any]) -> List[str]:
+    labels: List[str] = []
+    for region, names in providers.items():
+        if isinstance(names, list):
+            labels.extend(provider_label(str(region), str(name)) for name in names)
+    return labels
+
+
+def _take_segments(values: np.ndarray, offsets: np.ndarray, idx: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Gather variable-length segments `values[offsets[i]:offsets[i+1]]` for each i in idx."""
+    idx = np.asarray(idx, dtype=np.int64)
+    starts = offsets[idx]
+    ends = offsets[idx + 1]
+    new_offsets = np.zeros(idx.shape[0] + 1, dtype=np.int64)
+    np.cumsum(ends - starts, out=new_offsets[1:])
+    values = np.ascontiguousarray(values)
+    view = memoryview(values).cast("B")
+    width = values.dtype.itemsize
+    raw = b"".join(view[s * width : e * width] for s, e in zip(starts.tolist(), ends.tolist()))
+    return np.frombuffer(raw, dtype=values.dtype), new_offsets
+
+
+def _concat_segments(parts: Sequence[tuple[np.ndarray, np.ndarray]]) -> tuple[np.ndarray, np.ndarray]:
+    values = np.concatenate([v for v, _ in parts])
+    offsets = [np.zeros(1, dtype=np.int64)]
+    base = 0
+    for v, o in parts:
+        offsets.append(np.asarray(o[1:], dtype=np.int64) + base)
+        base += int(v.shape[0])
+    return values, np.concatenate(offsets)
+
+
+def _put_strings(out: Dict[str, np.ndarray], name: str, col: StringColumn) -> None:
+    out[f"{name}_data"] = col.data
+    out[f"{name}_offsets"] = col.offsets
+    out[f"{name}_nulls"] = col.nulls
+
+
+def _get_strings(arrays: Dict[str, np.ndarray], name: str) -> StringColumn:
+    return StringColumn(arrays[f"{name}_data"], arrays[f"{name}_offsets"], arrays[f"{name}_nulls"])
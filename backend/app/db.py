@@ -1,12 +1,17 @@
 ﻿# backend/app/db.py
 import os
+from collections import defaultdict
 from pathlib import Path
-from datetime import datetime, timezone
+from datetime import datetime, time, timezone
 
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, Index
+from sqlalchemy import create_engine, Column, Integer, Float, String, Date, DateTime, Index, case, delete, func, insert, inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.exc import OperationalError
 
+from .trait_buckets import trait_bucket
+
 # JSON type for SQLite / others
 try:
     from sqlalchemy import JSON
@@ -72,9 +77,48 @@ class Event(Base):
 
     __table_args__ = (
         Index("ix_events_session_ts", "session_id", "at"),
+        # covers the per-candidate GROUP BY in /recommend, so it never reads table rows
+        Index("ix_events_movie_aggregates", "movie_id", "at", "type", "reward", "session_id"),
     )
 
 
+class MovieDailyStat(Base):
+    """
+    Per-movie, per-UTC-day event counts, kept in step with `events` by add_to_movie_daily_stats
+    (called in the same transaction as the event inserts) and rebuilt by rebuild_movie_daily_stats.
+    reward_sum only covers click/save/finish/dismiss, the events feedback priors are built from.
+    """
+
+    __tablename__ = "movie_daily_stats"
+    movie_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    shown = Column(Integer, nullable=False, default=0)
+    clicks = Column(Integer, nullable=False, default=0)
+    saves = Column(Integer, nullable=False, default=0)
+    finishes = Column(Integer, nullable=False, default=0)
+    dismisses = Column(Integer, nullable=False, default=0)
+    reward_sum = Column(Float, nullable=False, default=0.0)
+
+
+# event type -> movie_daily_stats counter
+ROLLUP_COUNTERS = {"shown": "shown", "click": "clicks", "save": "saves", "finish": "finishes", "dismiss": "dismisses"}
+
+
+class MovieBucketExposure(Base):
+    """
+    Sessions shown a movie per UTC day and trait bucket of the user (see trait_buckets.py): each
+    (session, movie, day) counts once, under the bucket of its first shown event with a
+    user_traits payload. Maintained like MovieDailyStat, by add_to_bucket_exposure and
+    rebuild_bucket_exposure.
+    """
+
+    __tablename__ = "movie_bucket_exposure"
+    movie_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    shown = Column(Integer, nullable=False, default=0)
+
+
 class LinUCBSnapshot(Base):
     """
     Minimal snapshot table so bandit.py can import it.
@@ -101,3 +145,192 @@ def init_db():
     except OperationalError as e:
         if "already exists" not in str(e).lower():
             raise
+
+
+def ensure_event_indexes(eng=None):
+    """
+    Add Event indexes introduced after the events table was created (create_all skips existing
+    tables). Building one scans the whole table and holds the write lock meanwhile, so this runs
+    from scripts/backfill_event_rollups.py, not at app boot. Returns the names it created.
+    """
+    eng = eng or get_engine()
+    existing = {idx["name"] for idx in inspect(eng).get_indexes(Event.__tablename__)}
+    created = []
+    for idx in Event.__table__.indexes:
+        if idx.name in existing:
+            continue
+        try:
+            idx.create(eng)
+        except OperationalError as e:
+            if "already exists" not in str(e).lower():
+                raise
+            continue
+        created.append(idx.name)
+    return created
+
+
+# -------------- Daily rollup ------------
+
+def _utc_day(ts):
+    if ts is None:
+        ts = datetime.now(timezone.utc)
+    elif ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).date()
+
+
+def add_to_movie_daily_stats(session, events) -> None:
+    """
+    Fold new Event objects into movie_daily_stats. Runs in the caller's transaction, so the
+    counters commit (or roll back) together with the events themselves.
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(ROLLUP_COUNTERS.values(), 0) | {"reward_sum": 0.0})
+    for ev in events:
+        counter = ROLLUP_COUNTERS.get(ev.type)
+        if counter is None or not ev.movie_id:
+            continue
+        row = deltas[(str(ev.movie_id), _utc_day(ev.ts))]
+        row[counter] += 1
+        if counter != "shown":
+            row["reward_sum"] += float(ev.reward or 0.0)
+    _add_increments(session, MovieDailyStat, ("movie_id", "day"), deltas)
+
+
+def _event_bucket(features):
+    return trait_bucket(features.get("user_traits") if isinstance(features, dict) else None)
+
+
+def add_to_bucket_exposure(session, events) -> None:
+    """
+    Fold new "shown" Event objects into movie_bucket_exposure, in the caller's transaction. A
+    (session, movie, day) that already has a bucketed shown event in `events` is not counted again.
+    """
+    fresh = {}
+    for ev in events:
+        if ev.type != "shown" or not ev.movie_id or not ev.session_id:
+            continue
+        bucket = _event_bucket(ev.features)
+        if bucket is not None:
+            fresh.setdefault((str(ev.session_id), str(ev.movie_id), _utc_day(ev.ts)), bucket)
+    if not fresh:
+        return
+
+    # Flush so the new rows have ids and can be told apart from earlier ones.
+    session.flush()
+    new_ids = [ev.id for ev in events if ev.id is not None]
+    first_day = min(day for _, _, day in fresh)
+    earlier = (
+        select(Event.session_id, Event.movie_id, Event.ts, Event.features)
+        .where(Event.type == "shown")
+        .where(Event.session_id.in_({sid for sid, _, _ in fresh}))
+        .where(Event.movie_id.in_({mid for _, mid, _ in fresh}))
+        .where(Event.ts >= datetime.combine(first_day, time.min, tzinfo=timezone.utc))
+        .where(Event.id.not_in(new_ids))
+    )
+    for sid, mid, ts, feats in session.execute(earlier).all():
+        key = (str(sid), str(mid), _utc_day(ts))
+        if key in fresh and _event_bucket(feats) is not None:
+            del fresh[key]
+
+    deltas = defaultdict(lambda: {"shown": 0})
+    for (_, movie_id, day), bucket in fresh.items():
+        deltas[(movie_id, day, bucket)]["shown"] += 1
+    _add_increments(session, MovieBucketExposure, ("movie_id", "day", "bucket"), deltas)
+
+
+def add_event_rollups(session, events) -> None:
+    """Update every rollup table for new Event objects before the caller commits them."""
+    events = list(events)
+    add_to_movie_daily_stats(session, events)
+    add_to_bucket_exposure(session, events)
+
+
+def _add_increments(session, model, key_names, deltas) -> None:
+    """Add {key tuple: {column: delta}} to `model` rows, inserting rows that do not exist yet."""
+    if not deltas:
+        return
+    dialect = session.get_bind().dialect.name
+    upsert = {"sqlite": sqlite_insert, "postgresql": pg_insert}.get(dialect)
+    for key, values in deltas.items():
+        ident = dict(zip(key_names, key))
+        if upsert is not None:
+            stmt = upsert(model).values(**ident, **values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(key_names),
+                set_={name: getattr(model, name) + stmt.excluded[name] for name in values},
+            )
+            session.execute(stmt)
+            continue
+        row = session.get(model, key)
+        if row is None:
+            session.add(model(**ident, **values))
+        else:
+            for name, delta in values.items():
+                setattr(row, name, getattr(row, name) + delta)
+
+
+def rebuild_movie_daily_stats(engine=None) -> int:
+    """
+    Recompute movie_daily_stats from `events` in one transaction; returns the number of rows.
+    Safe while the app is writing: SQLite holds the write lock for the whole rebuild, and on
+    PostgreSQL event inserts wait on a SHARE lock until it commits.
+    """
+    eng = engine or get_engine()
+    # SQLite stores "at" as UTC text; PostgreSQL would otherwise use the session time zone
+    day = func.date(func.timezone("UTC", Event.ts) if eng.dialect.name == "postgresql" else Event.ts)
+    counts = [func.sum(case((Event.type == etype, 1), else_=0)) for etype in ROLLUP_COUNTERS]
+    reward_sum = func.sum(case((Event.type.in_([t for t in ROLLUP_COUNTERS if t != "shown"]), Event.reward), else_=0.0))
+    rollup = (
+        select(Event.movie_id, day, *counts, reward_sum)
+        .where(Event.movie_id.is_not(None))
+        .where(Event.ts.is_not(None))
+        .where(Event.type.in_(list(ROLLUP_COUNTERS)))
+        .group_by(Event.movie_id, day)
+    )
+    with eng.begin() as conn:
+        if eng.dialect.name == "postgresql":
+            conn.exec_driver_sql("LOCK TABLE events IN SHARE MODE")
+        conn.execute(delete(MovieDailyStat))
+        conn.execute(
+            insert(MovieDailyStat).from_select(
+                ["movie_id", "day", *ROLLUP_COUNTERS.values(), "reward_sum"],
+                rollup,
+            )
+        )
+        return int(conn.execute(select(func.count()).select_from(MovieDailyStat)).scalar() or 0)
+
+
+def rebuild_bucket_exposure(engine=None, batch_size: int = 10000) -> int:
+    """
+    Recompute movie_bucket_exposure from shown events in one transaction; returns the number of
+    rows. Buckets come from each event's features JSON, so this decodes every shown event once;
+    like add_to_bucket_exposure, only the first bucketed event per (session, movie, day) counts.
+    """
+    eng = engine or get_engine()
+    shown = (
+        select(Event.session_id, Event.movie_id, Event.ts, Event.features)
+        .where(Event.type == "shown")
+        .where(Event.movie_id.is_not(None))
+        .where(Event.session_id.is_not(None))
+        .where(Event.ts.is_not(None))
+        .order_by(Event.id)
+    )
+    counted = set()
+    counts = defaultdict(int)
+    with eng.begin() as conn:
+        if eng.dialect.name == "postgresql":
+            conn.exec_driver_sql("LOCK TABLE events IN SHARE MODE")
+        conn.execute(delete(MovieBucketExposure))
+        for session_id, movie_id, ts, feats in conn.execution_options(yield_per=batch_size).execute(shown):
+            bucket = _event_bucket(feats)
+            if bucket is None:
+                continue
+            visit = (str(session_id), str(movie_id), _utc_day(ts))
+            if visit in counted:
+                continue
+            counted.add(visit)
+            counts[(visit[1], visit[2], bucket)] += 1
+        rows = [{"movie_id": m, "day": d, "bucket": b, "shown": n} for (m, d, b), n in counts.items()]
+        for start in range(0, len(rows), batch_size):
+            conn.execute(insert(MovieBucketExposure), rows[start:start + batch_size])
+    return len(rows)
@@ -0,0 +1,263 @@
+"""Write-behind queue for event inserts.
+
+With MM_EVENT_WRITE_BEHIND set, /recommend and /event hand their Event rows (and LinUCB updates)
+to a bounded in-process queue instead of committing them in the request. One background thread
+drains it, writing each batch of up to MM_EVENT_FLUSH_BATCH items, their rollup counters and
+bandit updates in a single transaction, so SQLite workers contend for the write lock once per
+batch rather than once per request. A batch is written when it is full or MM_EVENT_FLUSH_MS after
+its first item arrived, and whatever is queued is flushed at interpreter exit.
+
+When the queue is full new items are dropped and counted; `stats()` reports depth, drops and
+write totals for /health.
+
+Queued shown events are not in the DB yet, so the shown-event dedupe in /recommend also asks
+`pending_shown`, which covers (session, movie) pairs queued here and those written in the last
+RECENT_SHOWN_S seconds (the gap between a request's DB lookup and its dedupe check). It only
+knows this process's queue; another worker's unflushed events stay invisible until written.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .db import Event, SessionLocal, add_event_rollups
+
+log = logging.getLogger(__name__)
+
+# (movie_id, feature vector, reward) for LinUCB.update
+BanditUpdate = Tuple[str, Any, float]
+
+RECENT_SHOWN_S = 60.0
+
+
+@dataclass
+class _Item:
+    events: List[Dict[str, Any]]
+    bandit: Optional[BanditUpdate] = None
+
+    def shown_keys(self) -> List[Tuple[str, str]]:
+        return [
+            (str(ev.get("session_id") or ""), str(ev.get("movie_id")))
+            for ev in self.events
+            if ev.get("type") == "shown"
+        ]
+
+
+def write_events(session, events: Sequence[Dict[str, Any]], bandit_model=None, bandit: Optional[BanditUpdate] = None) -> None:
+    """Add Event rows, their rollup counters and an optional bandit update to `session` (no commit)."""
+    rows = [Event(**kw) for kw in events]
+    session.add_all(rows)
+    add_event_rollups(session, rows)
+    if bandit is not None and bandit_model is not None:
+        movie_id, x, reward = bandit
+        bandit_model.update(session, movie_id, x, reward, commit=False)
+
+
+class EventWriter:
+    def __init__(self, bandit_model=None, max_queue: int = 10000, batch_size: int = 256, flush_ms: float = 200.0):
+        self.bandit_model = bandit_model
+        self.batch_size = max(1, int(batch_size))
+        self.flush_s = max(0.0, float(flush_ms)) / 1000.0
+        self._queue: "queue.Queue[_Item | None]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self._counters = {
+            "enqueued": 0,
+            "dropped": 0,
+            "written_events": 0,
+            "batches": 0,
+            "failed_items": 0,
+        }
+        self._last_batch_ms = 0.0
+        # (session_id, movie_id) of shown events still queued, and of those written recently.
+        self._pending_shown: Counter[Tuple[str, str]] = Counter()
+        self._recent_shown: Dict[Tuple[str, str], float] = {}
+        self._recent_order: Deque[Tuple[float, Tuple[str, str]]] = deque()
+
+    def submit(self, events: Sequence[Dict[str, Any]], bandit: Optional[BanditUpdate] = None) -> bool:
+        """Queue Event kwargs (plus a bandit update) to be written together; False if dropped."""
+        if not events and bandit is None:
+            return True
+        self._ensure_thread()
+        item = _Item(list(events), bandit)
+        shown = item.shown_keys()
+        with self._lock:
+            self._pending_shown.update(shown)
+        try:
+            if self._closed:
+                raise queue.Full
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self._release_pending(shown)
+                self._counters["dropped"] += 1
+            return False
+        with self._lock:
+            self._counters["enqueued"] += 1
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is written (or `timeout` passes)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.002)
+        return True
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop accepting items, write what is queued and stop the thread."""
+        self._closed = True
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def pending_shown(self, session_id: str, movie_ids: Iterable[Any]) -> Set[str]:
+        """Movies in `movie_ids` with a shown event for `session_id` queued or just written."""
+        sid = str(session_id or "")
+        with self._lock:
+            self._prune_recent(time.monotonic())
+            return {
+                str(mid)
+                for mid in movie_ids
+                if (sid, str(mid)) in self._pending_shown or (sid, str(mid)) in self._recent_shown
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+        out["depth"] = self._queue.qsize()
+        out["capacity"] = self._queue.maxsize
+        out["last_batch_ms"] = round(self._last_batch_ms, 3)
+        return out
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="event-write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.flush_s
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._write(batch)
+            finally:
+                self._settle(batch)
+                for _ in batch:
+                    self._queue.task_done()
+        # close() was called: write whatever is still queued.
+        rest: List[_Item] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            if item is not None:
+                rest.append(item)
+        for start in range(0, len(rest), self.batch_size):
+            self._write(rest[start:start + self.batch_size])
+            self._settle(rest[start:start + self.batch_size])
+
+    def _settle(self, batch: List[_Item]) -> None:
+        """Move the batch's shown keys from pending to recently written."""
+        now = time.monotonic()
+        with self._lock:
+            for item in batch:
+                keys = item.shown_keys()
+                self._release_pending(keys)
+                for key in keys:
+                    self._recent_shown[key] = now
+                    self._recent_order.append((now, key))
+            self._prune_recent(now)
+
+    def _release_pending(self, keys: List[Tuple[str, str]]) -> None:
+        for key in keys:
+            self._pending_shown[key] -= 1
+            if self._pending_shown[key] <= 0:
+                del self._pending_shown[key]
+
+    def _prune_recent(self, now: float) -> None:
+        while self._recent_order and now - self._recent_order[0][0] > RECENT_SHOWN_S:
+            at, key = self._recent_order.popleft()
+            if self._recent_shown.get(key) == at:
+                del self._recent_shown[key]
+
+    def _write(self, batch: List[_Item]) -> None:
+        started = time.perf_counter()
+        if not self._commit(batch):
+            # One bad item should not cost the rest of the batch: retry them one by one.
+            for item in batch:
+                if self._commit([item]):
+                    continue
+                # Like the synchronous path, a failed bandit update must not lose the event itself.
+                if item.bandit is not None and self._commit([_Item(item.events)]):
+                    continue
+                with self._lock:
+                    self._counters["failed_items"] += 1
+        self._last_batch_ms = (time.perf_counter() - started) * 1000.0
+
+    def _commit(self, batch: List[_Item]) -> bool:
+        dbs = SessionLocal()
+        try:
+            for item in batch:
+                write_events(dbs, item.events, self.bandit_model, item.bandit)
+            dbs.commit()
+        except Exception as e:
+            dbs.rollback()
+            if len(batch) == 1:
+                log.warning("Queued event write failed: %s", e)
+            return False
+        finally:
+            dbs.close()
+        with self._lock:
+            self._counters["written_events"] += sum(len(item.events) for item in batch)
+            self._counters["batches"] += 1
+        return True
+
+
+_WRITER: EventWriter | None = None
+_WRITER_LOCK = threading.Lock()
+
+
+def get_event_writer(bandit_model=None, **kwargs: Any) -> EventWriter:
+    """The process-wide writer, created on first use and flushed at interpreter exit."""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = EventWriter(bandit_model=bandit_model, **kwargs)
+            atexit.register(_WRITER.close)
+        return _WRITER
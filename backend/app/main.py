@@ -1,4 +1,6 @@
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 import hashlib
@@ -8,20 +10,31 @@ import math
 import os
 import random
 import re
-from typing import Any, Dict, Iterable, List, Set, Tuple
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
 
+import numpy as np
 from flask import Blueprint, jsonify, request
+from sqlalchemy import String, and_, case, cast, func, or_, select
 
 from .traits import answers_to_traits, summarize_traits
 from .bandit import LinUCB, features
-from .db import Event, SessionLocal, init_db
+from .catalog_filters import parse_catalog_filters
+from .catalog_store import popularity_norm, primary_genre, title_root, vote_count_norm
+from .db import Event, MovieBucketExposure, MovieDailyStat, SessionLocal, init_db
+from .event_writer import EventWriter, get_event_writer, write_events
 from .tmdb import enrich_movie_by_title_year
+from .trait_buckets import dissimilar_bucket_mask
 from app.catalog_db import (
     count_rows,
     count_total_rows,
+    hybrid_candidates_batch,
+    query_cache_stats,
     resolve_active_catalog_variant,
     resolve_catalog_limit,
     resolve_db_path,
+    snapshot_build_stats,
     top_matches,
 )
 
@@ -118,6 +131,20 @@ DISSIMILAR_HOT_MIN = max(1, _env_int("MM_DISSIMILAR_HOT_MIN", 5))
 DISSIMILAR_OVERLAP_CAP = max(0, _env_int("MM_DISSIMILAR_OVERLAP_CAP", 2))
 RELEVANCE_FLOOR_TEXT_BLEND = _clamp01(_env_float("MM_RELEVANCE_FLOOR_TEXT_BLEND", 0.18))
 SHOWN_EVENT_DEDUPE_MINUTES = max(1, _env_int("MM_SHOWN_EVENT_DEDUPE_MINUTES", 30))
+# Read feedback priors and global shown counts from movie_daily_stats (whole UTC days) instead of events.
+EVENT_ROLLUP_READS = (os.environ.get("MM_EVENT_ROLLUP_READS") or "").strip().lower() in {"1", "true", "yes", "on"}
+# Read dissimilar exposure from movie_bucket_exposure (trait-grid buckets) instead of scanning shown sessions.
+DISSIMILAR_BUCKET_READS = (os.environ.get("MM_DISSIMILAR_BUCKET_READS") or "").strip().lower() in {"1", "true", "yes", "on"}
+BATCH_MAX_PROFILES = max(1, _env_int("MM_BATCH_MAX_PROFILES", 256))
+# Queue event writes for a background thread instead of committing them in the request (event_writer.py).
+EVENT_WRITE_BEHIND = (os.environ.get("MM_EVENT_WRITE_BEHIND") or "").strip().lower() in {"1", "true", "yes", "on"}
+EVENT_QUEUE_SIZE = max(1, _env_int("MM_EVENT_QUEUE_SIZE", 10000))
+EVENT_FLUSH_BATCH = max(1, _env_int("MM_EVENT_FLUSH_BATCH", 256))
+EVENT_FLUSH_MS = max(0.0, _env_float("MM_EVENT_FLUSH_MS", 200.0))
+# Run the event-context lookups of a /recommend concurrently on a shared pool of this many threads
+# (0 runs them in sequence); a lookup still running after the deadline is replaced by neutral values.
+EVENT_LOOKUP_WORKERS = max(0, _env_int("MM_EVENT_LOOKUP_WORKERS", 0))
+EVENT_LOOKUP_DEADLINE_MS = max(1.0, _env_float("MM_EVENT_LOOKUP_DEADLINE_MS", 250.0))
 
 
 def init_app(app):
@@ -138,6 +165,17 @@ def init_app(app):
         RETRIEVER = None
 
 
+def _event_writer() -> EventWriter | None:
+    if not EVENT_WRITE_BEHIND:
+        return None
+    return get_event_writer(
+        bandit_model=LINUCB,
+        max_queue=EVENT_QUEUE_SIZE,
+        batch_size=EVENT_FLUSH_BATCH,
+        flush_ms=EVENT_FLUSH_MS,
+    )
+
+
 # Keep automated liveness checks on /ping. /health intentionally inspects catalog readiness and may
 # warm the catalog cache, which is too expensive for low-memory Render health probes.
 @bp.get("/ping")
@@ -168,6 +206,7 @@ def health():
             import_error = str(e)
     else:
         import_error = f"Catalog DB not found at {db_path}"
+    writer = _event_writer()
 
     return {
         "status": "ok",
@@ -178,6 +217,10 @@ def health():
         "catalog_active_limit": active_limit,
         "catalog_variant": resolve_active_catalog_variant(db_path),
         "db_path": db_path.replace("\\", "/"),
+        "catalog_query_cache": query_cache_stats(),
+        "catalog_snapshot_build": snapshot_build_stats(),
+        "event_queue": writer.stats() if writer is not None else None,
+        "event_lookups": _event_lookup_stats(),
         "algo": ALGO_TAG,
     }
 
@@ -228,225 +271,465 @@ def _dedupe(cands: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
 
 
 def _title_root(title: str) -> str:
-    toks = re.findall(r"[a-z0-9]+", (title or "").lower())
-    stop = {"the", "a", "an", "and", "of", "to", "part", "movie", "film"}
-    toks = [t for t in toks if t not in stop]
-    return " ".join(toks[:2]) if toks else ""
+    return title_root(title)
 
 
 def _primary_genre(movie: Dict[str, Any]) -> str:
-    g = movie.get("genre")
-    if isinstance(g, list) and g:
-        return str(g[0]).strip().lower()
-    if isinstance(g, str):
-        return g.strip().lower()
-    return ""
+    return primary_genre(movie.get("genre"))
 
 
-def _get_recently_seen_ids(session_id: str, lookback_days: int = 14) -> Set[str]:
-    cutoff_dt = datetime.now(timezone.utc) - timedelta(days=lookback_days)
-    dbs = SessionLocal()
-    try:
-        q = dbs.query(Event).filter(Event.session_id == session_id)
-        q = q.filter(Event.ts >= cutoff_dt)
-        q = q.filter(Event.type.in_(tuple(INTERACTION_TYPES)))
-        return {str(e.movie_id) for e in q.all() if e.movie_id}
-    except Exception:
-        return set()
-    finally:
-        dbs.close()
+def _precomputed(cands: Sequence[Dict[str, Any]], key: str) -> List[Any] | None:
+    """Per-candidate snapshot feature `key` (see CatalogStore.ranking_features), or None if any lacks it."""
+    values = [m.get(key) for m in cands]
+    return None if any(v is None for v in values) else values
+
+
+@dataclass(frozen=True)
+class CandidateEvents:
+    """Event aggregates over the candidate movies of one ranking pass."""
+
+    feedback_priors: Dict[str, float]
+    global_shown_counts: Dict[str, int]
+    dissimilar_exposure_counts: Dict[str, int]
+
+
+@dataclass(frozen=True)
+class SessionEvents:
+    """Event aggregates over the requesting session."""
+
+    session_adjustments: Dict[str, float]
+    recently_seen_ids: Set[str]
+    # Candidate movies this session was shown within SHOWN_EVENT_DEDUPE_MINUTES.
+    recently_logged_shown_ids: Set[str]
+
+
+@dataclass(frozen=True)
+class EventContext:
+    """Everything one /recommend ranking pass reads from the event store, loaded up front."""
+
+    candidates: CandidateEvents
+    session: SessionEvents
+    # Wall time per lookup, and lookups that missed the deadline and were replaced by neutral values.
+    lookup_ms: Dict[str, float] = field(default_factory=dict)
+    timed_out: Tuple[str, ...] = ()
+    # False when the lookups ran inline (no pool, or the pool was saturated).
+    concurrent: bool = False
+
 
+def _cutoff(days: float = 0.0, minutes: float = 0.0) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=days, minutes=minutes)
 
-def _get_feedback_priors(movie_ids: List[str], lookback_days: int = 180) -> Dict[str, float]:
-    if not movie_ids:
-        return {}
+
+def _load_candidate_events(
+    movie_ids: List[str],
+    user_traits: Dict[str, float],
+    exclude_session_id: str | None = None,
+    feedback_lookback_days: int = 180,
+    repeat_lookback_days: int = 14,
+    dissimilar_lookback_days: int = 30,
+    sim_max: float = 0.42,
+    use_rollup: bool | None = None,
+    use_buckets: bool | None = None,
+) -> CandidateEvents:
+    """Feedback priors, global shown counts and dissimilar exposure for `movie_ids`.
+
+    Reward sums and event counts are GROUP BY aggregates, so only one row per candidate comes
+    back. With `use_rollup` (default EVENT_ROLLUP_READS) they are summed from movie_daily_stats
+    instead, so their cost no longer grows with the events table; see `_rollup_totals`.
+
+    Dissimilar exposure needs each session's shown movies and profile, so it reads (session,
+    movie, features) rows of shown events in its window; `features` is fetched as text and decoded
+    only for the one event per session whose profile is used. Those rows come back in (movie_id,
+    id) order, the order the movie_id index used to return them in, so the per-session profile
+    pick is unchanged. With `use_buckets` (default DISSIMILAR_BUCKET_READS) it is summed from
+    movie_bucket_exposure instead; see `_bucket_dissimilar_counts`.
+    """
     ids = [str(x) for x in movie_ids if x is not None]
     if not ids:
-        return {}
-
-    cutoff_dt = datetime.now(timezone.utc) - timedelta(days=lookback_days)
-    sums = defaultdict(float)
-    counts = defaultdict(int)
+        return CandidateEvents({}, {}, {})
+
+    feedback_cut = _cutoff(days=feedback_lookback_days)
+    repeat_cut = _cutoff(days=repeat_lookback_days)
+    dissimilar_cut = _cutoff(days=dissimilar_lookback_days)
+    feedback = and_(Event.type.in_(tuple(INTERACTION_TYPES)), Event.ts >= feedback_cut)
+    repeat = and_(Event.type == "shown", Event.ts >= repeat_cut)
+    if exclude_session_id:
+        repeat = and_(repeat, Event.session_id != exclude_session_id)
+    totals_stmt = (
+        select(
+            Event.movie_id,
+            func.sum(case((feedback, Event.reward), else_=None)),
+            func.count(case((feedback, 1), else_=None)),
+            func.count(case((repeat, 1), else_=None)),
+        )
+        .where(Event.movie_id.in_(ids))
+        .where(or_(feedback, repeat))
+        .group_by(Event.movie_id)
+    )
+    shown_stmt = (
+        select(Event.session_id, Event.movie_id, cast(Event.features, String))
+        .where(Event.movie_id.in_(ids))
+        .where(Event.type == "shown")
+        .where(Event.ts >= dissimilar_cut)
+        .where(Event.session_id.is_not(None))
+        .order_by(Event.movie_id, Event.id)
+    )
 
+    sums: Dict[str, float] = defaultdict(float)
+    counts: Dict[str, int] = defaultdict(int)
+    shown_counts: Dict[str, int] = {}
+    by_session_movies: Dict[str, Set[str]] = defaultdict(set)
+    by_session_traits: Dict[str, List[float]] = {}
+    if use_rollup is None:
+        use_rollup = EVENT_ROLLUP_READS
+    if use_buckets is None:
+        use_buckets = DISSIMILAR_BUCKET_READS
+    target = _vec_from_user(user_traits)
+    bucket_dissimilar: Dict[str, int] | None = None
     dbs = SessionLocal()
     try:
-        rows = (
-            dbs.query(Event)
-            .filter(Event.movie_id.in_(ids))
-            .filter(Event.ts >= cutoff_dt)
-            .filter(Event.type.in_(tuple(INTERACTION_TYPES)))
-            .all()
-        )
-        for e in rows:
-            mid = str(e.movie_id)
-            sums[mid] += _safe_float(e.reward, 0.0)
-            counts[mid] += 1
+        if use_rollup:
+            totals = _rollup_totals(dbs, ids, feedback_cut, repeat_cut, exclude_session_id)
+        else:
+            totals = dbs.execute(totals_stmt).all()
+        if use_buckets:
+            bucket_dissimilar = _bucket_dissimilar_counts(dbs, ids, target, dissimilar_cut, sim_max)
+            shown_rows = []
+        else:
+            shown_rows = dbs.execute(shown_stmt).all()
     except Exception:
-        return {mid: 0.5 for mid in ids}
+        return CandidateEvents({mid: 0.5 for mid in ids}, {}, {})
     finally:
         dbs.close()
 
+    for movie_id, reward_sum, feedback_count, repeat_count in totals:
+        mid = str(movie_id)
+        sums[mid] = _safe_float(reward_sum, 0.0)
+        counts[mid] = int(feedback_count or 0)
+        if repeat_count:
+            shown_counts[mid] = int(repeat_count)
+
+    for session_id, movie_id, raw_features in shown_rows:
+        sid = str(session_id or "")
+        if not sid:
+            continue
+        by_session_movies[sid].add(str(movie_id))
+        if sid in by_session_traits:
+            continue
+        try:
+            feats = json.loads(raw_features) if raw_features else {}
+        except (TypeError, ValueError):
+            feats = {}
+        vec = _extract_trait_vec(feats.get("user_traits") if isinstance(feats, dict) else None)
+        if vec is not None:
+            by_session_traits[sid] = vec
+
     prior_mean = 0.1
     prior_strength = 5.0
     priors: Dict[str, float] = {}
     for mid in ids:
-        c = counts[mid]
-        s = sums[mid]
-        posterior = (s + prior_mean * prior_strength) / (c + prior_strength)
+        posterior = (sums[mid] + prior_mean * prior_strength) / (counts[mid] + prior_strength)
         # reward range approx [-0.2, 1.0] -> [0,1]
         priors[mid] = _clamp01((posterior + 0.2) / 1.2)
-    return priors
 
+    if bucket_dissimilar is not None:
+        return CandidateEvents(priors, shown_counts, bucket_dissimilar)
 
-def _get_session_adjustments(session_id: str, lookback_days: int = 45) -> Dict[str, float]:
-    cutoff_dt = datetime.now(timezone.utc) - timedelta(days=lookback_days)
-    dbs = SessionLocal()
-    out = defaultdict(float)
-    try:
-        rows = (
-            dbs.query(Event)
-            .filter(Event.session_id == session_id)
-            .filter(Event.ts >= cutoff_dt)
-            .filter(Event.type.in_(tuple(INTERACTION_TYPES)))
-            .all()
+    dissimilar: Dict[str, int] = defaultdict(int)
+    for sid, mids in by_session_movies.items():
+        other = by_session_traits.get(sid)
+        if other is None:
+            continue
+        if _centered_cosine01(target, other) > sim_max:
+            continue
+        for mid in mids:
+            dissimilar[mid] += 1
+
+    return CandidateEvents(priors, shown_counts, dissimilar)
+
+
+def _rollup_totals(
+    dbs: Any,
+    ids: List[str],
+    feedback_cut: datetime,
+    repeat_cut: datetime,
+    exclude_session_id: str | None,
+) -> List[Tuple[str, float, int, int]]:
+    """(movie_id, reward sum, interaction count, shown count) rows from movie_daily_stats.
+
+    Windows start at midnight UTC of the cutoff day, so they can reach up to a day further back
+    than the events query. The excluded session's own shown events in that window are counted
+    from events through the session index and subtracted; shown events without a session,
+    which the events query drops, stay in.
+    """
+    feedback_day = feedback_cut.date()
+    repeat_day = repeat_cut.date()
+    interactions = MovieDailyStat.clicks + MovieDailyStat.saves + MovieDailyStat.finishes + MovieDailyStat.dismisses
+    in_feedback = MovieDailyStat.day >= feedback_day
+    stmt = (
+        select(
+            MovieDailyStat.movie_id,
+            func.sum(case((in_feedback, MovieDailyStat.reward_sum), else_=None)),
+            func.sum(case((in_feedback, interactions), else_=0)),
+            func.sum(case((MovieDailyStat.day >= repeat_day, MovieDailyStat.shown), else_=0)),
         )
-        for e in rows:
-            mid = str(e.movie_id)
-            etype = str(e.type or "")
-            if etype == "dismiss":
-                out[mid] -= 0.12
-            elif etype == "click":
-                out[mid] += 0.02
-            elif etype == "save":
-                out[mid] += 0.07
-            elif etype == "finish":
-                out[mid] += 0.10
-    except Exception:
-        return {}
-    finally:
-        dbs.close()
-
-    return {mid: max(-0.20, min(0.20, adj)) for mid, adj in out.items()}
-
-
-def _get_global_shown_counts(
-    movie_ids: List[str],
-    lookback_days: int = 14,
-    exclude_session_id: str | None = None,
+        .where(MovieDailyStat.movie_id.in_(ids))
+        .where(MovieDailyStat.day >= min(feedback_day, repeat_day))
+        .group_by(MovieDailyStat.movie_id)
+    )
+    rows = [tuple(row) for row in dbs.execute(stmt).all()]
+    if not exclude_session_id:
+        return rows
+
+    own_stmt = (
+        select(Event.movie_id, func.count())
+        .where(Event.session_id == exclude_session_id)
+        .where(Event.type == "shown")
+        .where(Event.ts >= datetime.combine(repeat_day, datetime.min.time(), tzinfo=timezone.utc))
+        .where(Event.movie_id.in_(ids))
+        .group_by(Event.movie_id)
+    )
+    own = {str(mid): int(n) for mid, n in dbs.execute(own_stmt).all()}
+    return [
+        (mid, reward_sum, feedback_count, max(0, int(shown or 0) - own.get(str(mid), 0)))
+        for mid, reward_sum, feedback_count, shown in rows
+    ]
+
+
+def _bucket_dissimilar_counts(
+    dbs: Any,
+    ids: List[str],
+    target: List[float],
+    dissimilar_cut: datetime,
+    sim_max: float,
 ) -> Dict[str, int]:
-    ids = [str(x) for x in movie_ids if x is not None]
-    if not ids:
-        return {}
-
-    cutoff_dt = datetime.now(timezone.utc) - timedelta(days=lookback_days)
+    """Dissimilar exposure from movie_bucket_exposure: sessions shown each movie whose user's
+    trait bucket centre is at most `sim_max` similar to `target`.
+
+    Each (session, movie, day) is counted once on write, so this matches the session scan's
+    distinct-session counts except that a session shown a movie on several UTC days counts once
+    per day. It judges sessions by their bucket centre and covers whole UTC days.
+    """
+    dissimilar_buckets = dissimilar_bucket_mask(target, sim_max)
+    stmt = (
+        select(MovieBucketExposure.movie_id, MovieBucketExposure.bucket, func.sum(MovieBucketExposure.shown))
+        .where(MovieBucketExposure.movie_id.in_(ids))
+        .where(MovieBucketExposure.day >= dissimilar_cut.date())
+        .group_by(MovieBucketExposure.movie_id, MovieBucketExposure.bucket)
+    )
     out: Dict[str, int] = defaultdict(int)
-    dbs = SessionLocal()
-    try:
-        rows = (
-            dbs.query(Event)
-            .filter(Event.movie_id.in_(ids))
-            .filter(Event.ts >= cutoff_dt)
-            .filter(Event.type == "shown")
-        )
-        if exclude_session_id:
-            rows = rows.filter(Event.session_id != exclude_session_id)
-        rows = rows.all()
-        for e in rows:
-            out[str(e.movie_id)] += 1
-    except Exception:
-        return {}
-    finally:
-        dbs.close()
-
+    for movie_id, bucket, shown in dbs.execute(stmt).all():
+        if 0 <= bucket < len(dissimilar_buckets) and dissimilar_buckets[bucket]:
+            out[str(movie_id)] += int(shown or 0)
     return out
 
 
-def _get_recently_logged_shown_ids(
+def _load_session_events(
     session_id: str,
     movie_ids: List[str],
-    lookback_minutes: int = 30,
-) -> Set[str]:
-    ids = [str(x) for x in movie_ids if x is not None]
-    if not session_id or not ids:
-        return set()
+    adjustment_lookback_days: int = 45,
+    seen_lookback_days: int = 14,
+    shown_dedupe_minutes: int = 30,
+) -> SessionEvents:
+    """Session adjustments, recently seen ids and recently logged shown ids in one query.
+
+    Shown rows are only read for `movie_ids`: sessionless clients share one session id, so an
+    unrestricted read would pull every anonymous impression of the dedupe window.
+    """
+    adjustment_cut = _cutoff(days=adjustment_lookback_days)
+    seen_cut = _cutoff(days=seen_lookback_days)
+    logged_cut = _cutoff(minutes=shown_dedupe_minutes)
+    interaction = Event.type.in_(tuple(INTERACTION_TYPES))
+    ids = list(dict.fromkeys(str(x) for x in movie_ids if x is not None))
+    stmt = (
+        select(
+            Event.movie_id,
+            Event.type,
+            (Event.ts >= adjustment_cut).label("in_adjustment"),
+            (Event.ts >= seen_cut).label("in_seen"),
+            (Event.ts >= logged_cut).label("in_logged"),
+        )
+        .where(Event.session_id == session_id)
+        .where(
+            or_(
+                and_(interaction, Event.ts >= min(adjustment_cut, seen_cut)),
+                and_(Event.type == "shown", Event.ts >= logged_cut, Event.movie_id.in_(ids)),
+            )
+        )
+        .order_by(Event.ts, Event.id)
+    )
 
-    cutoff_dt = datetime.now(timezone.utc) - timedelta(minutes=lookback_minutes)
+    adjustments: Dict[str, float] = defaultdict(float)
+    seen: Set[str] = set()
+    logged: Set[str] = set()
     dbs = SessionLocal()
     try:
-        rows = (
-            dbs.query(Event)
-            .filter(Event.session_id == session_id)
-            .filter(Event.movie_id.in_(ids))
-            .filter(Event.ts >= cutoff_dt)
-            .filter(Event.type == "shown")
-            .all()
-        )
-        return {str(e.movie_id) for e in rows if e.movie_id}
+        rows = dbs.execute(stmt).all()
     except Exception:
-        return set()
+        return SessionEvents({}, set(), set())
     finally:
         dbs.close()
 
-def _extract_trait_vec(raw: Any) -> List[float] | None:
-    if not isinstance(raw, dict):
+    for movie_id, etype, in_adjustment, in_seen, in_logged in rows:
+        etype = str(etype or "")
+        if etype == "shown":
+            if in_logged and movie_id and session_id:
+                logged.add(str(movie_id))
+            continue
+        if in_seen and movie_id:
+            seen.add(str(movie_id))
+        if in_adjustment:
+            mid = str(movie_id)
+            if etype == "dismiss":
+                adjustments[mid] -= 0.12
+            elif etype == "click":
+                adjustments[mid] += 0.02
+            elif etype == "save":
+                adjustments[mid] += 0.07
+            elif etype == "finish":
+                adjustments[mid] += 0.10
+
+    return SessionEvents(
+        {mid: max(-0.20, min(0.20, adj)) for mid, adj in adjustments.items()},
+        seen,
+        logged,
+    )
+
+
+_EVENT_LOOKUP_POOL: ThreadPoolExecutor | None = None
+_EVENT_LOOKUP_POOL_LOCK = threading.Lock()
+# Lookups submitted and not yet finished, including ones a request stopped waiting for.
+_EVENT_LOOKUP_IN_FLIGHT = 0
+_EVENT_LOOKUP_COUNTERS = {"concurrent_passes": 0, "saturated_passes": 0, "timeouts": 0}
+
+
+def _event_lookup_pool() -> ThreadPoolExecutor | None:
+    """Process-wide pool for event lookups, created on first use (so after any worker fork)."""
+    global _EVENT_LOOKUP_POOL
+    if EVENT_LOOKUP_WORKERS <= 0:
         return None
-    return [_clamp01(_safe_float(raw.get(k, 0.5), 0.5)) for k in TRAIT_ORDER]
+    with _EVENT_LOOKUP_POOL_LOCK:
+        if _EVENT_LOOKUP_POOL is None:
+            _EVENT_LOOKUP_POOL = ThreadPoolExecutor(max_workers=EVENT_LOOKUP_WORKERS, thread_name_prefix="event-lookup")
+        return _EVENT_LOOKUP_POOL
+
+
+def _reserve_lookup_slots(n: int) -> bool:
+    """Claim `n` pool slots, or count a saturated pass when lookups already fill the pool."""
+    global _EVENT_LOOKUP_IN_FLIGHT
+    with _EVENT_LOOKUP_POOL_LOCK:
+        if _EVENT_LOOKUP_IN_FLIGHT + n > EVENT_LOOKUP_WORKERS:
+            _EVENT_LOOKUP_COUNTERS["saturated_passes"] += 1
+            return False
+        _EVENT_LOOKUP_IN_FLIGHT += n
+        _EVENT_LOOKUP_COUNTERS["concurrent_passes"] += 1
+        return True
+
 
+def _release_lookup_slot(_: Any = None) -> None:
+    global _EVENT_LOOKUP_IN_FLIGHT
+    with _EVENT_LOOKUP_POOL_LOCK:
+        _EVENT_LOOKUP_IN_FLIGHT = max(0, _EVENT_LOOKUP_IN_FLIGHT - 1)
 
-def _get_dissimilar_exposure_counts(
+
+def _event_lookup_stats() -> Dict[str, Any] | None:
+    if EVENT_LOOKUP_WORKERS <= 0:
+        return None
+    with _EVENT_LOOKUP_POOL_LOCK:
+        out: Dict[str, Any] = dict(_EVENT_LOOKUP_COUNTERS)
+        out["in_flight"] = _EVENT_LOOKUP_IN_FLIGHT
+    out["workers"] = EVENT_LOOKUP_WORKERS
+    out["deadline_ms"] = EVENT_LOOKUP_DEADLINE_MS
+    return out
+
+
+def _timed(fn: Any) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000.0
+
+
+def _load_event_context(
+    session_id: str,
     movie_ids: List[str],
     user_traits: Dict[str, float],
-    lookback_days: int = 30,
-    sim_max: float = 0.42,
-) -> Dict[str, int]:
-    ids = [str(x) for x in movie_ids if x is not None]
-    if not ids:
-        return {}
-
-    cutoff_dt = datetime.now(timezone.utc) - timedelta(days=lookback_days)
-    by_session_movies: Dict[str, Set[str]] = defaultdict(set)
-    by_session_traits: Dict[str, List[float]] = {}
-    dbs = SessionLocal()
+    seen_lookback_days: int = 14,
+) -> EventContext:
+    """Both event lookups of one ranking pass, with the live lookback and penalty settings.
+
+    The lookups are independent reads, each on its own DB session. With EVENT_LOOKUP_WORKERS they
+    run concurrently, so the pass waits for the slowest one rather than their sum, and any lookup
+    not finished within EVENT_LOOKUP_DEADLINE_MS is answered with the neutral values the lookup
+    itself falls back to on a DB error. A running lookup cannot be cancelled, so it keeps its pool
+    slot until it finishes; when such lookups leave too few free slots, the pass runs its lookups
+    inline without a deadline instead of queueing behind them. Timeouts and saturated passes are
+    counted for /health.
+    """
+    lookups: Dict[str, Tuple[Any, Any]] = {
+        "candidates": (
+            lambda: _load_candidate_events(
+                movie_ids,
+                user_traits=user_traits,
+                exclude_session_id=session_id,
+                repeat_lookback_days=GLOBAL_REPEAT_LOOKBACK_DAYS,
+                dissimilar_lookback_days=DISSIMILAR_LOOKBACK_DAYS,
+                sim_max=DISSIMILAR_SIM_MAX,
+            ),
+            lambda: CandidateEvents({str(mid): 0.5 for mid in movie_ids if mid is not None}, {}, {}),
+        ),
+        "session": (
+            lambda: _load_session_events(
+                session_id,
+                movie_ids,
+                seen_lookback_days=seen_lookback_days,
+                shown_dedupe_minutes=SHOWN_EVENT_DEDUPE_MINUTES,
+            ),
+            lambda: SessionEvents({}, set(), set()),
+        ),
+    }
 
-    try:
-        rows = (
-            dbs.query(Event)
-            .filter(Event.movie_id.in_(ids))
-            .filter(Event.ts >= cutoff_dt)
-            .filter(Event.type == "shown")
-            .all()
-        )
-        for e in rows:
-            sid = str(e.session_id or "")
-            if not sid:
-                continue
-            mid = str(e.movie_id)
-            by_session_movies[sid].add(mid)
+    results: Dict[str, Any] = {}
+    lookup_ms: Dict[str, float] = {}
+    timed_out: List[str] = []
+    pool = _event_lookup_pool()
+    concurrent = pool is not None and _reserve_lookup_slots(len(lookups))
+    if not concurrent:
+        for name, (load, _) in lookups.items():
+            results[name], lookup_ms[name] = _timed(load)
+    else:
+        futures = {}
+        for name, (load, _) in lookups.items():
+            future = pool.submit(_timed, load)
+            future.add_done_callback(_release_lookup_slot)
+            futures[name] = future
+        wait(futures.values(), timeout=EVENT_LOOKUP_DEADLINE_MS / 1000.0)
+        for name, future in futures.items():
+            if future.done():
+                results[name], lookup_ms[name] = future.result()
+            else:
+                # Only frees the slot if the lookup has not started; a running one finishes first.
+                future.cancel()
+                results[name] = lookups[name][1]()
+                lookup_ms[name] = EVENT_LOOKUP_DEADLINE_MS
+                timed_out.append(name)
+        if timed_out:
+            with _EVENT_LOOKUP_POOL_LOCK:
+                _EVENT_LOOKUP_COUNTERS["timeouts"] += len(timed_out)
+
+    return EventContext(
+        candidates=results["candidates"],
+        session=results["session"],
+        lookup_ms=lookup_ms,
+        timed_out=tuple(timed_out),
+        concurrent=concurrent,
+    )
 
-            if sid in by_session_traits:
-                continue
-            feats = e.features if isinstance(e.features, dict) else {}
-            vec = _extract_trait_vec(feats.get("user_traits"))
-            if vec is not None:
-                by_session_traits[sid] = vec
-    except Exception:
-        return {}
-    finally:
-        dbs.close()
 
-    target = _vec_from_user(user_traits)
-    out: Dict[str, int] = defaultdict(int)
-    for sid, mids in by_session_movies.items():
-        other = by_session_traits.get(sid)
-        if other is None:
-            continue
-        sim = _centered_cosine01(target, other)
-        if sim > sim_max:
-            continue
-        for mid in mids:
-            out[mid] += 1
+def _extract_trait_vec(raw: Any) -> List[float] | None:
+    if not isinstance(raw, dict):
+        return None
+    return [_clamp01(_safe_float(raw.get(k, 0.5), 0.5)) for k in TRAIT_ORDER]
 
-    return out
 
 # Higher quiz confidence shifts ranking toward stable trait fit and slightly away from text hints.
 # Feedback keeps a small fixed share so sparse engagement can still break close ties.
@@ -463,40 +746,95 @@ def _blend_weights(overall_conf: float) -> Dict[str, float]:
     }
 
 
-def _rank_score(
-    m: Dict[str, Any],
+def _log1p(values: np.ndarray) -> np.ndarray:
+    # math.log1p per distinct value: np.log1p can differ in the last ulp, which would reorder near-ties.
+    uniq, inverse = np.unique(values, return_inverse=True)
+    return np.array([math.log1p(v) for v in uniq.tolist()], dtype=np.float64)[inverse.reshape(-1)]
+
+
+def _unit(values: np.ndarray) -> np.ndarray:
+    return np.where(values < 0.0, 0.0, np.where(values > 1.0, 1.0, values))
+
+
+def _rank_scores(
+    cands: Sequence[Dict[str, Any]],
     user_traits: Dict[str, float],
     overall_conf: float,
-    feedback_score: float,
-    session_adjustment: float,
+    feedback_scores: np.ndarray,
+    session_adjustments: np.ndarray,
     weights: Dict[str, float],
-) -> float:
-    trait_score = _safe_float(m.get("trait_score", m.get("match", 0.0)), 0.0)
-    text_score = _safe_float(m.get("text_score", 0.0), 0.0)
+) -> np.ndarray:
+    """Rank scores for a whole candidate pool, one array op per term.
+
+    Same arithmetic, in the same order, as scoring each candidate on its own, so scores are
+    bit-identical to the per-candidate formula.
+    """
+    n = len(cands)
+    trait_score = np.fromiter(
+        (_safe_float(m.get("trait_score", m.get("match", 0.0)), 0.0) for m in cands), dtype=np.float64, count=n
+    )
+    text_score = np.fromiter((_safe_float(m.get("text_score", 0.0), 0.0) for m in cands), dtype=np.float64, count=n)
+    movie_traits = [m.get("traits") or {} for m in cands]
+    movie_novelty = _unit(
+        np.fromiter((_safe_float(mt.get("novelty", 0.5), 0.5) for mt in movie_traits), dtype=np.float64, count=n)
+    )
+    movie_comfort = _unit(
+        np.fromiter((_safe_float(mt.get("comfort", 0.5), 0.5) for mt in movie_traits), dtype=np.float64, count=n)
+    )
 
     base = (
         weights["trait"] * trait_score
         + weights["text"] * text_score
-        + weights["feedback"] * _clamp01(feedback_score)
+        + weights["feedback"] * _unit(np.asarray(feedback_scores, dtype=np.float64))
     )
 
-    mt = m.get("traits") or {}
     user_novelty = _clamp01(_safe_float(user_traits.get("novelty", 0.5), 0.5))
     user_comfort = _clamp01(_safe_float(user_traits.get("comfort", 0.5), 0.5))
-    movie_novelty = _clamp01(_safe_float(mt.get("novelty", 0.5), 0.5))
-    movie_comfort = _clamp01(_safe_float(mt.get("comfort", 0.5), 0.5))
 
-    pop_norm = min(1.0, _safe_float(m.get("popularity", 0.0), 0.0) / 300.0)
-    vote_count = max(0.0, _safe_float(m.get("vote_count", 0.0), 0.0))
-    vote_count_norm = min(1.0, math.log1p(vote_count) / math.log(5000.0))
+    pop_norm_values = _precomputed(cands, "_pop_norm")
+    if pop_norm_values is not None:
+        pop_norm = np.array(pop_norm_values, dtype=np.float64)
+    else:
+        pop_norm = popularity_norm(
+            np.fromiter((_safe_float(m.get("popularity", 0.0), 0.0) for m in cands), dtype=np.float64, count=n)
+        )
+    vote_norm_values = _precomputed(cands, "_vote_count_norm")
+    if vote_norm_values is not None:
+        votes_norm = np.array(vote_norm_values, dtype=np.float64)
+    else:
+        votes_norm = vote_count_norm(
+            np.fromiter((_safe_float(m.get("vote_count", 0.0), 0.0) for m in cands), dtype=np.float64, count=n)
+        )
 
     # Keep a small mainstream prior, but avoid drowning out personal taste.
-    popularity_bias = POPULARITY_BIAS_MAX * (0.45 + 0.55 * user_comfort) * (0.55 * pop_norm + 0.45 * vote_count_norm)
+    popularity_bias = POPULARITY_BIAS_MAX * (0.45 + 0.55 * user_comfort) * (0.55 * pop_norm + 0.45 * votes_norm)
     discovery_bonus = 0.025 * user_novelty * (1.0 - pop_norm)
     novelty_bonus = 0.045 * user_novelty * movie_novelty * (0.5 + 0.5 * _clamp01(overall_conf))
     comfort_bonus = 0.028 * user_comfort * movie_comfort
 
-    return base + popularity_bias + discovery_bonus + novelty_bonus + comfort_bonus + session_adjustment
+    return base + popularity_bias + discovery_bonus + novelty_bonus + comfort_bonus + np.asarray(
+        session_adjustments, dtype=np.float64
+    )
+
+
+def _rank_score(
+    m: Dict[str, Any],
+    user_traits: Dict[str, float],
+    overall_conf: float,
+    feedback_score: float,
+    session_adjustment: float,
+    weights: Dict[str, float],
+) -> float:
+    return float(
+        _rank_scores(
+            [m],
+            user_traits=user_traits,
+            overall_conf=overall_conf,
+            feedback_scores=np.array([feedback_score], dtype=np.float64),
+            session_adjustments=np.array([session_adjustment], dtype=np.float64),
+            weights=weights,
+        )[0]
+    )
 
 
 def _adaptive_lambda(user_traits: Dict[str, float], overall_conf: float, seen_count: int) -> float:
@@ -524,6 +862,43 @@ def _stable_rng(
     return random.Random(seed)
 
 
+def _weighted_sample_without_replacement(weights: List[float], count: int, rng: random.Random) -> List[int]:
+    """Draw up to `count` distinct indices, each draw proportional to the weights still in play.
+
+    One `rng.random()` per draw, mapped onto the cumulative weight of the remaining items in index
+    order, so the draw sequence (and the distribution) is that of rescanning the remaining weights
+    each time. A sum tree keeps each draw and removal at O(log n); removed leaves are set to exactly
+    zero and parents recomputed from their children, so float error cannot revive a removed item.
+    """
+    n = len(weights)
+    size = 1
+    while size < n:
+        size *= 2
+    tree = [0.0] * (2 * size)
+    tree[size : size + n] = weights
+    for node in range(size - 1, 0, -1):
+        tree[node] = tree[2 * node] + tree[2 * node + 1]
+
+    picked: List[int] = []
+    while len(picked) < min(count, n):
+        target = rng.random() * tree[1]
+        node = 1
+        while node < size:
+            left = tree[2 * node]
+            if (target <= left and left > 0.0) or tree[2 * node + 1] <= 0.0:
+                node = 2 * node
+            else:
+                target -= left
+                node = 2 * node + 1
+        picked.append(node - size)
+        tree[node] = 0.0
+        node //= 2
+        while node:
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+            node //= 2
+    return picked
+
+
 def _sample_rerank_pool(
     scored: List[Dict[str, Any]],
     pool_size: int,
@@ -555,35 +930,19 @@ def _sample_rerank_pool(
     top_score = _safe_float(band[0].get("rank_score", band[0].get("match", 0.0)), 0.0)
     temperature = 0.02 + 0.06 * explore_ratio
 
-    remaining = list(range(len(band)))
-    picked_idx: List[int] = []
-
-    while remaining and len(picked_idx) < pool_size:
-        weights: List[float] = []
-        for idx in remaining:
-            item = band[idx]
-            score = _safe_float(item.get("rank_score", item.get("match", 0.0)), 0.0)
-            delta = max(0.0, top_score - score)
-            w_score = math.exp(-delta / max(1e-6, temperature))
-            w_rank = 1.0 / (1.0 + idx)
-            w = (1.0 - explore_ratio) * w_rank + explore_ratio * w_score
-            weights.append(max(1e-9, w))
-
-        total = sum(weights)
-        draw = rng.random() * total
-        cum = 0.0
-        chosen_local = 0
-        for j, w in enumerate(weights):
-            cum += w
-            if draw <= cum:
-                chosen_local = j
-                break
-
-        picked_global = remaining.pop(chosen_local)
-        picked_idx.append(picked_global)
-
+    # An item's weight depends only on its band position and score, so it is computed once.
+    weights: List[float] = []
+    for idx, item in enumerate(band):
+        score = _safe_float(item.get("rank_score", item.get("match", 0.0)), 0.0)
+        delta = max(0.0, top_score - score)
+        w_score = math.exp(-delta / max(1e-6, temperature))
+        w_rank = 1.0 / (1.0 + idx)
+        w = (1.0 - explore_ratio) * w_rank + explore_ratio * w_score
+        weights.append(max(1e-9, w))
+
+    picked_idx = _weighted_sample_without_replacement(weights, pool_size, rng)
     picked = [band[i] for i in picked_idx]
-    picked.sort(key=cmp_to_key(_final_rank_cmp))
+    _sort_final_rank(picked)
     return picked, explore_ratio, band_size
 
 
@@ -602,50 +961,69 @@ def _popularity_tiebreak_value(m: Dict[str, Any]) -> Tuple[float, float]:
 
 
 
-def _near_tie_prefers_more_popular(left: Dict[str, Any], right: Dict[str, Any]) -> bool:
-    left_rank = _safe_float(left.get("rank_score", left.get("match", 0.0)), 0.0)
-    right_rank = _safe_float(right.get("rank_score", right.get("match", 0.0)), 0.0)
-    left_fit = _movie_relevance_score(left)
-    right_fit = _movie_relevance_score(right)
+# (rank_score, relevance, popularity tiebreak, lowercased title, id): everything the final
+# ordering looks at, computed once per movie instead of once per comparison.
+_RankFacts = Tuple[float, float, Tuple[float, float], str, str]
+
+
+def _rank_facts(m: Dict[str, Any]) -> _RankFacts:
+    return (
+        _safe_float(m.get("rank_score", m.get("match", 0.0)), 0.0),
+        _movie_relevance_score(m),
+        _popularity_tiebreak_value(m),
+        str(m.get("title", "")).lower(),
+        str(m.get("id", "")),
+    )
 
-    rank_close = abs(left_rank - right_rank) <= FINAL_TIEBREAK_RANK_EPS
-    fit_close = abs(left_fit - right_fit) <= FINAL_TIEBREAK_FIT_EPS
+
+def _near_tie_facts_prefer_left(left: _RankFacts, right: _RankFacts) -> bool:
+    rank_close = abs(left[0] - right[0]) <= FINAL_TIEBREAK_RANK_EPS
+    fit_close = abs(left[1] - right[1]) <= FINAL_TIEBREAK_FIT_EPS
     if not (rank_close or fit_close):
         return False
+    return left[2] > right[2]
 
-    left_pop = _popularity_tiebreak_value(left)
-    right_pop = _popularity_tiebreak_value(right)
-    return left_pop > right_pop
 
+def _near_tie_prefers_more_popular(left: Dict[str, Any], right: Dict[str, Any]) -> bool:
+    return _near_tie_facts_prefer_left(_rank_facts(left), _rank_facts(right))
 
-def _final_rank_cmp(left: Dict[str, Any], right: Dict[str, Any]) -> int:
-    if _near_tie_prefers_more_popular(left, right):
+
+def _rank_facts_cmp(left: _RankFacts, right: _RankFacts) -> int:
+    if _near_tie_facts_prefer_left(left, right):
         return -1
-    if _near_tie_prefers_more_popular(right, left):
+    if _near_tie_facts_prefer_left(right, left):
         return 1
 
-    left_rank = _safe_float(left.get("rank_score", left.get("match", 0.0)), 0.0)
-    right_rank = _safe_float(right.get("rank_score", right.get("match", 0.0)), 0.0)
+    left_rank, right_rank = left[0], right[0]
     if abs(left_rank - right_rank) > 1e-9:
         return -1 if left_rank > right_rank else 1
 
-    left_fit = _movie_relevance_score(left)
-    right_fit = _movie_relevance_score(right)
+    left_fit, right_fit = left[1], right[1]
     if abs(left_fit - right_fit) > 1e-9:
         return -1 if left_fit > right_fit else 1
 
-    left_title = str(left.get("title", "")).lower()
-    right_title = str(right.get("title", "")).lower()
-    if left_title != right_title:
-        return -1 if left_title < right_title else 1
-
-    left_id = str(left.get("id", ""))
-    right_id = str(right.get("id", ""))
-    if left_id != right_id:
-        return -1 if left_id < right_id else 1
+    if left[3] != right[3]:
+        return -1 if left[3] < right[3] else 1
+    if left[4] != right[4]:
+        return -1 if left[4] < right[4] else 1
     return 0
 
 
+def _final_rank_cmp(left: Dict[str, Any], right: Dict[str, Any]) -> int:
+    return _rank_facts_cmp(_rank_facts(left), _rank_facts(right))
+
+
+def _sort_final_rank(items: List[Dict[str, Any]]) -> None:
+    """Sort `items` in place into final ranking order.
+
+    Runs the near-tie comparator with every input computed once per movie, so the order is
+    exactly that of sorting with `_final_rank_cmp`.
+    """
+    facts = [_rank_facts(m) for m in items]
+    order = sorted(range(len(items)), key=cmp_to_key(lambda i, j: _rank_facts_cmp(facts[i], facts[j])))
+    items[:] = [items[i] for i in order]
+
+
 def _apply_relevance_floor(scored: List[Dict[str, Any]], result_count: int) -> Tuple[List[Dict[str, Any]], float, str]:
     if not scored:
         return [], RELEVANCE_FLOOR_ABS, "none"
@@ -696,6 +1074,16 @@ def _apply_explicit_avoidance(
     return out, removed, "demote"
 
 
+def _dense_ids(values: List[int]) -> np.ndarray:
+    """Renumber ids 0..k-1 in sorted order, keeping -1 (none) as -1."""
+    ids = np.array(values, dtype=np.int64)
+    _, dense = np.unique(ids, return_inverse=True)
+    dense = dense.reshape(-1)
+    if ids.shape[0] and ids.min() < 0:
+        dense -= 1
+    return dense
+
+
 def _mmr_diversify(
     cands: List[Dict[str, Any]],
     user_traits: Dict[str, float],
@@ -715,81 +1103,92 @@ def _mmr_diversify(
         return []
 
     u = _vec_from_user(user_traits)
-    enriched: List[Tuple[Dict[str, Any], List[float], float]] = []
+    n = len(cands)
+    vecs: List[List[float]] = []
+    bases: List[float] = []
     for m in cands:
         v = _vec_from_movie(m)
         base = _safe_float(m.get("rank_score", m.get("match", _centered_cosine01(u, v))), 0.0)
         if seen_ids and str(m.get("id")) in seen_ids:
             base -= seen_penalty
-        enriched.append((m, v, base))
-
-    picked: List[Tuple[Dict[str, Any], List[float], float]] = []
-    picked_roots: Dict[str, int] = defaultdict(int)
-    picked_genres: Dict[str, int] = defaultdict(int)
-    rest = enriched[:]
+        vecs.append(v)
+        bases.append(base)
+
+    # Everything a pick looks at is fixed per candidate, so it is computed once up front; only the
+    # franchise/genre counts, the hot-overlap count and the max similarity to the picks change.
+    titles = [str(m.get("title", "")) for m in cands]
+    facts = [_rank_facts(m) for m in cands]
+    # Catalog rows carry root/genre ids from the snapshot; other inputs are interned here.
+    root_values = _precomputed(cands, "_title_root_id")
+    if root_values is None:
+        root_index: Dict[str, int] = {}
+        root_values = [root_index.setdefault(r, len(root_index)) if r else -1 for r in map(_title_root, titles)]
+    genre_values = _precomputed(cands, "_primary_genre_id")
+    if genre_values is None:
+        genre_index: Dict[str, int] = {}
+        genre_values = [genre_index.setdefault(g, len(genre_index)) if g else -1 for g in map(_primary_genre, cands)]
+    root_ids = _dense_ids(root_values)
+    genre_ids = _dense_ids(genre_values)
+    relevance_block = np.array(
+        [relevance_floor is not None and _movie_relevance_score(m) < relevance_floor for m in cands], dtype=bool
+    )
+    dissimilar = [max(0, int((dissimilar_counts or {}).get(str(m.get("id")), 0))) for m in cands]
+    is_dissimilar_hot = np.array([c >= dissimilar_hot_min for c in dissimilar], dtype=bool)
+    dissimilar_penalty = np.array([dissimilar_mmr_penalty_beta * math.log1p(c) for c in dissimilar], dtype=np.float64)
+    base_arr = np.array(bases, dtype=np.float64)
+
+    # Centered trait rows and their norms, laid out so one pick's similarity to every candidate is
+    # the same left-to-right sum _centered_cosine01 computes, i.e. bit-identical to it.
+    centered = np.array(vecs, dtype=np.float64).reshape(n, -1) - 0.5
+    norms = np.array([math.sqrt(sum(x * x for x in row)) or 1e-9 for row in centered.tolist()], dtype=np.float64)
+    max_sim = np.zeros(n, dtype=np.float64)
+
+    # One spare slot so the -1 ("none") ids index a count that never moves.
+    root_counts = np.zeros(int(root_ids.max(initial=-1)) + 2, dtype=np.int64)
+    genre_counts = np.zeros(int(genre_ids.max(initial=-1)) + 2, dtype=np.int64)
+    has_root = root_ids >= 0
+    has_genre = genre_ids >= 0
+    rest = np.ones(n, dtype=bool)
+    picked: List[int] = []
     strict = True
     picked_hot_overlap = 0
+    lambda_eff = max(0.72, min(0.95, lambda_ + 0.08))
 
-    while rest and len(picked) < k:
-        best_idx = -1
-        best_key = (-1e9, -1e9, "")
-        anchor_base = picked[0][2] if picked else max((b for _, _, b in rest), default=0.0)
-        lambda_eff = max(0.72, min(0.95, lambda_ + 0.08))
+    while rest.any() and len(picked) < k:
+        anchor_base = bases[picked[0]] if picked else float(base_arr[rest].max())
         min_base_allowed = anchor_base - 0.11
 
-        for i, (m, v, base) in enumerate(rest):
-            mid = str(m.get("id"))
-            root = _title_root(str(m.get("title", "")))
-            genre = _primary_genre(m)
-            root_count = picked_roots.get(root, 0) if root else 0
-            genre_count = picked_genres.get(genre, 0) if genre else 0
-
-            franchise_block = bool(root and max_per_franchise > 0 and root_count >= max_per_franchise)
-            genre_block = bool(genre and max_per_primary_genre > 0 and genre_count >= max_per_primary_genre)
-
-            trait_score = _movie_relevance_score(m)
-            relevance_block = bool(relevance_floor is not None and trait_score < relevance_floor)
-
-            dissimilar_count = max(0, int((dissimilar_counts or {}).get(mid, 0)))
-            is_dissimilar_hot = dissimilar_count >= dissimilar_hot_min
-            overlap_block = bool(
-                dissimilar_overlap_cap >= 0
-                and is_dissimilar_hot
-                and picked_hot_overlap >= dissimilar_overlap_cap
+        root_count = np.where(has_root, root_counts[root_ids], 0)
+        genre_count = np.where(has_genre, genre_counts[genre_ids], 0)
+        eligible = rest.copy()
+        if strict:
+            franchise_block = has_root & (max_per_franchise > 0) & (root_count >= max_per_franchise)
+            genre_block = has_genre & (max_per_primary_genre > 0) & (genre_count >= max_per_primary_genre)
+            overlap_block = is_dissimilar_hot & (
+                dissimilar_overlap_cap >= 0 and picked_hot_overlap >= dissimilar_overlap_cap
             )
+            eligible &= ~(franchise_block | genre_block | relevance_block | (base_arr < min_base_allowed) | overlap_block)
+
+        div = 1.0 - max_sim if picked else np.ones(n, dtype=np.float64)
+        mmr = (
+            lambda_eff * base_arr
+            + (1.0 - lambda_eff) * div
+            - 0.06 * root_count
+            - 0.02 * genre_count
+            - dissimilar_penalty
+        ).tolist()
 
-            if strict and (
-                franchise_block
-                or genre_block
-                or relevance_block
-                or base < min_base_allowed
-                or overlap_block
+        best_idx = -1
+        best_key: Tuple[float, float, str] = (-1e9, -1e9, "")
+        for i in np.flatnonzero(eligible).tolist():
+            key = (mmr[i], bases[i], titles[i])
+            if best_idx >= 0 and (
+                abs(mmr[i] - best_key[0]) <= FINAL_TIEBREAK_RANK_EPS
+                and _near_tie_facts_prefer_left(facts[i], facts[best_idx])
             ):
+                best_key = key
+                best_idx = i
                 continue
-
-            if not picked:
-                div = 1.0
-            else:
-                sim = max(_centered_cosine01(v, pv) for _, pv, _ in picked)
-                div = 1.0 - sim
-
-            franchise_penalty = 0.06 * root_count
-            genre_penalty = 0.02 * genre_count
-            dissimilar_penalty = dissimilar_mmr_penalty_beta * math.log1p(dissimilar_count)
-
-            mmr = lambda_eff * base + (1.0 - lambda_eff) * div - franchise_penalty - genre_penalty - dissimilar_penalty
-            tie_title = str(m.get("title", ""))
-            key = (mmr, base, tie_title)
-            if best_idx >= 0:
-                best_m = rest[best_idx][0]
-                best_mmr = best_key[0]
-                if (
-                    abs(mmr - best_mmr) <= FINAL_TIEBREAK_RANK_EPS
-                    and _near_tie_prefers_more_popular(m, best_m)
-                ):
-                    best_key = key
-                    best_idx = i
-                    continue
             if key > best_key:
                 best_key = key
                 best_idx = i
@@ -800,27 +1199,29 @@ def _mmr_diversify(
                 continue
             break
 
-        chosen = rest.pop(best_idx)
-        picked.append(chosen)
-        root = _title_root(str(chosen[0].get("title", "")))
-        genre = _primary_genre(chosen[0])
-        if root:
-            picked_roots[root] += 1
-        if genre:
-            picked_genres[genre] += 1
-
-        if dissimilar_counts is not None:
-            chosen_mid = str(chosen[0].get("id"))
-            chosen_dissimilar_count = max(0, int(dissimilar_counts.get(chosen_mid, 0)))
-            if chosen_dissimilar_count >= dissimilar_hot_min:
-                picked_hot_overlap += 1
+        rest[best_idx] = False
+        picked.append(best_idx)
+        if has_root[best_idx]:
+            root_counts[root_ids[best_idx]] += 1
+        if has_genre[best_idx]:
+            genre_counts[genre_ids[best_idx]] += 1
+        if dissimilar_counts is not None and is_dissimilar_hot[best_idx]:
+            picked_hot_overlap += 1
+
+        pc = centered[best_idx]
+        dots = centered[:, 0] * pc[0]
+        for j in range(1, centered.shape[1]):
+            dots += centered[:, j] * pc[j]
+        raw = dots / (norms * norms[best_idx])
+        sim = np.where(np.isfinite(raw), np.clip(0.5 * (raw + 1.0), 0.0, 1.0), 0.5)
+        max_sim = np.maximum(max_sim, sim) if len(picked) > 1 else sim
 
         strict = True
 
     result = []
-    for m, _, base in picked:
-        m_out = dict(m)
-        m_out["rank_score"] = round(base, 6)
+    for i in picked:
+        m_out = dict(cands[i])
+        m_out["rank_score"] = round(bases[i], 6)
         result.append(m_out)
 
     return result
@@ -836,100 +1237,106 @@ def _assign_display_matches(items: List[Dict[str, Any]]) -> None:
         fit_score = round(_clamp01(_movie_relevance_score(m)), 4)
         m["fit_score"] = fit_score
         m["match"] = fit_score
-@bp.post("/recommend")
-def recommend():
-    data = request.get_json(silent=True) or {}
-    answers = data.get("answers")
 
-    if not isinstance(answers, list) or len(answers) != 9:
-        return jsonify({"error": "expected 'answers' as 9-length array"}), 400
 
-    session_id = data.get("session_id") or request.headers.get("X-Session-ID") or "anon"
+def _profile_from_request(data: Dict[str, Any], session_id: str) -> Tuple[Dict[str, Any] | None, str]:
+    """Validated per-profile inputs of a recommend payload, or (None, error message)."""
+    answers = data.get("answers")
+    if not isinstance(answers, list) or len(answers) != 9:
+        return None, "expected 'answers' as 9-length array"
+    try:
+        filters = parse_catalog_filters(data.get("filters"))
+    except ValueError as e:
+        return None, str(e)
 
     context = data.get("context") if isinstance(data.get("context"), dict) else {}
-    personality_traits = context.get("personality_traits") if isinstance(context.get("personality_traits"), dict) else {}
-    mood_traits = context.get("mood_traits") if isinstance(context.get("mood_traits"), dict) else {}
     confidence = context.get("confidence") if isinstance(context.get("confidence"), dict) else {}
-    overall_conf = _clamp01(_safe_float(confidence.get("overall", 0.75), 0.75))
     retake_round = max(0, _safe_int(context.get("retake_round"), 0))
     retake_avoid_ids = set(_normalize_movie_ids(context.get("avoid_movie_ids")))
     if retake_avoid_ids and retake_round <= 0:
         retake_round = 1
 
     user_traits = answers_to_traits(answers)
-    profile_summary = summarize_traits(user_traits)
-
-    db_path = resolve_db_path()
-    if not os.path.exists(db_path):
-        return jsonify({"error": f"Catalog not ready. Expected DB at: {db_path}"}), 503
-
+    return {
+        "session_id": session_id,
+        "user_traits": user_traits,
+        "profile_summary": summarize_traits(user_traits),
+        "personality_traits": context.get("personality_traits") if isinstance(context.get("personality_traits"), dict) else {},
+        "mood_traits": context.get("mood_traits") if isinstance(context.get("mood_traits"), dict) else {},
+        "query_text": context.get("query_text") if isinstance(context.get("query_text"), str) else None,
+        "confidence": confidence,
+        "overall_conf": _clamp01(_safe_float(confidence.get("overall", 0.75), 0.75)),
+        "retake_round": retake_round,
+        "retake_avoid_ids": retake_avoid_ids,
+        "filters": filters,
+    }, ""
+
+
+def _pipeline_sizes(active_rows: int) -> Tuple[int, int, int]:
+    """(candidate_limit, prefilter, rerank_pool) for the active catalog size."""
     # Scale candidate and rerank pool sizes with the active catalog so the same pipeline works for
     # both the full catalog and smaller experimental variants.
-    active_rows = max(1, count_rows())
-    result_count = RESULT_COUNT
     candidate_limit = max(CANDIDATE_LIMIT_MIN, min(CANDIDATE_LIMIT_MAX, int(active_rows * CANDIDATE_LIMIT_RATIO)))
     prefilter_n = max(candidate_limit, min(active_rows, int(active_rows * 0.85)))
     rerank_pool_size = max(RERANK_POOL_MIN, min(RERANK_POOL_MAX, int(candidate_limit * RERANK_POOL_RATIO)))
-
-    try:
-        raw_cands = top_matches(
-            user_traits,
-            limit=candidate_limit,
-            prefilter=prefilter_n,
-            include_scores=True,
-            query_text=context.get("query_text") if isinstance(context.get("query_text"), str) else None,
-            personality_traits=personality_traits,
-            mood_traits=mood_traits,
-        )
-    except Exception as e:
-        return jsonify({"error": f"Catalog query failed: {e}"}), 503
+    return candidate_limit, prefilter_n, rerank_pool_size
+
+
+def _recommend_from_candidates(
+    profile: Dict[str, Any],
+    raw_cands: List[Dict[str, Any]],
+    active_rows: int,
+) -> Dict[str, Any]:
+    """Run feedback scoring, reranking, diversification and shown-event logging for one profile."""
+    session_id = profile["session_id"]
+    user_traits = profile["user_traits"]
+    personality_traits = profile["personality_traits"]
+    mood_traits = profile["mood_traits"]
+    confidence = profile["confidence"]
+    overall_conf = profile["overall_conf"]
+    retake_round = profile["retake_round"]
+    retake_avoid_ids = profile["retake_avoid_ids"]
+    result_count = RESULT_COUNT
+    candidate_limit, prefilter_n, rerank_pool_size = _pipeline_sizes(active_rows)
 
     deduped = _dedupe(raw_cands)
 
     movie_ids = [str(m.get("id")) for m in deduped if m.get("id") is not None]
-    feedback_priors = _get_feedback_priors(movie_ids)
-    global_shown_counts = _get_global_shown_counts(
-        movie_ids,
-        lookback_days=GLOBAL_REPEAT_LOOKBACK_DAYS,
-        exclude_session_id=session_id,
-    )
-    dissimilar_exposure_counts = _get_dissimilar_exposure_counts(
-        movie_ids,
-        user_traits=user_traits,
-        lookback_days=DISSIMILAR_LOOKBACK_DAYS,
-        sim_max=DISSIMILAR_SIM_MAX,
-    )
-    session_adjustments = _get_session_adjustments(session_id)
+    events = _load_event_context(session_id, movie_ids, user_traits, seen_lookback_days=21)
+    feedback_priors = events.candidates.feedback_priors
+    global_shown_counts = events.candidates.global_shown_counts
+    dissimilar_exposure_counts = events.candidates.dissimilar_exposure_counts
+    session_adjustments = events.session.session_adjustments
     weights = _blend_weights(overall_conf)
 
-    scored: List[Dict[str, Any]] = []
-    for m in deduped:
-        mid = str(m.get("id"))
-        shown_recent = max(0, int(global_shown_counts.get(mid, 0)))
-        dissimilar_recent = max(0, int(dissimilar_exposure_counts.get(mid, 0)))
-        feedback_score = feedback_priors.get(mid, 0.5)
-        session_adjustment = session_adjustments.get(mid, 0.0)
-        rank_score = _rank_score(
-            m,
-            user_traits=user_traits,
-            overall_conf=overall_conf,
-            feedback_score=feedback_score,
-            session_adjustment=session_adjustment,
-            weights=weights,
-        )
-        freshness_penalty = GLOBAL_REPEAT_BETA * math.log1p(shown_recent)
-        dissimilar_penalty = DISSIMILAR_PENALTY_BETA * math.log1p(dissimilar_recent)
-        rank_score -= freshness_penalty + dissimilar_penalty
-
-        m2 = dict(m)
-        m2["feedback_score"] = round(feedback_score, 6)
-        m2["freshness_shown_lookback"] = shown_recent
-        m2["dissimilar_shown_lookback"] = dissimilar_recent
-        m2["freshness_penalty"] = round(freshness_penalty, 6)
-        m2["dissimilar_penalty"] = round(dissimilar_penalty, 6)
-        m2["session_adjustment"] = round(session_adjustment, 6)
-        m2["rank_score"] = round(rank_score, 6)
-        scored.append(m2)
+    mids = [str(m.get("id")) for m in deduped]
+    shown_recent = [max(0, int(global_shown_counts.get(mid, 0))) for mid in mids]
+    dissimilar_recent = [max(0, int(dissimilar_exposure_counts.get(mid, 0))) for mid in mids]
+    feedback_scores = [feedback_priors.get(mid, 0.5) for mid in mids]
+    session_adjustment = [session_adjustments.get(mid, 0.0) for mid in mids]
+    rank_scores = _rank_scores(
+        deduped,
+        user_traits=user_traits,
+        overall_conf=overall_conf,
+        feedback_scores=np.array(feedback_scores, dtype=np.float64),
+        session_adjustments=np.array(session_adjustment, dtype=np.float64),
+        weights=weights,
+    )
+    freshness_penalty = GLOBAL_REPEAT_BETA * _log1p(np.array(shown_recent, dtype=np.float64))
+    dissimilar_penalty = DISSIMILAR_PENALTY_BETA * _log1p(np.array(dissimilar_recent, dtype=np.float64))
+    rank_scores -= freshness_penalty + dissimilar_penalty
+
+    # The catalog hands every profile its own row copies, so the score fields are set in place;
+    # only the final picks are copied again, by _mmr_diversify.
+    scored: List[Dict[str, Any]] = deduped
+    for i, m in enumerate(scored):
+        m["feedback_score"] = round(feedback_scores[i], 6)
+        m["freshness_shown_lookback"] = shown_recent[i]
+        m["dissimilar_shown_lookback"] = dissimilar_recent[i]
+        m["freshness_penalty"] = round(float(freshness_penalty[i]), 6)
+        m["dissimilar_penalty"] = round(float(dissimilar_penalty[i]), 6)
+        m["session_adjustment"] = round(session_adjustment[i], 6)
+        m["rank_score"] = round(float(rank_scores[i]), 6)
 
     retake_avoid_mode = "none"
     retake_avoid_removed = 0
@@ -940,10 +1347,10 @@ def recommend():
             result_count=result_count,
         )
 
-    scored.sort(key=cmp_to_key(_final_rank_cmp))
+    _sort_final_rank(scored)
     scored, relevance_floor, relevance_floor_source = _apply_relevance_floor(scored, result_count=result_count)
 
-    seen = _get_recently_seen_ids(session_id, lookback_days=21)
+    seen = events.session.recently_seen_ids
     adaptive_lambda = _adaptive_lambda(user_traits, overall_conf, seen_count=len(seen))
     rng = _stable_rng(session_id, user_traits, overall_conf, variant_seed=f"retake:{retake_round}" if retake_round > 0 else "")
     close_mode = result_count <= 4
@@ -981,6 +1388,8 @@ def recommend():
 
     enriched: List[Dict[str, Any]] = []
     for m in reranked:
+        # Snapshot-only ranking features (CatalogStore.ranking_features) are not part of the API.
+        m = {k: v for k, v in m.items() if not k.startswith("_")}
         if not m.get("posterUrl"):
             try:
                 m = enrich_movie_by_title_year(m)
@@ -990,19 +1399,18 @@ def recommend():
 
     # Persist only the final shown set after reranking so freshness and exposure penalties reflect
     # what the user actually saw, not the wider pre-rerank candidate pool.
-    dbs = None
-    try:
-        dbs = SessionLocal()
-        now_dt = datetime.now(timezone.utc)
-        recently_logged_shown = _get_recently_logged_shown_ids(
-            session_id,
-            [str(m.get("id")) for m in enriched if m.get("id") is not None],
-            lookback_minutes=SHOWN_EVENT_DEDUPE_MINUTES,
-        )
-        for m in enriched:
-            if str(m.get("id")) in recently_logged_shown:
-                continue
-            ev = Event(
+    now_dt = datetime.now(timezone.utc)
+    writer = _event_writer()
+    logged = events.session.recently_logged_shown_ids
+    if writer is not None:
+        # Shown events still in the write-behind queue are not in the DB lookup yet.
+        logged = logged | writer.pending_shown(session_id, (m.get("id") for m in enriched))
+    shown_events: List[Dict[str, Any]] = []
+    for m in enriched:
+        if str(m.get("id")) in logged:
+            continue
+        shown_events.append(
+            dict(
                 session_id=session_id,
                 movie_id=str(m.get("id")),
                 type="shown",
@@ -1024,56 +1432,165 @@ def recommend():
                     },
                 },
             )
-            dbs.add(ev)
-        dbs.commit()
-    except Exception:
-        if dbs is not None:
-            dbs.rollback()
-    finally:
-        if dbs is not None:
-            dbs.close()
-
-    return jsonify(
-        {
-            "profile": {"traits": user_traits, "summary": profile_summary},
-            "recommendations": enriched,
-            "algo_used": ALGO_TAG,
-            "algo_meta": {
-                "weights": {k: round(v, 4) for k, v in weights.items()},
-                "mmr_lambda": round(adaptive_lambda, 4),
-                "confidence": round(overall_conf, 4),
-                "retake_round": retake_round,
-                "retake_avoid_count": len(retake_avoid_ids),
-                "retake_avoid_removed": retake_avoid_removed,
-                "retake_avoid_mode": retake_avoid_mode,
-                "active_catalog_rows": active_rows,
-                "candidate_limit": candidate_limit,
-                "prefilter": prefilter_n,
-                "result_count": result_count,
-                "rerank_pool": rerank_pool_size,
-                "rerank_band": rerank_band,
-                "explore_ratio": round(explore_ratio, 4),
-                "explore_scale": round(explore_scale, 3),
-                "close_mode": close_mode,
-                "relevance_floor": round(relevance_floor, 4),
-                "relevance_floor_source": relevance_floor_source,
-                "max_per_primary_genre": genre_cap,
-                "max_per_franchise": MAX_PER_FRANCHISE,
-                "popularity_bias_max": round(POPULARITY_BIAS_MAX, 4),
-                "global_repeat_beta": round(GLOBAL_REPEAT_BETA, 4),
-                "global_repeat_lookback_days": GLOBAL_REPEAT_LOOKBACK_DAYS,
-                "dissimilar_sim_max": round(DISSIMILAR_SIM_MAX, 4),
-                "dissimilar_penalty_beta": round(DISSIMILAR_PENALTY_BETA, 4),
-                "dissimilar_mmr_penalty_beta": round(DISSIMILAR_MMR_PENALTY_BETA, 4),
-                "dissimilar_hot_min": DISSIMILAR_HOT_MIN,
-                "dissimilar_overlap_cap": DISSIMILAR_OVERLAP_CAP,
-                "dissimilar_lookback_days": DISSIMILAR_LOOKBACK_DAYS,
-                "global_shown_nonzero": sum(1 for v in global_shown_counts.values() if int(v) > 0),
-                "dissimilar_nonzero": sum(1 for v in dissimilar_exposure_counts.values() if int(v) > 0),
+        )
+    if writer is not None:
+        writer.submit(shown_events)
+    elif shown_events:
+        dbs = None
+        try:
+            dbs = SessionLocal()
+            write_events(dbs, shown_events)
+            dbs.commit()
+        except Exception:
+            if dbs is not None:
+                dbs.rollback()
+        finally:
+            if dbs is not None:
+                dbs.close()
+
+    return {
+        "profile": {"traits": user_traits, "summary": profile["profile_summary"]},
+        "recommendations": enriched,
+        "algo_used": ALGO_TAG,
+        "algo_meta": {
+            "weights": {k: round(v, 4) for k, v in weights.items()},
+            "mmr_lambda": round(adaptive_lambda, 4),
+            "confidence": round(overall_conf, 4),
+            "retake_round": retake_round,
+            "retake_avoid_count": len(retake_avoid_ids),
+            "retake_avoid_removed": retake_avoid_removed,
+            "retake_avoid_mode": retake_avoid_mode,
+            "active_catalog_rows": active_rows,
+            "candidate_limit": candidate_limit,
+            "prefilter": prefilter_n,
+            "result_count": result_count,
+            "rerank_pool": rerank_pool_size,
+            "rerank_band": rerank_band,
+            "explore_ratio": round(explore_ratio, 4),
+            "explore_scale": round(explore_scale, 3),
+            "close_mode": close_mode,
+            "relevance_floor": round(relevance_floor, 4),
+            "relevance_floor_source": relevance_floor_source,
+            "max_per_primary_genre": genre_cap,
+            "max_per_franchise": MAX_PER_FRANCHISE,
+            "popularity_bias_max": round(POPULARITY_BIAS_MAX, 4),
+            "global_repeat_beta": round(GLOBAL_REPEAT_BETA, 4),
+            "global_repeat_lookback_days": GLOBAL_REPEAT_LOOKBACK_DAYS,
+            "dissimilar_sim_max": round(DISSIMILAR_SIM_MAX, 4),
+            "dissimilar_penalty_beta": round(DISSIMILAR_PENALTY_BETA, 4),
+            "dissimilar_mmr_penalty_beta": round(DISSIMILAR_MMR_PENALTY_BETA, 4),
+            "dissimilar_hot_min": DISSIMILAR_HOT_MIN,
+            "dissimilar_overlap_cap": DISSIMILAR_OVERLAP_CAP,
+            "dissimilar_lookback_days": DISSIMILAR_LOOKBACK_DAYS,
+            "global_shown_nonzero": sum(1 for v in global_shown_counts.values() if int(v) > 0),
+            "dissimilar_nonzero": sum(1 for v in dissimilar_exposure_counts.values() if int(v) > 0),
+            "filters": profile["filters"].to_dict() if profile["filters"] is not None else {},
+            "event_lookups": {
+                "concurrent": events.concurrent,
+                "pool_saturated": EVENT_LOOKUP_WORKERS > 0 and not events.concurrent,
+                "ms": {name: round(ms, 3) for name, ms in events.lookup_ms.items()},
+                "timed_out": list(events.timed_out),
             },
-            "session_id": session_id,
-        }
-    )
+        },
+        "session_id": session_id,
+    }
+
+
+@bp.post("/recommend")
+def recommend():
+    data = request.get_json(silent=True) or {}
+    session_id = data.get("session_id") or request.headers.get("X-Session-ID") or "anon"
+
+    profile, error = _profile_from_request(data, session_id)
+    if profile is None:
+        return jsonify({"error": error}), 400
+
+    db_path = resolve_db_path()
+    if not os.path.exists(db_path):
+        return jsonify({"error": f"Catalog not ready. Expected DB at: {db_path}"}), 503
+
+    active_rows = max(1, count_rows())
+    candidate_limit, prefilter_n, _ = _pipeline_sizes(active_rows)
+
+    try:
+        raw_cands = top_matches(
+            profile["user_traits"],
+            limit=candidate_limit,
+            prefilter=prefilter_n,
+            include_scores=True,
+            query_text=profile["query_text"],
+            personality_traits=profile["personality_traits"],
+            mood_traits=profile["mood_traits"],
+            filters=profile["filters"],
+        )
+    except Exception as e:
+        return jsonify({"error": f"Catalog query failed: {e}"}), 503
+
+    return jsonify(_recommend_from_candidates(profile, raw_cands, active_rows))
+
+
+@bp.post("/recommend/batch")
+def recommend_batch():
+    """Recommend for many profiles at once.
+
+    Body: {"profiles": [{"answers": [...], "context": {...}, "session_id": "..."}, ...]}. Candidate
+    retrieval for all profiles runs as one batched catalog scan; reranking and shown-event logging
+    then run per profile in request order, so each result matches what a sequence of /recommend
+    calls would return.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get("profiles")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "expected 'profiles' as a non-empty array"}), 400
+    if len(items) > BATCH_MAX_PROFILES:
+        return jsonify({"error": f"at most {BATCH_MAX_PROFILES} profiles per batch"}), 400
+
+    default_session_id = data.get("session_id") or request.headers.get("X-Session-ID") or "anon"
+    results: List[Dict[str, Any] | None] = [None] * len(items)
+    profiles: List[Tuple[int, Dict[str, Any]]] = []
+    for i, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        profile, error = _profile_from_request(item, item.get("session_id") or default_session_id)
+        if profile is None:
+            results[i] = {"error": error}
+        else:
+            profiles.append((i, profile))
+
+    db_path = resolve_db_path()
+    if not os.path.exists(db_path):
+        return jsonify({"error": f"Catalog not ready. Expected DB at: {db_path}"}), 503
+
+    active_rows = max(1, count_rows())
+    candidate_limit, prefilter_n, _ = _pipeline_sizes(active_rows)
+
+    try:
+        cand_lists = hybrid_candidates_batch(
+            [
+                {
+                    "user_traits": p["user_traits"],
+                    "query_text": p["query_text"],
+                    "personality_traits": p["personality_traits"],
+                    "mood_traits": p["mood_traits"],
+                    "filters": p["filters"],
+                }
+                for _, p in profiles
+            ],
+            limit=candidate_limit,
+            prefilter=prefilter_n,
+        )
+    except Exception as e:
+        return jsonify({"error": f"Catalog query failed: {e}"}), 503
+
+    writer = _event_writer()
+    remaining = Counter(p["session_id"] for _, p in profiles)
+    for (i, profile), raw_cands in zip(profiles, cand_lists):
+        results[i] = _recommend_from_candidates(profile, raw_cands, active_rows)
+        remaining[profile["session_id"]] -= 1
+        # A later entry for the same session must see these shown events, as it would across calls.
+        if writer is not None and remaining[profile["session_id"]] > 0:
+            writer.flush()
+
+    return jsonify({"results": results, "algo_used": ALGO_TAG})
 
 
 @bp.post("/event")
@@ -1094,29 +1611,42 @@ def event():
     if not movie_id:
         return jsonify({"error": "movie_id required"}), 400
 
-    dbs = SessionLocal()
+    bandit_update = None
     try:
-        now_dt = datetime.now(timezone.utc)
-
-        ev = Event(
-            session_id=session_id,
-            movie_id=str(movie_id),
-            type=etype,
-            reward=reward,
-            ts=now_dt,
-            features=feats,
-        )
-        dbs.add(ev)
-        dbs.commit()
+        user = feats.get("user_traits")
+        movie = feats.get("movie_traits")
+        if user and movie:
+            bandit_update = (str(movie_id), features(user, movie), reward)
+    except Exception:
+        pass
+    row = dict(
+        session_id=session_id,
+        movie_id=str(movie_id),
+        type=etype,
+        reward=reward,
+        ts=datetime.now(timezone.utc),
+        features=feats,
+    )
 
+    writer = _event_writer()
+    if writer is not None:
+        if not writer.submit([row], bandit=bandit_update):
+            return jsonify({"error": "event queue full"}), 503
+        return {"ok": True}
+
+    # The event, its rollup counters and the bandit update commit together; if the bandit update
+    # fails, the event is still recorded on its own.
+    dbs = SessionLocal()
+    try:
         try:
-            user = feats.get("user_traits")
-            movie = feats.get("movie_traits")
-            if user and movie:
-                x = features(user, movie)
-                LINUCB.update(dbs, str(movie_id), x, reward)
+            write_events(dbs, [row], LINUCB, bandit_update)
+            dbs.commit()
         except Exception:
-            pass
+            dbs.rollback()
+            if bandit_update is None:
+                raise
+            write_events(dbs, [row])
+            dbs.commit()
     except Exception as e:
         dbs.rollback()
         return jsonify({"error": f"failed to record event: {e}"}), 500
@@ -0,0 +1,62 @@
+"""Coarse trait-profile buckets for exposure counters.
+
+Each trait is cut into LEVELS equal bins, so a user profile falls into one of LEVELS ** 9 grid
+cells. Sessions shown a movie are counted per (movie, bucket, day) on write
+(db.MovieBucketExposure), and a request asks which buckets are dissimilar to its user by comparing
+against the cell centres instead of against every past session's profile.
+"""
+
+from __future__ import annotations
+
+import itertools
+import math
+from typing import Any, Sequence
+
+import numpy as np
+
+TRAIT_ORDER = ("energy", "mood", "depth", "optimism", "novelty", "comfort", "intensity", "humor", "darkness")
+LEVELS = 3
+BUCKET_COUNT = LEVELS ** len(TRAIT_ORDER)
+
+_CENTRES: np.ndarray | None = None
+_CENTRE_NORMS: np.ndarray | None = None
+
+
+def trait_bucket(traits: Any) -> int | None:
+    """Grid cell of a user_traits mapping (missing or invalid traits count as 0.5), or None."""
+    if not isinstance(traits, dict):
+        return None
+    bucket = 0
+    for key in TRAIT_ORDER:
+        try:
+            value = float(traits.get(key, 0.5))
+        except (TypeError, ValueError):
+            value = 0.5
+        if not math.isfinite(value):
+            value = 0.5
+        bucket = bucket * LEVELS + min(LEVELS - 1, max(0, int(value * LEVELS)))
+    return bucket
+
+
+def _centres() -> tuple[np.ndarray, np.ndarray]:
+    """Centred cell-centre vectors in bucket order, and their norms."""
+    global _CENTRES, _CENTRE_NORMS
+    if _CENTRES is None:
+        levels = [(level + 0.5) / LEVELS - 0.5 for level in range(LEVELS)]
+        centres = np.array(list(itertools.product(levels, repeat=len(TRAIT_ORDER))), dtype=np.float64)
+        norms = np.sqrt((centres * centres).sum(axis=1))
+        _CENTRE_NORMS = np.where(norms > 0.0, norms, 1e-9)
+        _CENTRES = centres
+    return _CENTRES, _CENTRE_NORMS
+
+
+def dissimilar_bucket_mask(user_vec: Sequence[float], sim_max: float) -> np.ndarray:
+    """Boolean mask over buckets whose centre is at most `sim_max` similar to `user_vec`.
+
+    Similarity is main._centered_cosine01: cosine of the 0.5-centred vectors mapped to [0, 1].
+    """
+    centres, norms = _centres()
+    target = np.asarray(user_vec, dtype=np.float64) - 0.5
+    target_norm = float(np.sqrt(target @ target)) or 1e-9
+    sims = np.clip(0.5 * ((centres @ target) / (norms * target_norm) + 1.0), 0.0, 1.0)
+    return sims <= sim_max
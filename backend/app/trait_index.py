@@ -0,0 +1,156 @@
+"""Optional sub-linear index for trait-space retrieval.
+
+Catalog trait rows are centered and unit-normalized, so trait similarity is a plain inner product.
+The IVF index clusters those rows once per snapshot and, at query time, scores only the members of
+the clusters whose centroids are closest to the user vector. Scores for probed rows are exact; the
+approximation is only in which rows get probed.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+
+TRAIT_INDEX_KINDS = ("brute", "ivf")
+DEFAULT_TRAIT_INDEX = "brute"
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except Exception:
+        return default
+
+
+def resolve_trait_index_kind() -> str:
+    """Trait index selected via CATALOG_TRAIT_INDEX (brute|ivf)."""
+    raw = (os.environ.get("CATALOG_TRAIT_INDEX") or "").strip().lower()
+    return raw if raw in TRAIT_INDEX_KINDS else DEFAULT_TRAIT_INDEX
+
+
+def resolve_ivf_nlist(n_rows: int) -> int:
+    """Number of IVF clusters; defaults to ~sqrt(N), which balances centroid and list scan cost."""
+    default = int(round(math.sqrt(max(1, n_rows))))
+    nlist = _env_int("CATALOG_IVF_NLIST", default)
+    return max(1, min(nlist, max(1, n_rows)))
+
+
+def resolve_ivf_nprobe(nlist: int) -> int:
+    """Minimum clusters probed per query."""
+    return max(1, min(_env_int("CATALOG_IVF_NPROBE", 16), nlist))
+
+
+def resolve_ivf_candidate_mult() -> int:
+    """Probing continues until at least this many candidates per requested row are covered."""
+    return max(1, _env_int("CATALOG_IVF_CANDIDATE_MULT", 32))
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, ordered by score desc then index asc."""
+    n = int(scores.shape[0])
+    k = max(0, min(int(k), n))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(n)
+    return idx[np.lexsort((idx, -scores[idx]))]
+
+
+class IVFTraitIndex:
+    """Inverted-file index over unit trait rows: centroids plus cluster member lists."""
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_members: np.ndarray,
+        nprobe: int,
+        candidate_mult: int | None = None,
+    ):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_members = list_members
+        self.nprobe = nprobe
+        self.candidate_mult = resolve_ivf_candidate_mult() if candidate_mult is None else max(1, int(candidate_mult))
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(cls, unit_rows: np.ndarray, nlist: int | None = None, seed: int = 0) -> "IVFTraitIndex":
+        from sklearn.cluster import MiniBatchKMeans
+
+        n = int(unit_rows.shape[0])
+        nlist = resolve_ivf_nlist(n) if nlist is None else max(1, min(int(nlist), max(1, n)))
+        data = np.asarray(unit_rows, dtype=np.float32)
+        km = MiniBatchKMeans(
+            n_clusters=nlist,
+            random_state=seed,
+            n_init=1,
+            batch_size=max(1024, 4 * nlist),
+        )
+        assign = km.fit_predict(data).astype(np.int64)
+
+        centroids = km.cluster_centers_.astype(np.float32)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        np.divide(centroids, norms, out=centroids, where=norms > 0)
+
+        members = np.argsort(assign, kind="stable").astype(np.int64)
+        counts = np.bincount(assign, minlength=nlist)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(centroids, offsets, members, resolve_ivf_nprobe(nlist))
+
+    def reassign(self, unit_rows: np.ndarray) -> "IVFTraitIndex":
+        """Index over a patched row set that keeps the trained centroids; rows go to the nearest one."""
+        n = int(unit_rows.shape[0])
+        assign = np.empty(n, dtype=np.int64)
+        step = 65536
+        for lo in range(0, n, step):
+            assign[lo : lo + step] = np.argmax(np.asarray(unit_rows[lo : lo + step]) @ self.centroids.T, axis=1)
+        members = np.argsort(assign, kind="stable").astype(np.int64)
+        counts = np.bincount(assign, minlength=self.nlist)
+        offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return IVFTraitIndex(self.centroids, offsets, members, self.nprobe, self.candidate_mult)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "IVFTraitIndex":
+        centroids = arrays["ivf_centroids"]
+        return cls(centroids, arrays["ivf_offsets"], arrays["ivf_members"], resolve_ivf_nprobe(int(centroids.shape[0])))
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "ivf_centroids": self.centroids,
+            "ivf_offsets": self.list_offsets,
+            "ivf_members": self.list_members,
+        }
+
+    def search(self, unit_rows: np.ndarray, uvec: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k rows by inner product: (row indices, raw scores), best first.
+
+        Probes at least the `nprobe` nearest clusters and keeps widening until `candidate_mult * k`
+        rows are covered, so recall holds up when the requested pool is large.
+        """
+        if k <= 0 or not self.list_members.shape[0]:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        order = np.argsort(-(self.centroids @ uvec), kind="stable")
+        sizes = self.list_offsets[1:] - self.list_offsets[:-1]
+        covered = np.cumsum(sizes[order])
+        target = min(int(k) * self.candidate_mult, int(covered[-1]))
+        need = int(np.searchsorted(covered, target)) + 1
+        probe = order[: max(self.nprobe, need)]
+        cand = np.concatenate([self.list_members[self.list_offsets[c] : self.list_offsets[c + 1]] for c in probe])
+        cand.sort()
+        scores = unit_rows[cand] @ uvec
+        top = top_k_indices(scores, k)
+        return cand[top], scores[top]
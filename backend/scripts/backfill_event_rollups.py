@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Add missing events indexes and rebuild the event rollup tables (movie_daily_stats,
+movie_bucket_exposure) from events.
+
+The event DB is resolved like the app does (BANDIT_DB_URL, DB_URL, then BANDIT_DB_PATH). Run it
+once after deploying the rollup writes and before setting MM_EVENT_ROLLUP_READS=1 or
+MM_DISSIMILAR_BUCKET_READS=1. App boot only creates missing tables, so this is also where an
+existing events table gets ix_events_movie_aggregates; building it blocks event writes until it
+finishes. Each rollup table is rebuilt in one transaction, so that part can run while the app
+keeps writing events.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import recommendation_audit as audit
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    _, db_mod, _, _ = audit.load_runtime_modules()
+    db_mod.init_db()
+    engine = db_mod.get_engine()
+
+    print('=== MindMatch Event Rollup Backfill ===')
+    print(f"db={engine.url.render_as_string(hide_password=True)}")
+    started = time.perf_counter()
+    created = db_mod.ensure_event_indexes(engine)
+    print(f"events indexes created: {', '.join(created) or 'none'} elapsed={time.perf_counter() - started:.2f}s")
+    for table, rebuild in (
+        ('movie_daily_stats', db_mod.rebuild_movie_daily_stats),
+        ('movie_bucket_exposure', db_mod.rebuild_bucket_exposure),
+    ):
+        started = time.perf_counter()
+        rows = rebuild(engine)
+        print(f"{table}: rows={rows} elapsed={time.perf_counter() - started:.2f}s")
+    engine.dispose()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -4,6 +4,7 @@
 from __future__ import annotations
 
 import argparse
+import importlib
 import json
 import math
 import sqlite3
@@ -245,6 +246,10 @@ def main() -> int:
             experiment_report['variants'][variant_name] = report
             experiment_report['variant_summaries'].append(summarize_variant(report, full_catalog_rows))
 
+        # The app keeps read-only catalog connections open between requests; release them before the
+        # temporary variant DBs are deleted (Windows refuses to remove open files).
+        importlib.import_module('app.catalog_conn').close_catalog_connections()
+
     print_variant_table(experiment_report['variant_summaries'], low_popularity_threshold)
 
     if args.json_out:
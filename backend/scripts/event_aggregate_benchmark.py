@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Time the per-candidate event aggregates on synthetic event tables of increasing size.
+
+For each table size this builds a throwaway SQLite event store, then times the original
+row-fetching helpers against `_load_candidate_events` (GROUP BY aggregates), first with the old
+indexes only and again after adding ix_events_movie_aggregates, and checks that both return the same
+priors, shown counts and dissimilar exposure counts. A last run reads everything from the
+rollup tables (movie_daily_stats, movie_bucket_exposure); those cover whole UTC days and
+bucket the dissimilar check, so that run is timed but not compared.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+import recommendation_audit as audit
+
+
+EVENT_TYPES = ['shown'] * 6 + ['click', 'click', 'save', 'finish', 'dismiss']
+REWARDS = {'shown': 0.0, 'click': 0.3, 'save': 0.6, 'finish': 1.0, 'dismiss': -0.2}
+BASE_INDEXES = {
+    'ix_events_movie_id': 'movie_id',
+    'ix_events_session_id': 'session_id',
+    'ix_events_session_ts': 'session_id, at',
+}
+
+
+def legacy_candidate_events(main_mod: Any, db_mod: Any, ids: List[str], user_traits: Dict[str, float], exclude_session_id: str) -> Tuple[Dict[str, float], Dict[str, int], Dict[str, int]]:
+    """The original helpers: fetch every matching event row through the ORM and aggregate in Python."""
+    Event = db_mod.Event
+    now = datetime.now(timezone.utc)
+    dbs = db_mod.SessionLocal()
+    try:
+        sums: Dict[str, float] = defaultdict(float)
+        counts: Dict[str, int] = defaultdict(int)
+        rows = (
+            dbs.query(Event)
+            .filter(Event.movie_id.in_(ids))
+            .filter(Event.ts >= now - timedelta(days=180))
+            .filter(Event.type.in_(tuple(main_mod.INTERACTION_TYPES)))
+            .all()
+        )
+        for e in rows:
+            sums[str(e.movie_id)] += main_mod._safe_float(e.reward, 0.0)
+            counts[str(e.movie_id)] += 1
+        priors = {
+            mid: main_mod._clamp01(((sums[mid] + 0.5) / (counts[mid] + 5.0) + 0.2) / 1.2)
+            for mid in ids
+        }
+
+        shown_counts: Dict[str, int] = defaultdict(int)
+        rows = (
+            dbs.query(Event)
+            .filter(Event.movie_id.in_(ids))
+            .filter(Event.ts >= now - timedelta(days=main_mod.GLOBAL_REPEAT_LOOKBACK_DAYS))
+            .filter(Event.type == 'shown')
+            .filter(Event.session_id != exclude_session_id)
+            .all()
+        )
+        for e in rows:
+            shown_counts[str(e.movie_id)] += 1
+
+        by_session_movies: Dict[str, Set[str]] = defaultdict(set)
+        by_session_traits: Dict[str, List[float]] = {}
+        rows = (
+            dbs.query(Event)
+            .filter(Event.movie_id.in_(ids))
+            .filter(Event.ts >= now - timedelta(days=main_mod.DISSIMILAR_LOOKBACK_DAYS))
+            .filter(Event.type == 'shown')
+            .order_by(Event.movie_id, Event.id)
+            .all()
+        )
+        for e in rows:
+            sid = str(e.session_id or '')
+            if not sid:
+                continue
+            by_session_movies[sid].add(str(e.movie_id))
+            if sid not in by_session_traits:
+                feats = e.features if isinstance(e.features, dict) else {}
+                vec = main_mod._extract_trait_vec(feats.get('user_traits'))
+                if vec is not None:
+                    by_session_traits[sid] = vec
+    finally:
+        dbs.close()
+
+    target = main_mod._vec_from_user(user_traits)
+    dissimilar: Dict[str, int] = defaultdict(int)
+    for sid, mids in by_session_movies.items():
+        other = by_session_traits.get(sid)
+        if other is not None and main_mod._centered_cosine01(target, other) <= main_mod.DISSIMILAR_SIM_MAX:
+            for mid in mids:
+                dissimilar[mid] += 1
+    return priors, dict(shown_counts), dict(dissimilar)
+
+
+def fill_events(db_path: Path, trait_names: Sequence[str], args: argparse.Namespace, rows: int, seed: int) -> float:
+    """Bulk-insert `rows` synthetic events with skewed movie popularity; returns seconds taken."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Zipf-like popularity: a few movies collect most events, like a real catalog.
+    movie_weights = [1.0 / (rank + 1) ** 0.9 for rank in range(args.movies)]
+    movie_ids = [str(100000 + i) for i in range(args.movies)]
+    session_traits: Dict[int, str] = {}
+
+    conn = sqlite3.connect(str(db_path))
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    for name in list(BASE_INDEXES) + ['ix_events_movie_aggregates']:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+    started = time.perf_counter()
+    batch = max(1, args.batch)
+    done = 0
+    while done < rows:
+        n = min(batch, rows - done)
+        mids = rng.choices(movie_ids, weights=movie_weights, k=n)
+        chunk = []
+        for mid in mids:
+            session = rng.randrange(args.sessions)
+            event_type = rng.choice(EVENT_TYPES)
+            at = now - timedelta(seconds=rng.randrange(args.days * 86400))
+            features = None
+            if event_type == 'shown' and rng.random() < args.features_share:
+                features = session_traits.get(session)
+                if features is None:
+                    features = session_traits[session] = json.dumps({'user_traits': {t: round(rng.random(), 3) for t in trait_names}})
+            chunk.append((f's{session}', mid, event_type, REWARDS[event_type], at.strftime('%Y-%m-%d %H:%M:%S.%f'), features))
+        conn.executemany('INSERT INTO events (session_id, movie_id, type, reward, at, features) VALUES (?, ?, ?, ?, ?, ?)', chunk)
+        conn.commit()
+        done += n
+    for name, cols in BASE_INDEXES.items():
+        conn.execute(f'CREATE INDEX {name} ON events ({cols})')
+    conn.commit()
+    conn.close()
+    return time.perf_counter() - started
+
+
+def create_aggregate_index(db_path: Path) -> float:
+    started = time.perf_counter()
+    conn = sqlite3.connect(str(db_path))
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_events_movie_aggregates ON events (movie_id, at, type, reward, session_id)')
+    conn.commit()
+    conn.close()
+    return time.perf_counter() - started
+
+
+def median_ms(fn: Any, id_sets: List[List[str]]) -> float:
+    samples = []
+    for ids in id_sets:
+        started = time.perf_counter()
+        fn(ids)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(samples)
+
+
+def candidate_sets(args: argparse.Namespace, seed: int) -> List[List[str]]:
+    """Candidate id lists mixing head and tail titles, as the hybrid retriever returns them."""
+    rng = random.Random(seed)
+    head = max(1, args.movies // 50)
+    out = []
+    for _ in range(args.repeats):
+        picks = set(rng.sample(range(head), min(head, args.candidates // 4)))
+        while len(picks) < min(args.candidates, args.movies):
+            picks.add(rng.randrange(args.movies))
+        out.append([str(100000 + i) for i in sorted(picks)])
+    return out
+
+
+def agree(legacy: Tuple[Dict[str, float], Dict[str, int], Dict[str, int]], current: Any) -> bool:
+    priors, shown_counts, dissimilar = legacy
+    same_priors = priors.keys() == current.feedback_priors.keys() and all(
+        abs(priors[mid] - current.feedback_priors[mid]) <= 1e-9 for mid in priors
+    )
+    return same_priors and shown_counts == dict(current.global_shown_counts) and dissimilar == dict(current.dissimilar_exposure_counts)
+
+
+def run_size(rows: int, args: argparse.Namespace, workdir: Path) -> Dict[str, Any]:
+    db_path = workdir / f'bandit_events_{rows}.db'
+    os.environ.pop('BANDIT_DB_URL', None)
+    os.environ.pop('DB_URL', None)
+    os.environ['BANDIT_DB_PATH'] = str(db_path)
+
+    _, db_mod, _, main_mod = audit.load_runtime_modules()
+    db_mod._engine = None
+    db_mod.init_db()
+    engine = db_mod.get_engine()
+    engine.dispose()
+
+    fill_s = fill_events(db_path, main_mod.TRAIT_ORDER, args, rows, args.seed + rows)
+    rng = random.Random(args.seed)
+    user_traits = {t: rng.random() for t in main_mod.TRAIT_ORDER}
+    exclude = 's0'
+    id_sets = candidate_sets(args, args.seed + 1)
+
+    def measure(label: str, use_rollup: bool = False) -> Dict[str, Any]:
+        engine.dispose()
+        current_ms = median_ms(
+            lambda ids: main_mod._load_candidate_events(
+                ids, user_traits, exclude_session_id=exclude, use_rollup=use_rollup, use_buckets=use_rollup
+            ),
+            id_sets,
+        )
+        result: Dict[str, Any] = {'label': label, 'current_ms': round(current_ms, 2)}
+        if rows <= args.legacy_max_rows and not use_rollup:
+            result['legacy_ms'] = round(median_ms(
+                lambda ids: legacy_candidate_events(main_mod, db_mod, ids, user_traits, exclude),
+                id_sets,
+            ), 2)
+            result['results_match'] = all(
+                agree(
+                    legacy_candidate_events(main_mod, db_mod, ids, user_traits, exclude),
+                    main_mod._load_candidate_events(ids, user_traits, exclude_session_id=exclude, use_rollup=False, use_buckets=False),
+                )
+                for ids in id_sets[:2]
+            )
+        return result
+
+    without_index = measure('without ix_events_movie_aggregates')
+    index_s = create_aggregate_index(db_path)
+    with_index = measure('with ix_events_movie_aggregates')
+    started = time.perf_counter()
+    db_mod.rebuild_movie_daily_stats(engine)
+    db_mod.rebuild_bucket_exposure(engine)
+    rollup_s = time.perf_counter() - started
+    rollup = measure('rollup tables', use_rollup=True)
+    engine.dispose()
+    db_mod._engine = None
+
+    return {
+        'rows': rows,
+        'db_mb': round(db_path.stat().st_size / (1024 * 1024), 1),
+        'fill_s': round(fill_s, 1),
+        'aggregate_index_s': round(index_s, 1),
+        'rollup_rebuild_s': round(rollup_s, 1),
+        'runs': [without_index, with_index, rollup],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000, 50_000_000], help='Event table sizes to benchmark.')
+    parser.add_argument('--movies', type=int, default=50_000, help='Distinct movie ids in the synthetic events.')
+    parser.add_argument('--sessions', type=int, default=200_000, help='Distinct session ids in the synthetic events.')
+    parser.add_argument('--days', type=int, default=365, help='Events are spread uniformly over this many past days.')
+    parser.add_argument('--features-share', type=float, default=0.05, help='Share of shown events carrying a user_traits payload.')
+    parser.add_argument('--candidates', type=int, default=140, help='Candidate ids per lookup.')
+    parser.add_argument('--repeats', type=int, default=7, help='Timed lookups per variant (median is reported).')
+    parser.add_argument('--legacy-max-rows', type=int, default=10_000_000, help='Skip the row-fetching baseline above this table size.')
+    parser.add_argument('--batch', type=int, default=200_000, help='Rows per insert batch while filling.')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--dir', type=str, default='', help='Directory for the temporary DBs (50M rows needs several GB).')
+    parser.add_argument('--out', type=str, default='', help='Optional path for the JSON report.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='mindmatch-events-', dir=args.dir or None) as tmpdir:
+        workdir = Path(tmpdir)
+        reports = []
+        for rows in args.rows:
+            report = run_size(rows, args, workdir)
+            reports.append(report)
+            print(f"rows={report['rows']:,} db={report['db_mb']}MB fill={report['fill_s']}s aggregate_index={report['aggregate_index_s']}s rollup_rebuild={report['rollup_rebuild_s']}s")
+            for run in report['runs']:
+                legacy = f"legacy={run['legacy_ms']:.2f}ms match={run['results_match']}" if 'legacy_ms' in run else ''
+                print(f"  {run['label']}: current={run['current_ms']:.2f}ms {legacy}".rstrip())
+            (workdir / f'bandit_events_{rows}.db').unlink(missing_ok=True)
+
+    if args.out:
+        out_path = Path(args.out).resolve()
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(json.dumps(reports, indent=2), encoding='utf-8')
+    return 0 if all(run.get('results_match', True) for report in reports for run in report['runs']) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Check the final-ranking sort against the original comparator on the audit profiles.
+
+`_sort_final_rank` must reproduce `sorted(key=cmp_to_key(_final_rank_cmp))` exactly, for the
+scored pool as retrieved and for shuffled copies of it (the comparator is not transitive, so its
+output depends on input order and both sorts must agree on every input). The exit code is 0 only
+when every order matches.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from functools import cmp_to_key
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+import compare_variants
+import recommendation_audit as audit
+
+
+def ids_of(items: Sequence[Dict[str, Any]]) -> List[str]:
+    return [str(item.get('id')) for item in items]
+
+
+def score_pool(profile: Dict[str, Any], catalog_mod: Any, main_mod: Any) -> List[Dict[str, Any]]:
+    """Candidate pool for one profile, scored with neutral feedback and no exposure penalties."""
+    user_traits = main_mod.answers_to_traits([float(value) for value in profile['answers']])
+    overall_conf = 0.75
+    candidate_limit, prefilter_n, _ = main_mod._pipeline_sizes(max(1, catalog_mod.count_rows()))
+    deduped = main_mod._dedupe(
+        catalog_mod.top_matches(
+            user_traits=user_traits,
+            limit=candidate_limit,
+            prefilter=prefilter_n,
+            include_scores=True,
+        )
+    )
+    rank_scores = main_mod._rank_scores(
+        deduped,
+        user_traits=user_traits,
+        overall_conf=overall_conf,
+        feedback_scores=np.full(len(deduped), 0.5),
+        session_adjustments=np.zeros(len(deduped)),
+        weights=main_mod._blend_weights(overall_conf),
+    )
+    for movie, rank_score in zip(deduped, rank_scores):
+        movie['rank_score'] = round(float(rank_score), 6)
+    return deduped
+
+
+def time_sort(sort_fn: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]], pool: List[Dict[str, Any]], repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        sort_fn(list(pool))
+    return (time.perf_counter() - started) * 1000.0 / max(1, repeats)
+
+
+def compare_profile(profile: Dict[str, Any], catalog_mod: Any, main_mod: Any, shuffles: int, repeats: int) -> Dict[str, Any]:
+    pool = score_pool(profile, catalog_mod, main_mod)
+
+    def legacy(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return sorted(items, key=cmp_to_key(main_mod._final_rank_cmp))
+
+    def current(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        main_mod._sort_final_rank(items)
+        return items
+
+    rng = random.Random(f"final-rank:{profile['id']}")
+    inputs = [list(pool)]
+    for _ in range(shuffles):
+        shuffled = list(pool)
+        rng.shuffle(shuffled)
+        inputs.append(shuffled)
+
+    mismatched_inputs = 0
+    legacy_orders = set()
+    for items in inputs:
+        legacy_ids = ids_of(legacy(list(items)))
+        legacy_orders.add(tuple(legacy_ids))
+        if ids_of(current(list(items))) != legacy_ids:
+            mismatched_inputs += 1
+
+    return {
+        'id': profile['id'],
+        'pool_size': len(pool),
+        'inputs_checked': len(inputs),
+        'mismatched_inputs': mismatched_inputs,
+        'matches_legacy': mismatched_inputs == 0,
+        'legacy_distinct_orders': len(legacy_orders),
+        'legacy_ms': round(time_sort(legacy, pool, repeats), 4),
+        'current_ms': round(time_sort(current, pool, repeats), 4),
+    }
+
+
+def run_check(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix='mindmatch-final-rank-') as tmpdir:
+        os.environ.pop('BANDIT_DB_URL', None)
+        os.environ.pop('DB_URL', None)
+        os.environ['BANDIT_DB_PATH'] = str(Path(tmpdir) / 'bandit_final_rank.db')
+
+        _, db_mod, catalog_mod, main_mod = audit.load_runtime_modules()
+        db_mod._engine = None
+        main_mod.init_app(None)
+
+        profiles = [
+            compare_profile(profile, catalog_mod, main_mod, shuffles=args.shuffles, repeats=args.repeats)
+            for profile in compare_variants.PROFILE_FIXTURES
+        ]
+
+        engine = getattr(db_mod, '_engine', None)
+        if engine is not None:
+            engine.dispose()
+            db_mod._engine = None
+
+    return {
+        'db_path': str(Path(catalog_mod.resolve_db_path()).resolve()).replace('\\', '/'),
+        'profiles': profiles,
+        'matches_legacy': all(p['matches_legacy'] for p in profiles),
+        'legacy_order_dependent_profiles': sum(1 for p in profiles if p['legacy_distinct_orders'] > 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shuffles', type=int, default=20, help='Shuffled inputs per profile checked besides the retrieved order.')
+    parser.add_argument('--repeats', type=int, default=20, help='Timed sorts per implementation and profile.')
+    parser.add_argument('--out', type=str, default='', help='Optional path for the JSON report.')
+    args = parser.parse_args()
+
+    report = run_check(args)
+    if args.out:
+        out_path = Path(args.out).resolve()
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(json.dumps(report, indent=2), encoding='utf-8')
+
+    print('=== MindMatch Final Rank Equivalence ===')
+    for p in report['profiles']:
+        print(
+            f"{p['id']}: pool={p['pool_size']} exact={p['matches_legacy']} "
+            f"mismatched_inputs={p['mismatched_inputs']}/{p['inputs_checked']} "
+            f"legacy_orders={p['legacy_distinct_orders']} "
+            f"ms legacy={p['legacy_ms']:.3f} current={p['current_ms']:.3f}"
+        )
+    total = len(report['profiles'])
+    print(f"final rank sort identical to legacy comparator: {report['matches_legacy']}")
+    print(f"input-order dependent profiles (legacy comparator): {report['legacy_order_dependent_profiles']}/{total}")
+    return 0 if report['matches_legacy'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Upgrade a catalog DB to the current schema and backfill the packed trait/label layout."""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.catalog_schema import CATALOG_SCHEMA_VERSION, migrate_catalog, schema_version  # noqa: E402
+
+DEFAULT_DB = ROOT / "app" / "datasets" / "movies_core.db"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", type=str, default=str(DEFAULT_DB), help="Catalog DB to migrate in place.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows backfilled per transaction.")
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    if not db_path.exists():
+        print(f"Catalog DB not found at: {db_path}")
+        return 1
+
+    conn = sqlite3.connect(str(db_path))
+    try:
+        before = schema_version(conn)
+        t0 = time.perf_counter()
+        migrated = migrate_catalog(conn, batch_size=max(1, args.batch_size))
+        elapsed = time.perf_counter() - t0
+        after = schema_version(conn)
+    finally:
+        conn.close()
+
+    print(f"Schema version {before} -> {after} (current {CATALOG_SCHEMA_VERSION})")
+    print(f"Backfilled {migrated} rows in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
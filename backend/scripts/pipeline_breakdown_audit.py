@@ -11,7 +11,6 @@ import statistics
 import tempfile
 from collections import Counter, defaultdict
 from datetime import datetime, timezone
-from functools import cmp_to_key
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Sequence, Tuple
 
@@ -300,19 +299,11 @@ def analyze_profile(
     deduped = main_mod._dedupe(candidate_limited)
 
     movie_ids = [str(movie.get('id')) for movie in deduped if movie.get('id') is not None]
-    feedback_priors = main_mod._get_feedback_priors(movie_ids)
-    global_shown_counts = main_mod._get_global_shown_counts(
-        movie_ids,
-        lookback_days=main_mod.GLOBAL_REPEAT_LOOKBACK_DAYS,
-        exclude_session_id=session_id,
-    )
-    dissimilar_counts = main_mod._get_dissimilar_exposure_counts(
-        movie_ids,
-        user_traits=user_traits,
-        lookback_days=main_mod.DISSIMILAR_LOOKBACK_DAYS,
-        sim_max=main_mod.DISSIMILAR_SIM_MAX,
-    )
-    session_adjustments = main_mod._get_session_adjustments(session_id)
+    events = main_mod._load_event_context(session_id, movie_ids, user_traits, seen_lookback_days=21)
+    feedback_priors = events.candidates.feedback_priors
+    global_shown_counts = events.candidates.global_shown_counts
+    dissimilar_counts = events.candidates.dissimilar_exposure_counts
+    session_adjustments = events.session.session_adjustments
     weights = main_mod._blend_weights(overall_conf)
 
     scored: List[Dict[str, Any]] = []
@@ -344,10 +335,10 @@ def analyze_profile(
         movie_out['rank_score'] = round(rank_score, 6)
         scored.append(movie_out)
 
-    scored.sort(key=cmp_to_key(main_mod._final_rank_cmp))
+    main_mod._sort_final_rank(scored)
     post_relevance_floor, relevance_floor, relevance_floor_source = main_mod._apply_relevance_floor(scored, result_count=result_count)
 
-    seen = main_mod._get_recently_seen_ids(session_id, lookback_days=21)
+    seen = events.session.recently_seen_ids
     adaptive_lambda = main_mod._adaptive_lambda(user_traits, overall_conf, seen_count=len(seen))
     rng = main_mod._stable_rng(session_id, user_traits, overall_conf, variant_seed='')
     close_mode = result_count <= 4
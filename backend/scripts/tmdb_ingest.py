@@ -14,6 +14,9 @@ Notes:
 - For each movie, fetches details + keywords + credits + watch/providers.
 - Computes a 9-dim trait vector using rules in app/trait_mapping.py.
 - Safe to re-run; upserts by tmdb_id.
+- Changed tmdb_ids are logged to movie_changes so the backend applies them as snapshot deltas.
+- Writes catalog schema v2 (app/catalog_schema.py) alongside the JSON columns; older DBs are
+  upgraded on open, and scripts/migrate_catalog_schema.py backfills their existing rows.
 """
 import os, sys, time, math, argparse, sqlite3, json, requests
 from typing import Dict, Any, List, Tuple
@@ -31,6 +34,8 @@ if not BEARER:
 # Import trait mapping rules
 sys.path.append(str(Path(__file__).resolve().parents[1] / "app"))
 from trait_mapping import traits_from_tmdb
+from catalog_changes import ensure_change_log
+from catalog_schema import ensure_schema, write_packed_layout
 
 def http_get(url: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
     headers = {}
@@ -68,6 +73,10 @@ def ensure_db(path: Path) -> sqlite3.Connection:
     cur.execute("CREATE INDEX IF NOT EXISTS idx_movies_year ON movies(year);")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_movies_pop ON movies(popularity DESC);")
     conn.commit()
+    # Upserts are logged by tmdb_id so running servers can patch their snapshot incrementally.
+    ensure_change_log(conn)
+    # Schema v2: packed float32 traits + genre/keyword side tables next to the JSON columns.
+    ensure_schema(conn)
     return conn
 
 def upsert_movie(conn: sqlite3.Connection, row: Dict[str, Any]):
@@ -91,6 +100,13 @@ def upsert_movie(conn: sqlite3.Connection, row: Dict[str, Any]):
       providers=excluded.providers,
       traits=excluded.traits;
     """, row)
+    write_packed_layout(
+        conn,
+        row["tmdb_id"],
+        json.loads(row["traits"]),
+        json.loads(row["genres"]),
+        json.loads(row["keywords"]),
+    )
     conn.commit()
 
 def enrich_one(tmdb_id: int) -> Dict[str, Any]:
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Measure IVF trait-index recall@k and latency against brute-force trait retrieval."""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.catalog_db import TRAITS, _centered_unit_rows, _get_snapshot  # noqa: E402
+from app.trait_index import IVFTraitIndex, resolve_ivf_nprobe, top_k_indices  # noqa: E402
+
+
+def parse_int_list(raw: str) -> List[int]:
+    return [int(part) for part in raw.split(",") if part.strip()]
+
+
+def load_unit_rows(args: argparse.Namespace) -> np.ndarray:
+    if args.synthetic > 0:
+        rng = np.random.default_rng(args.seed)
+        # Beta(2,2)-like trait values, matching how ingested catalog traits cluster around the middle.
+        raw = (rng.random((args.synthetic, len(TRAITS))) + rng.random((args.synthetic, len(TRAITS)))) / 2.0
+        return _centered_unit_rows(raw)
+    if args.movies_db:
+        os.environ["MOVIES_DB"] = args.movies_db
+    return np.asarray(_get_snapshot().trait_matrix, dtype=np.float32)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--movies-db", type=str, default="", help="Catalog DB to index (defaults to the active catalog).")
+    parser.add_argument("--synthetic", type=int, default=0, help="Index N random trait rows instead of a catalog.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=str, default="100,800", help="Comma-separated k values to report recall@k for.")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF cluster count (0 uses CATALOG_IVF_NLIST or ~sqrt(N)).")
+    parser.add_argument("--nprobe", type=str, default="", help="Comma-separated nprobe values (default from CATALOG_IVF_NPROBE).")
+    parser.add_argument("--candidate-mult", type=str, default="", help="Comma-separated candidate multipliers (default from CATALOG_IVF_CANDIDATE_MULT).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-recall", type=float, default=0.0, help="Exit non-zero if any recall@k falls below this.")
+    args = parser.parse_args()
+
+    unit_rows = load_unit_rows(args)
+    n_rows = int(unit_rows.shape[0])
+    if not n_rows:
+        print("No catalog rows to index.")
+        return 1
+
+    t0 = time.perf_counter()
+    index = IVFTraitIndex.build(unit_rows, nlist=args.nlist or None, seed=args.seed)
+    build_s = time.perf_counter() - t0
+
+    rng = np.random.default_rng(args.seed + 1)
+    queries = _centered_unit_rows(rng.random((args.queries, len(TRAITS))))
+    ks = parse_int_list(args.k)
+    nprobes = parse_int_list(args.nprobe) or [resolve_ivf_nprobe(index.nlist)]
+    mults = parse_int_list(args.candidate_mult) or [index.candidate_mult]
+
+    print("=== Trait Index Recall ===")
+    print(f"rows={n_rows} nlist={index.nlist} build_s={build_s:.3f} queries={args.queries}")
+
+    failed = False
+    for nprobe, mult in itertools.product(nprobes, mults):
+        index.nprobe = max(1, min(nprobe, index.nlist))
+        index.candidate_mult = max(1, mult)
+        for k in ks:
+            recalls: List[float] = []
+            brute_ms: List[float] = []
+            ivf_ms: List[float] = []
+            for q in queries:
+                t0 = time.perf_counter()
+                exact = top_k_indices(unit_rows @ q, k)
+                brute_ms.append((time.perf_counter() - t0) * 1000.0)
+
+                t0 = time.perf_counter()
+                approx, _ = index.search(unit_rows, q, k)
+                ivf_ms.append((time.perf_counter() - t0) * 1000.0)
+
+                denom = max(1, min(k, n_rows))
+                recalls.append(len(np.intersect1d(exact, approx, assume_unique=True)) / denom)
+
+            recall = statistics.mean(recalls)
+            failed = failed or recall < args.min_recall
+            print(
+                f"nprobe={index.nprobe} mult={index.candidate_mult} k={k}: recall@k={recall:.4f} min={min(recalls):.4f} "
+                f"brute_ms_p50={statistics.median(brute_ms):.3f} ivf_ms_p50={statistics.median(ivf_ms):.3f}"
+            )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())